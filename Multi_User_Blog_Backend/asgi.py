@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Multi_User_Blog_Backend.settings')
+# Read endpoints run as native async views under ASGI.
+os.environ.setdefault('BLOG_ASYNC_READS', '1')
 
 application = get_asgi_application()
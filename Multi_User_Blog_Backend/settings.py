@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.replicas.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'Multi_User_Blog_Backend.urls'
@@ -81,10 +84,80 @@ WSGI_APPLICATION = 'Multi_User_Blog_Backend.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # BLOG_DATABASE_PATH points a process at another file, e.g. the
+        # dataset benchmark_endpoints seeds.
+        'NAME': os.environ.get('BLOG_DATABASE_PATH') or BASE_DIR / 'db.sqlite3',
     }
 }
 
+# Read replicas (api.replicas): safe requests read from these aliases, writes
+# and recent writers use `default`. BLOG_SQLITE_REPLICAS=replica.sqlite3,...
+# adds SQLite files standing in for replicas locally; refresh them from the
+# primary with `manage.py sync_replicas`.
+BLOG_READ_REPLICAS = []
+for _index, _name in enumerate(filter(None, os.environ.get('BLOG_SQLITE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{_index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / _name.strip(),
+        # Tests read replicas through the test database itself.
+        'TEST': {'MIRROR': 'default'},
+    }
+    BLOG_READ_REPLICAS.append(f'replica{_index}')
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+# 'round_robin' or 'least_recently_failed'; a failed replica is skipped for
+# BLOG_REPLICA_RETRY_AFTER seconds.
+BLOG_REPLICA_SELECTION = 'round_robin'
+BLOG_REPLICA_RETRY_AFTER = 30
+# How long a user reads from the primary after a successful write.
+BLOG_PRIMARY_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process. Multi-process deployments (gunicorn workers)
+# should set BLOG_CACHE_URL, e.g. redis://127.0.0.1:6379/1, so cached responses
+# and their invalidation counters are shared.
+
+if os.environ.get('BLOG_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['BLOG_CACHE_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'blog',
+        }
+    }
+
+BLOG_CACHE_ALIAS = 'default'
+BLOG_RESPONSE_CACHE_TIMEOUT = 300
+# Rendered feeds (api.feeds) are invalidated on writes; the timeout only
+# bounds how long an author rename takes to reach other authors' feeds.
+BLOG_FEED_CACHE_TIMEOUT = 60 * 60
+
+# Serve the read endpoints with native async views (api.async_views). asgi.py
+# turns this on; under WSGI every async view would need its own event loop.
+BLOG_ASYNC_READS = os.environ.get('BLOG_ASYNC_READS', '0') == '1'
+
+# Post views are buffered per worker and flushed in batches (api.view_counts):
+# a crashed worker loses at most BLOG_VIEW_COUNT_MAX_PENDING - 1 views.
+BLOG_VIEW_COUNT_FLUSH_INTERVAL = 10
+BLOG_VIEW_COUNT_MAX_PENDING = 1000
+# Views lose half their weight in the trending score every half-life (seconds);
+# /api/posts/trending/ is recomputed at most once per refresh period.
+BLOG_TRENDING_HALF_LIFE = 6 * 60 * 60
+BLOG_TRENDING_REFRESH = 60
+
+# Server-Timing headers and Prometheus metrics at /metrics (api.instrumentation).
+# Off unless asked for: both reveal per-route timings and query counts.
+BLOG_INSTRUMENTATION = os.environ.get('BLOG_INSTRUMENTATION', '0') == '1'
+# Bearer token scrapers send to /metrics; staff sessions need none.
+BLOG_METRICS_TOKEN = os.environ.get('BLOG_METRICS_TOKEN', '')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,8 +202,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework Configuration
 REST_FRAMEWORK = {
+    # Access tokens carry the user's role, so requests authenticate without
+    # queries; ACCESS_TOKEN_LIFETIME bounds how long a changed role goes unnoticed.
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.StatelessRoleAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -138,6 +213,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # Scoped rates, per user or (when anonymous) per client IP.
+    'DEFAULT_THROTTLE_RATES': {
+        'user_directory': '120/minute',
+    },
 }
 
 # JWT Configuration
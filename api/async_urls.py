@@ -0,0 +1,9 @@
+"""
+The API routes with every read endpoint that has an async implementation
+served natively on the event loop. Used instead of api.urls when
+BLOG_ASYNC_READS is on (the default under asgi.py).
+"""
+from .async_views import with_async_reads
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = with_async_reads(sync_urlpatterns)
@@ -0,0 +1,119 @@
+"""
+Native async entry points for the read endpoints, used when the project is
+served over ASGI (see Multi_User_Blog_Backend/asgi.py and api/async_urls.py).
+
+A viewset opts in by defining `a<action>` coroutines (`alist`, `aretrieve`)
+next to its sync actions. GET and HEAD requests for those actions run on the
+event loop: authentication, permissions and content negotiation are DRF's
+own, the queries go through Django's async ORM, and a slow client waiting on
+its response holds a coroutine rather than a worker thread. Every other
+method falls through to the sync DRF view.
+
+Authentication runs on the event loop and must not query the database; the
+default StatelessRoleAuthentication reads the access token only. Permission
+and throttle checks (`initial()`) run in a worker thread.
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+from django.template.response import SimpleTemplateResponse
+from django.urls import URLPattern, URLResolver
+
+from .authentication import ROLE_CLAIM, RoleTokenUser
+
+ASYNC_METHODS = ('get', 'head')
+
+
+async def aget_object_or_404(queryset, **lookup):
+    """`get_object_or_404` for the async ORM, as DRF's `get_object()` uses it."""
+    try:
+        return await queryset.aget(**lookup)
+    except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+        raise Http404
+
+
+async def aauthenticate(request):
+    """Authenticate a DRF request from an async view without blocking the event loop."""
+    user = request.user
+    if isinstance(user, RoleTokenUser) and ROLE_CLAIM not in user.token:
+        # Tokens issued before the role claim existed look the role up.
+        await sync_to_async(lambda: user.role)()
+    return user
+
+
+def plain_response(response):
+    """
+    Render a DRF response into a plain HttpResponse. Django renders lazy
+    responses returned by async views in a worker thread; JSON rendering does
+    no I/O, so it is done on the event loop instead.
+    """
+    if not isinstance(response, SimpleTemplateResponse):
+        return response
+    response.render()
+    plain = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        plain[header] = value
+    return plain
+
+
+def async_read_view(viewset_class, actions, **initkwargs):
+    """
+    An async Django view for `viewset_class` routed like
+    `viewset_class.as_view(actions)`: reads run the viewset's `a<action>`
+    coroutine, other methods the sync view.
+    """
+    sync_view = sync_to_async(viewset_class.as_view(actions, **initkwargs))
+    action_map = dict(actions)
+    if 'get' in action_map and 'head' not in action_map:
+        action_map['head'] = action_map['get']
+
+    async def view(request, *args, **kwargs):
+        if request.method.lower() not in ASYNC_METHODS:
+            return await sync_view(request, *args, **kwargs)
+        self = viewset_class(**initkwargs)
+        self.action_map = action_map
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await aauthenticate(request)
+            # Throttles and version checks may do blocking I/O.
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await getattr(self, f'a{self.action}')(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return plain_response(self.response)
+
+    view.cls = viewset_class
+    view.actions = actions
+    view.initkwargs = initkwargs
+    view.csrf_exempt = True
+    return view
+
+
+def has_async_reads(callback):
+    cls = getattr(callback, 'cls', None)
+    actions = getattr(callback, 'actions', None)
+    return bool(actions) and hasattr(cls, f'a{actions.get("get")}')
+
+
+def with_async_reads(patterns):
+    """Copy of a URL pattern list with every viewset route that has async reads served by `async_read_view`."""
+    converted = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(
+                pattern.pattern, with_async_reads(pattern.url_patterns), pattern.default_kwargs,
+                pattern.app_name, pattern.namespace,
+            )
+        elif has_async_reads(pattern.callback):
+            callback = pattern.callback
+            pattern = URLPattern(
+                pattern.pattern, async_read_view(callback.cls, callback.actions, **callback.initkwargs),
+                pattern.default_args, pattern.name,
+            )
+        converted.append(pattern)
+    return converted
@@ -0,0 +1,68 @@
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import UserProfile
+
+ROLE_CLAIM = 'role'
+
+
+def lookup_role(user_id):
+    return UserProfile.objects.filter(user_id=user_id).values_list('role', flat=True).first()
+
+
+class RoleRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's role as a claim.
+
+    The role is re-read from the database whenever an access token is minted
+    from a refresh token, so a role change reaches clients within one access
+    token lifetime.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        profile = getattr(user, 'userprofile', None)
+        token[ROLE_CLAIM] = profile.role if profile is not None else None
+        token._role_is_fresh = True
+        return token
+
+    @property
+    def access_token(self):
+        if not getattr(self, '_role_is_fresh', False):
+            self[ROLE_CLAIM] = lookup_role(self.payload.get(api_settings.USER_ID_CLAIM))
+            self._role_is_fresh = True
+        return super().access_token
+
+
+class RoleTokenUser(TokenUser):
+    @cached_property
+    def id(self):
+        # Claims are strings; compare equal to User.pk and Post.author_id.
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def role(self):
+        if ROLE_CLAIM in self.token:
+            return self.token[ROLE_CLAIM]
+        # Tokens issued before the role claim existed.
+        return lookup_role(self.id)
+
+
+class StatelessRoleAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates from the access token alone: no user or profile query.
+
+    request.user is a RoleTokenUser whose `id` and `role` come from the token
+    claims.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        return RoleTokenUser(validated_token)
@@ -0,0 +1,162 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .counters import CounterDelta
+from .models import Category, Post, Tag
+from .permissions import CanViewPublishedOnly, IsOwnerOrAdminOrReadOnly
+from .serializers import PostBulkItemSerializer
+from .signals import posts_bulk_saved
+
+BATCH_SIZE = 1000
+
+
+class PostBulkWriter:
+    """
+    Create and update many posts with a fixed number of queries.
+
+    Items are validated one by one without queries, then category ids, tag ids
+    and the posts being updated are each checked with a single query for the
+    whole batch. Valid items are written with bulk_create/bulk_update and
+    their tag through-rows in one batch; invalid items are reported and
+    skipped. `results` holds one entry per input item, in order.
+    """
+    update_fields = ['title', 'content', *Post.RENDERED_FIELDS, 'category', 'status', 'published_at', 'updated_at']
+
+    def __init__(self, request, view, items):
+        self.request = request
+        self.view = view
+        self.items = items
+        self.results = [None] * len(items)
+
+    def fail(self, index, errors):
+        self.results[index] = {'index': index, 'status': 'error', 'errors': errors}
+
+    def validate(self):
+        # One serializer per mode, reused for every item: building a
+        # ModelSerializer's fields costs more than validating an item.
+        serializers = {False: PostBulkItemSerializer(), True: PostBulkItemSerializer(partial=True)}
+        valid = []
+        for index, item in enumerate(self.items):
+            partial = isinstance(item, dict) and 'id' in item
+            try:
+                valid.append((index, serializers[partial].run_validation(item)))
+            except ValidationError as exc:
+                self.fail(index, exc.detail)
+
+        category_ids = {data['category'] for _, data in valid if data.get('category') is not None}
+        tag_ids = {tag_id for _, data in valid for tag_id in data.get('tag_ids', [])}
+        post_ids = {data['id'] for _, data in valid if 'id' in data}
+        known_categories = set(Category.objects.filter(id__in=category_ids).values_list('id', flat=True))
+        known_tags = set(Tag.objects.filter(id__in=tag_ids).values_list('id', flat=True))
+        self.existing = Post.objects.in_bulk(post_ids) if post_ids else {}
+
+        checked, seen_ids = [], set()
+        for index, data in valid:
+            errors = {}
+            if 'id' in data:
+                if data['id'] in seen_ids:
+                    errors['id'] = ['Duplicate id in this batch.']
+                seen_ids.add(data['id'])
+            if data.get('category') is not None and data['category'] not in known_categories:
+                errors['category'] = [f'Invalid pk "{data["category"]}" - object does not exist.']
+            unknown_tags = [tag_id for tag_id in data.get('tag_ids', []) if tag_id not in known_tags]
+            if unknown_tags:
+                errors['tag_ids'] = [f'Invalid tag ids: {unknown_tags}']
+            if 'id' in data and not errors.get('id'):
+                post = self.existing.get(data['id'])
+                if post is None:
+                    errors['id'] = ['Not found.']
+                elif not self.can_update(post):
+                    errors['id'] = ['You do not have permission to perform this action.']
+            if errors:
+                self.fail(index, errors)
+            else:
+                checked.append((index, data))
+        return checked
+
+    def can_update(self, post):
+        return all(
+            permission.has_object_permission(self.request, self.view, post)
+            for permission in (IsOwnerOrAdminOrReadOnly(), CanViewPublishedOnly())
+        )
+
+    def save(self):
+        checked = self.validate()
+        now = timezone.now()
+        created, updated, retagged = [], [], []
+        for index, data in checked:
+            if 'id' in data:
+                post = self.existing[data['id']]
+                updated.append((index, post))
+            else:
+                post = Post(author_id=self.request.user.id)
+                created.append((index, post))
+            for field in ('title', 'content', 'status'):
+                if field in data:
+                    setattr(post, field, data[field])
+            if 'content' in data:
+                post.render_content()
+            if 'category' in data:
+                post.category_id = data['category']
+            post.stamp_published_at(now)
+            post.updated_at = now
+            if 'tag_ids' in data:
+                retagged.append((post, dict.fromkeys(data['tag_ids'])))
+
+        with transaction.atomic():
+            old_tags = {}
+            if updated:
+                rows = Post.tags.through.objects.filter(
+                    post_id__in=[post.id for _, post in updated]
+                ).values_list('post_id', 'tag_id')
+                for post_id, tag_id in rows:
+                    old_tags.setdefault(post_id, []).append(tag_id)
+            Post.objects.bulk_create([post for _, post in created], batch_size=BATCH_SIZE)
+            if updated:
+                Post.objects.bulk_update(
+                    [post for _, post in updated], self.update_fields, batch_size=BATCH_SIZE
+                )
+                # tag_ids replaces an updated post's tags, like PostSerializer.update.
+                Post.tags.through.objects.filter(
+                    post_id__in=[post.id for post, _ in retagged if post.id in self.existing]
+                ).delete()
+            Post.tags.through.objects.bulk_create(
+                [
+                    Post.tags.through(post_id=post.id, tag_id=tag_id)
+                    for post, tag_ids in retagged for tag_id in tag_ids
+                ],
+                batch_size=BATCH_SIZE,
+            )
+            self.count(
+                created, updated, old_tags, {post.id: tag_ids for post, tag_ids in retagged}
+            ).apply(Post.objects.db)
+            posts = [post for _, post in created + updated]
+            if posts:
+                tag_changes = []
+                for post, tag_ids in retagged:
+                    old, new = set(old_tags.get(post.id, ())), set(tag_ids)
+                    tag_changes.append((post.id, old - new, new - old))
+                posts_bulk_saved.send(
+                    sender=Post, posts=posts, using=Post.objects.db, tag_changes=tag_changes
+                )
+
+        for index, post in created:
+            self.results[index] = {'index': index, 'status': 'created', 'id': post.id}
+        for index, post in updated:
+            self.results[index] = {'index': index, 'status': 'updated', 'id': post.id}
+        return self.results
+
+    def count(self, created, updated, old_tags, new_tags):
+        """Counter changes for the saved posts (bulk writes send no post_save/m2m_changed)."""
+        delta = CounterDelta()
+        for _, post in created:
+            delta.add(post.status == 'published', post.category_id, new_tags.get(post.id, ()))
+        for _, post in updated:
+            old_status, old_category = post._counted_state
+            tags_before = old_tags.get(post.id, [])
+            delta.add(old_status == 'published', old_category, tags_before, sign=-1)
+            delta.add(post.status == 'published', post.category_id, new_tags.get(post.id, tags_before))
+            post._previous_counted_state = post._counted_state
+            post._counted_state = (post.status, post.category_id)
+        return delta
@@ -0,0 +1,89 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import urlencode
+
+POSTS_GENERATION = 'posts'
+REFERENCE_GENERATION = 'reference'
+# The published post counters of categories and tags, which change with
+# every publish; REFERENCE_GENERATION only with category and tag writes.
+COUNTERS_GENERATION = 'counters'
+
+
+def get_cache():
+    return caches[getattr(settings, 'BLOG_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(name):
+    return f'generation:{name}'
+
+
+def _initial_generation():
+    # Seeded from the clock rather than 1 so that a flushed or evicted counter
+    # never repeats a value that in-process copies may still be labelled with.
+    return time.time_ns() // 1000
+
+
+def get_generation(name):
+    cache = get_cache()
+    key = _generation_key(name)
+    generation = cache.get(key)
+    if generation is None:
+        initial = _initial_generation()
+        cache.add(key, initial, None)
+        generation = cache.get(key, initial)
+    return generation
+
+
+async def aget_generation(name):
+    """`get_generation()` for async views, through the cache's async API."""
+    cache = get_cache()
+    key = _generation_key(name)
+    generation = await cache.aget(key)
+    if generation is None:
+        initial = _initial_generation()
+        await cache.aadd(key, initial, None)
+        generation = await cache.aget(key, initial)
+    return generation
+
+
+def bump_generation(name):
+    cache = get_cache()
+    key = _generation_key(name)
+    cache.add(key, _initial_generation(), None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr().
+        generation = _initial_generation()
+        cache.set(key, generation, None)
+        return generation
+
+
+def bump_generation_on_commit(name):
+    """
+    Invalidate now and again once the surrounding transaction commits, so a
+    response rebuilt from pre-commit data in between is not served for long.
+    """
+    bump_generation(name)
+    transaction.on_commit(lambda: bump_generation(name))
+
+
+def response_cache_key(request, scope, generation):
+    params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    raw = f'{request.get_host()}{request.path}?{urlencode(params, doseq=True)}'
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'response:{scope}:{generation}:{digest}'
+
+
+def get_cached_response_data(key):
+    return get_cache().get(key)
+
+
+def set_cached_response_data(key, data):
+    timeout = getattr(settings, 'BLOG_RESPONSE_CACHE_TIMEOUT', 300)
+    get_cache().set(key, data, timeout)
+
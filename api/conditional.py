@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+from contextlib import nullcontext
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, urlencode
+from rest_framework.response import Response
+
+from .cache import get_cached_response_data, set_cached_response_data
+from .replicas import primary_reads
+
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+
+def make_etag(request, *parts):
+    """Weak ETag over the request's path and query plus the given validator parts."""
+    params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    raw = '|'.join([request.path, urlencode(params, doseq=True), *map(str, parts)])
+    return 'W/"{}"'.format(hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+
+def validator_headers(etag, last_modified):
+    headers = {}
+    if etag is not None:
+        headers['ETag'] = etag
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(int(last_modified.timestamp()))
+    return headers
+
+
+def cached_response(view, request):
+    """(cache key, cached {'data', 'headers'} or None) for the view's shared response cache."""
+    get_key = getattr(view, 'get_response_cache_key', None)
+    cache_key = get_key() if get_key is not None else None
+    cached = get_cached_response_data(cache_key) if cache_key is not None else None
+    return cache_key, cached
+
+
+def filling_reads(cache_key, cached):
+    """Reads for a response about to be cached come from the primary (see api.replicas)."""
+    return primary_reads() if cache_key is not None and cached is None else nullcontext()
+
+
+def not_modified_response(request, etag, last_modified, headers):
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        for name, value in headers.items():
+            not_modified[name] = value
+    return not_modified
+
+
+def finish_response(response, headers, cache_key):
+    if response.status_code != 200:
+        return response
+    for name, value in headers.items():
+        response[name] = value
+    if cache_key is not None:
+        set_cached_response_data(cache_key, {'data': response.data, 'headers': headers})
+    return response
+
+
+def conditional(view_method):
+    """
+    Conditional GET plus response caching for a viewset read method.
+
+    Validators come from the view's `get_validators()` and are computed
+    without serializing the payload: If-None-Match/If-Modified-Since are
+    answered with 304. When the view's `get_response_cache_key()` returns a
+    key, the response body and its validator headers are cached under it, so
+    an unconditional hit costs no queries at all.
+
+    Also wraps `async def` read methods, which use the view's
+    `aget_validators()` if it has one and otherwise run `get_validators()` in
+    a worker thread.
+    """
+    if asyncio.iscoroutinefunction(view_method):
+        return async_conditional(view_method)
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        cache_key, cached = cached_response(self, request)
+        is_conditional = any(header in request.META for header in CONDITIONAL_HEADERS)
+        if cached is not None and not is_conditional:
+            return Response(cached['data'], headers=cached['headers'])
+
+        with filling_reads(cache_key, cached):
+            # Validators are computed before the body so they can never
+            # describe newer data than the response carries.
+            etag, last_modified = self.get_validators()
+            headers = validator_headers(etag, last_modified)
+            if is_conditional and headers:
+                not_modified = not_modified_response(request, etag, last_modified, headers)
+                if not_modified is not None:
+                    return not_modified
+            if cached is not None:
+                return Response(cached['data'], headers=cached['headers'])
+            return finish_response(view_method(self, request, *args, **kwargs), headers, cache_key)
+    return wrapper
+
+
+def async_conditional(view_method):
+    @wraps(view_method)
+    async def wrapper(self, request, *args, **kwargs):
+        # The cache key may read generations: cache I/O stays off the event loop.
+        cache_key, cached = await sync_to_async(cached_response)(self, request)
+        is_conditional = any(header in request.META for header in CONDITIONAL_HEADERS)
+        if cached is not None and not is_conditional:
+            return Response(cached['data'], headers=cached['headers'])
+
+        with filling_reads(cache_key, cached):
+            if hasattr(self, 'aget_validators'):
+                etag, last_modified = await self.aget_validators()
+            else:
+                etag, last_modified = await sync_to_async(self.get_validators)()
+            headers = validator_headers(etag, last_modified)
+            if is_conditional and headers:
+                not_modified = not_modified_response(request, etag, last_modified, headers)
+                if not_modified is not None:
+                    return not_modified
+            if cached is not None:
+                return Response(cached['data'], headers=cached['headers'])
+            return finish_response(await view_method(self, request, *args, **kwargs), headers, cache_key)
+    return wrapper
@@ -0,0 +1,84 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .cache import COUNTERS_GENERATION, bump_generation_on_commit
+
+COUNTER_FIELD = 'published_post_count'
+
+
+class CounterDelta:
+    """
+    Accumulates +/- changes to the published post counters of categories and
+    tags, then applies them with one F-expression UPDATE per distinct delta.
+
+    Must be applied inside the transaction that made the change.
+    """
+
+    def __init__(self):
+        self.categories = Counter()
+        self.tags = Counter()
+
+    def add(self, published, category_id=None, tag_ids=(), sign=1):
+        """Count (sign=1) or uncount (sign=-1) a post in its category and tags."""
+        if not published:
+            return
+        if category_id is not None:
+            self.categories[category_id] += sign
+        for tag_id in tag_ids:
+            self.tags[tag_id] += sign
+
+    def apply(self, using='default'):
+        from .models import Category, Tag
+        changed = False
+        for model, counts in ((Category, self.categories), (Tag, self.tags)):
+            by_delta = defaultdict(list)
+            for pk, delta in counts.items():
+                if delta:
+                    by_delta[delta].append(pk)
+            for delta, pks in by_delta.items():
+                # Clamped at zero so drift can never violate the unsigned
+                # column; repair_post_counters fixes any drift.
+                model.objects.using(using).filter(pk__in=pks).update(
+                    **{COUNTER_FIELD: Greatest(F(COUNTER_FIELD) + delta, Value(0))}
+                )
+                changed = True
+        if changed:
+            bump_generation_on_commit(COUNTERS_GENERATION)
+        self.categories.clear()
+        self.tags.clear()
+
+
+def actual_counts(category_model, tag_model, post_model):
+    """Subqueries computing each category's and tag's published post count."""
+    through = post_model.tags.through
+    category_counts = (
+        post_model.objects.filter(category=OuterRef('pk'), status='published')
+        .order_by().values('category').annotate(count=Count('id')).values('count')
+    )
+    tag_counts = (
+        through.objects.filter(tag=OuterRef('pk'), post__status='published')
+        .order_by().values('tag').annotate(count=Count('id')).values('count')
+    )
+    return (
+        Coalesce(Subquery(category_counts), Value(0)),
+        Coalesce(Subquery(tag_counts), Value(0)),
+    )
+
+
+def repair_counters(category_model, tag_model, post_model, using='default', dry_run=False):
+    """
+    Recompute every counter with one UPDATE per table. Returns the number of
+    categories and tags whose stored counter was wrong.
+    """
+    category_actual, tag_actual = actual_counts(category_model, tag_model, post_model)
+    drift = []
+    for model, actual in ((category_model, category_actual), (tag_model, tag_actual)):
+        queryset = model.objects.using(using)
+        drift.append(
+            queryset.annotate(actual=actual).exclude(**{COUNTER_FIELD: F('actual')}).count()
+        )
+        if not dry_run:
+            queryset.update(**{COUNTER_FIELD: actual})
+    return tuple(drift)
@@ -0,0 +1,131 @@
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .instrumentation import timed
+from .reference import reference_cache
+from .serializers import (
+    CategoryNameField, CategorySerializer, PostExportSerializer, PostListSerializer, TagSerializer
+)
+
+# Field classes whose representation of a model value is the value itself.
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.ChoiceField,
+    serializers.BooleanField, serializers.ReadOnlyField, serializers.PrimaryKeyRelatedField,
+)
+
+
+def iso_datetime(tz):
+    def convert(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+class FastSerializer:
+    """
+    Read-only twin of a DRF serializer that renders `.values()` rows.
+
+    The serializer's fields are compiled once into (key, lookup, converter)
+    columns, so serializing a row is a flat loop with no field dispatch or
+    attribute walks. The output is the same JSON the DRF serializer produces.
+    Anything added in a custom `to_representation` (e.g. search snippets) is
+    left to the caller.
+
+    `fields` (see api.sparse_fields) limits a call to those keys: the other
+    columns are neither selected nor serialized.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._columns = None
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            self._columns = [
+                self.compile_field(name, field)
+                for name, field in self.serializer_class().fields.items()
+                if not field.write_only
+            ]
+        return self._columns
+
+    @property
+    def keys(self):
+        return [key for key, _, _ in self.columns]
+
+    @property
+    def lookups(self):
+        return [lookup for _, lookup, _ in self.columns]
+
+    def compile_field(self, name, field):
+        if isinstance(field, CategoryNameField):
+            return name, 'category_id', 'category_name'
+        if field.source == '*':
+            raise ImproperlyConfigured(
+                f'{self.serializer_class.__name__}.{name} cannot be read from values() rows'
+            )
+        lookup = field.source.replace('.', '__')
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return name, f'{lookup}_id', None
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if output_format is not None and output_format.lower() == ISO_8601:
+                return name, lookup, field
+            return name, lookup, field.to_representation
+        if isinstance(field, PASSTHROUGH_FIELDS):
+            return name, lookup, None
+        raise ImproperlyConfigured(
+            f'{self.serializer_class.__name__}.{name} ({type(field).__name__}) has no fast path'
+        )
+
+    def selected(self, fields=None):
+        if fields is None:
+            return self.columns
+        return [column for column in self.columns if column[0] in fields]
+
+    def values(self, queryset, *extra, fields=None):
+        """`queryset.values()` with every column this serializer reads (or `fields` need), plus `extra`."""
+        lookups = [lookup for _, lookup, _ in self.selected(fields)]
+        return queryset.values(*lookups, *[lookup for lookup in extra if lookup not in lookups])
+
+    def bind(self, snapshot=None, fields=None):
+        # Converters that depend on per-request state (active timezone,
+        # reference snapshot) are resolved once per call, not per row.
+        columns = []
+        for key, lookup, converter in self.selected(fields):
+            if converter == 'category_name':
+                names = (snapshot or reference_cache.get()).category_names
+                converter = lambda category_id, names=names: (
+                    names.get(category_id) or reference_cache.category_name(category_id)
+                )
+            elif isinstance(converter, serializers.DateTimeField):
+                tz = converter.timezone if hasattr(converter, 'timezone') else converter.default_timezone()
+                converter = iso_datetime(tz) if tz is not None else converter.to_representation
+            columns.append((key, lookup, converter))
+        return columns
+
+    def serialize(self, rows, snapshot=None, fields=None):
+        with timed('serialize'):
+            return list(self.stream(rows, snapshot, fields))
+
+    def stream(self, rows, snapshot=None, fields=None):
+        """
+        Lazily serialize an iterable of rows, e.g. `QuerySet.iterator()`.
+        Category names come from `snapshot` if given, else the reference cache.
+        """
+        columns = self.bind(snapshot, fields)
+        for row in rows:
+            item = {}
+            for key, lookup, converter in columns:
+                value = row[lookup]
+                item[key] = value if value is None or converter is None else converter(value)
+            yield item
+
+
+post_list_serializer = FastSerializer(PostListSerializer)
+post_export_serializer = FastSerializer(PostExportSerializer)
+category_serializer = FastSerializer(CategorySerializer)
+tag_serializer = FastSerializer(TagSerializer)
@@ -0,0 +1,171 @@
+"""
+Atom and RSS feeds of the newest published posts per category, tag and author:
+
+    /api/feeds/category/<id>/atom/    /api/feeds/tag/<id>/rss/    /api/feeds/author/<id>/atom/
+
+Feed readers poll far more often than posts change, so every feed document
+is rendered once and cached, together with its ETag and Last-Modified, under
+the current version of its scope. A poll costs two or three cache reads and
+no query: If-None-Match/If-Modified-Since are answered with 304, anything
+else with the cached document.
+
+Writes bump only the versions of the scopes they touch (`invalidate_feeds`,
+see api.signals): the post's old and new category, its author and its tags,
+and only when the post was or is published. Category and tag changes move
+the reference generation, which is part of every key, since their names are
+in the documents. Last-Modified is the newest `updated_at` in the document,
+or the last invalidation of its scope if later, so it never goes backwards
+when a post leaves a feed.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .cache import REFERENCE_GENERATION, bump_generation, get_cache, get_generation
+from .models import Category, Post, Tag
+from .reference import reference_cache
+from .replicas import primary_reads
+
+FEED_SIZE = 50
+FEED_FORMATS = {'atom': Atom1Feed, 'rss': Rss201rev2Feed}
+# scope -> (post filter, post list query parameter, title)
+SCOPES = {
+    'category': ('category_id', 'category', 'Category'),
+    'tag': ('tags', 'tags', 'Tag'),
+    'author': ('author_id', 'author', 'Author'),
+}
+
+
+def _scope_name(scope, pk):
+    return f'feed:{scope}:{pk}'
+
+
+def _changed_key(scope, pk):
+    return f'feed:changed:{scope}:{pk}'
+
+
+def post_feed_scopes(category_id, author_id, tag_ids=()):
+    """The (scope, id) feeds a published post appears in."""
+    scopes = {('author', author_id)}
+    if category_id is not None:
+        scopes.add(('category', category_id))
+    scopes.update(('tag', tag_id) for tag_id in tag_ids)
+    return scopes
+
+
+def invalidate_feeds(scopes, using='default'):
+    """
+    Move the given (scope, id) feeds to a new version, now and again once the
+    surrounding transaction commits (like bump_generation_on_commit).
+    """
+    scopes = set(scopes)
+    if not scopes:
+        return
+
+    def bump():
+        for scope, pk in scopes:
+            bump_generation(_scope_name(scope, pk))
+        get_cache().set_many({_changed_key(scope, pk): time.time() for scope, pk in scopes}, None)
+
+    bump()
+    transaction.on_commit(bump, using=using)
+
+
+def render_feed(request, scope, pk, feed_format):
+    """The feed document with its validators, or Http404 for an unknown scope object."""
+    post_filter, list_param, label = SCOPES[scope]
+    snapshot = reference_cache.get()
+    if scope == 'category':
+        name = snapshot.category_names.get(pk)
+        if name is None:
+            name = Category.objects.filter(pk=pk).values_list('name', flat=True).first()
+    elif scope == 'tag':
+        name = snapshot.tags_by_id.get(pk, {}).get('name')
+        if name is None:
+            name = Tag.objects.filter(pk=pk).values_list('name', flat=True).first()
+    else:
+        name = User.objects.filter(pk=pk).values_list('username', flat=True).first()
+    if name is None:
+        raise Http404
+
+    # In the post list's default order, which the category and author
+    # indexes serve without a sort.
+    posts = list(
+        Post.objects.filter(status='published', **{post_filter: pk})
+        .order_by('-created_at', '-id')
+        .values('id', 'title', 'excerpt', 'author__username', 'created_at', 'published_at', 'updated_at')
+        [:FEED_SIZE]
+    )
+    tag_names = {}
+    tagged = Post.tags.through.objects.filter(post_id__in=[post['id'] for post in posts])
+    for post_id, tag_id in tagged.values_list('post_id', 'tag_id'):
+        tag = snapshot.tags_by_id.get(tag_id)
+        if tag is not None:
+            tag_names.setdefault(post_id, []).append(tag['name'])
+
+    feed = FEED_FORMATS[feed_format](
+        title=f'{label}: {name}',
+        link=request.build_absolute_uri(f'/api/posts/?{list_param}={pk}'),
+        description=f'Newest published posts, {label.lower()} {name}',
+        feed_url=request.build_absolute_uri(),
+        language=settings.LANGUAGE_CODE,
+    )
+    for post in posts:
+        link = request.build_absolute_uri(f'/api/posts/{post["id"]}/')
+        feed.add_item(
+            title=post['title'],
+            link=link,
+            description=post['excerpt'],
+            author_name=post['author__username'],
+            pubdate=post['published_at'] or post['created_at'],
+            updateddate=post['updated_at'],
+            unique_id=link,
+            categories=sorted(tag_names.get(post['id'], [])),
+        )
+    body = feed.writeString('utf-8')
+    last_modified = max((post['updated_at'].timestamp() for post in posts), default=0)
+    changed = get_cache().get(_changed_key(scope, pk))
+    return {
+        'body': body,
+        'content_type': feed.content_type,
+        'etag': quote_etag(hashlib.md5(body.encode('utf-8')).hexdigest()),
+        'last_modified': int(max(last_modified, changed or 0)) or None,
+    }
+
+
+@require_safe
+def feed_view(request, scope, pk, feed_format):
+    if scope not in SCOPES or feed_format not in FEED_FORMATS:
+        raise Http404
+    # The host is part of the key: the documents hold absolute links. Category
+    # and tag names come from the reference generation, which counter updates
+    # leave alone, so a publish only moves the feeds of its own scopes.
+    host = hashlib.md5(request.get_host().encode('utf-8')).hexdigest()[:12]
+    key = (
+        f'feed:document:{scope}:{pk}:{feed_format}:{host}:'
+        f'{get_generation(_scope_name(scope, pk))}:{get_generation(REFERENCE_GENERATION)}'
+    )
+    cache = get_cache()
+    document = cache.get(key)
+    if document is None:
+        with primary_reads():
+            document = render_feed(request, scope, pk, feed_format)
+        cache.set(key, document, getattr(settings, 'BLOG_FEED_CACHE_TIMEOUT', 60 * 60))
+
+    response = get_conditional_response(
+        request, etag=document['etag'], last_modified=document['last_modified']
+    )
+    if response is None:
+        response = HttpResponse(document['body'], content_type=document['content_type'])
+    response['ETag'] = document['etag']
+    if document['last_modified'] is not None:
+        response['Last-Modified'] = http_date(document['last_modified'])
+    return response
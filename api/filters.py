@@ -0,0 +1,94 @@
+import django_filters
+from django.contrib.auth.models import User
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from .models import UserProfile
+from .reference import reference_cache
+from .search import format_snippet, get_search_backend
+from .tag_index import TagExpressionError, parse_tag_expression, tag_expression_q, tag_index, tag_names
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    `?search=` backed by the post search index instead of LIKE scans.
+
+    Results are ordered by relevance unless the client asks for an explicit
+    `?ordering=`, so this backend must run after OrderingFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        queryset = get_search_backend(queryset.db).search(queryset, terms)
+        if api_settings.ORDERING_PARAM not in request.query_params and 'search_rank' in queryset.query.extra:
+            queryset = queryset.order_by('-search_rank', '-created_at', '-id')
+        return queryset
+
+    def add_snippets(self, request, rows, using):
+        """Add a highlighted `snippet` to a serialized page of posts returned by a search."""
+        terms = self.get_search_terms(request)
+        if not terms or not rows:
+            return
+        snippets = get_search_backend(using).snippets([row['id'] for row in rows], terms)
+        for row in rows:
+            snippet = snippets.get(row['id'])
+            if snippet is not None:
+                row['snippet'] = format_snippet(snippet)
+
+
+class TagExpressionFilter(filters.BaseFilterBackend):
+    """
+    `?tag_expr=python AND (django OR flask) AND NOT beginners`: boolean tag
+    filtering evaluated on the in-memory tag index (api.tag_index). The
+    matching ids reach the database as one `id__in` (or `NOT IN`) list; a
+    result larger than `max_ids` is pushed down as subqueries instead.
+    """
+    query_param = 'tag_expr'
+    max_ids = 10_000
+
+    def filter_queryset(self, request, queryset, view):
+        expression = request.query_params.get(self.query_param)
+        if not expression:
+            return queryset
+        try:
+            node = parse_tag_expression(expression)
+        except TagExpressionError as exc:
+            raise ValidationError({self.query_param: [str(exc)]})
+        names = tag_names(node)
+        tag_ids = reference_cache.tag_ids_by_name(names)
+        unknown = sorted(names - tag_ids.keys())
+        if unknown:
+            raise ValidationError({self.query_param: [f'Unknown tags: {", ".join(unknown)}']})
+        post_ids, negated = tag_index.evaluate(node, tag_ids)
+        if len(post_ids) > self.max_ids:
+            return queryset.filter(tag_expression_q(node, tag_ids))
+        post_ids = post_ids.tolist()
+        if negated:
+            return queryset.exclude(id__in=post_ids)
+        return queryset.filter(id__in=post_ids)
+
+
+class UsernamePrefixSearchFilter(filters.SearchFilter):
+    """
+    `?search=` as a case-sensitive username prefix, written as a range so the
+    unique username index serves it on every database (LIKE 'x%' does not use
+    a plain index on SQLite or PostgreSQL).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        prefix = terms[0]
+        return queryset.filter(username__gte=prefix, username__lt=prefix + '\U0010ffff')
+
+
+class UserFilter(django_filters.FilterSet):
+    role = django_filters.ChoiceFilter(field_name='userprofile__role', choices=UserProfile.ROLE_CHOICES)
+
+    class Meta:
+        model = User
+        fields = ['username', 'role']
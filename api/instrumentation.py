@@ -0,0 +1,300 @@
+"""
+Per-request performance instrumentation, switched on and off as a whole by
+BLOG_INSTRUMENTATION.
+
+InstrumentationMiddleware times every request. It counts the queries and
+their time on every database alias through `connection.execute_wrapper`.
+For the api viewsets (InstrumentedViewMixin), it also times these phases:
+
+    auth        authentication
+    perm        permission checks
+    filter      filter_queryset (filter backends, search, ordering)
+    serialize   serializer output, compiled or DRF (queries it runs included)
+    render      response rendering
+
+Each response carries them as a `Server-Timing` header, e.g.
+
+    Server-Timing: db;dur=3.1;desc="4 queries", auth;dur=0.1, ..., total;dur=9.8
+
+and they are aggregated per route (URL name) and method into histograms
+served in the Prometheus text format at /metrics. Metrics are per process:
+each worker exposes its own, and Prometheus sums across the scraped workers.
+
+/metrics answers staff sessions and requests bearing BLOG_METRICS_TOKEN
+(`Authorization: Bearer <token>`, as Prometheus' `authorization` scrape
+option sends it); everyone else gets a 403.
+
+Instrumentation is opt-in (BLOG_INSTRUMENTATION). Off, the middleware is not
+loaded, /metrics is a 404, and the view hooks are one attribute lookup each.
+"""
+import bisect
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+from rest_framework.response import Response
+
+PHASES = ('auth', 'perm', 'filter', 'serialize', 'render')
+# Seconds; Prometheus' default buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def is_enabled():
+    return getattr(settings, 'BLOG_INSTRUMENTATION', False)
+
+
+class RequestTimings:
+    """What one request spent, in seconds per phase, plus its queries."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        self.db = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self, total):
+        entries = [f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"']
+        entries.extend(
+            f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in self.phases.items() if seconds
+        )
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+_local = Local()
+
+
+def current_timings():
+    return getattr(_local, 'timings', None)
+
+
+class timed:
+    """Add the time spent in the block to `phase` of the current request, if it is timed."""
+
+    __slots__ = ('phase', 'timings', 'started')
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.timings = current_timings()
+        if self.timings is not None:
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.phases[self.phase] += time.perf_counter() - self.started
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Per-process request metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.durations = {}
+        self.phases = {}
+        self.requests = {}
+        self.queries = {}
+
+    def _histogram(self, series, key):
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(LATENCY_BUCKETS)
+        return histogram
+
+    def observe(self, route, method, status_code, total, timings):
+        labels = (('route', route), ('method', method))
+        with self._lock:
+            self._histogram(self.durations, labels).observe(total)
+            self._histogram(self.phases, (*labels, ('phase', 'db'))).observe(timings.db)
+            for phase, seconds in timings.phases.items():
+                if seconds:
+                    self._histogram(self.phases, (*labels, ('phase', phase))).observe(seconds)
+            status_labels = (*labels, ('status', str(status_code)))
+            self.requests[status_labels] = self.requests.get(status_labels, 0) + 1
+            self.queries[labels] = self.queries.get(labels, 0) + timings.queries
+
+    def render(self):
+        lines = []
+        with self._lock:
+            self._render_histograms(
+                lines, 'blog_request_duration_seconds', 'Request latency by route.', self.durations
+            )
+            self._render_histograms(
+                lines, 'blog_request_phase_seconds',
+                'Time spent per request phase (db, auth, perm, filter, serialize, render) by route.', self.phases,
+            )
+            self._render_counter(lines, 'blog_requests_total', 'Requests by route and status.', self.requests)
+            self._render_counter(lines, 'blog_db_queries_total', 'Database queries by route.', self.queries)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _labels(labels, *extra):
+        pairs = [*labels, *extra]
+        return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+    def _render_histograms(self, lines, name, help_text, series):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for labels, histogram in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{self._labels(labels, ("le", str(bound)))} {cumulative}')
+            lines.append(f'{name}_sum{self._labels(labels)} {histogram.sum!r}')
+            lines.append(f'{name}_count{self._labels(labels)} {cumulative}')
+
+    def _render_counter(self, lines, name, help_text, series):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for labels, value in sorted(series.items()):
+            lines.append(f'{name}{self._labels(labels)} {value}')
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = MetricsRegistry()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class InstrumentationMiddleware:
+    """Times each request and reports it in `Server-Timing` and /metrics (see module docstring)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def wrap_connections(stack, timings):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings.record_query))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = _local.timings = RequestTimings()
+        try:
+            with ExitStack() as stack:
+                self.wrap_connections(stack, timings)
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = _local.timings = RequestTimings()
+        # Queries run in the request's sync thread; its connections are the ones to wrap.
+        stack = ExitStack()
+        try:
+            await sync_to_async(self.wrap_connections)(stack, timings)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _local.timings = None
+        return self.report(request, response, timings)
+
+    def report(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.server_timing(total)
+        route = route_name(request)
+        if route != 'metrics':
+            metrics.observe(route, request.method, response.status_code, total, timings)
+        return response
+
+
+class InstrumentedViewMixin:
+    """Times a DRF view's authentication, permission, filter, serialization and render phases."""
+
+    def perform_authentication(self, request):
+        with timed('auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with timed('perm'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with timed('perm'):
+            super().check_object_permissions(request, obj)
+
+    def filter_queryset(self, queryset):
+        with timed('filter'):
+            return super().filter_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current_timings() is not None:
+            to_representation = serializer.to_representation
+
+            def timed_to_representation(instance):
+                with timed('serialize'):
+                    return to_representation(instance)
+            serializer.to_representation = timed_to_representation
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if current_timings() is not None and isinstance(response, Response):
+            # Rendered here rather than by the handler, so it can be timed.
+            with timed('render'):
+                response.render()
+        return response
+
+
+def may_read_metrics(request):
+    token = getattr(settings, 'BLOG_METRICS_TOKEN', '')
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_active and user.is_staff
+
+
+@require_safe
+def metrics_view(request):
+    if not is_enabled():
+        raise Http404
+    if not may_read_metrics(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.authentication import RoleRefreshToken
+from api.models import Category, Post, Tag, UserProfile
+
+MODES = ('wsgi', 'asgi')
+
+
+def current_rss_kb():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Sampler:
+    """Peak thread count while a run is in flight (RSS peaks come from getrusage)."""
+
+    def __init__(self):
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.sample, daemon=True)
+
+    def sample(self):
+        while not self._stop.wait(0.005):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput and memory per connection of the WSGI and ASGI deployments '
+        'for the read endpoints, with slow clients, in-process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 500],
+                            help='Connections in flight at once')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per run')
+        parser.add_argument('--client-delay', type=float, default=0.05,
+                            help='Seconds each client takes to read its response')
+        parser.add_argument('--paths', nargs='+',
+                            help='Endpoints to cycle through (default: post list/detail, categories, tags, my-posts)')
+        parser.add_argument('--worker', choices=MODES, help='Internal: run one mode in this process')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            return self.work(options)
+        if not Post.objects.exists() or not self.get_user():
+            raise CommandError('No posts or editors to read; run generate_dataset first')
+        self.stdout.write(
+            f'{"mode":<6}{"conns":>7}{"req/s":>10}{"p50 ms":>9}{"p95 ms":>9}'
+            f'{"errors":>8}{"threads":>9}{"KB/conn":>9}'
+        )
+        for concurrency in options['concurrency']:
+            for mode in MODES:
+                result = self.spawn(mode, concurrency, options)
+                self.stdout.write(
+                    f'{mode:<6}{concurrency:>7}{result["rps"]:>10,.0f}{result["p50"]:>9.1f}'
+                    f'{result["p95"]:>9.1f}{result["errors"]:>8}{result["threads"]:>9}'
+                    f'{result["kb_per_connection"]:>9.1f}'
+                )
+
+    def spawn(self, mode, concurrency, options):
+        # Each run gets a fresh process so memory is measured from a clean
+        # baseline and the URLconf matches the deployment (asgi.py turns on
+        # BLOG_ASYNC_READS).
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_asgi', '--worker', mode,
+            '--concurrency', str(concurrency), '--requests', str(options['requests']),
+            '--client-delay', str(options['client_delay']),
+        ]
+        if options['paths']:
+            command += ['--paths', *options['paths']]
+        env = dict(os.environ, BLOG_ASYNC_READS='1' if mode == 'asgi' else '0')
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f'{mode} run failed:\n{completed.stderr}')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def get_user(self):
+        profile = (
+            UserProfile.objects.filter(role__in=['admin', 'editor'])
+            .select_related('user').order_by('user_id').first()
+        )
+        return profile.user if profile else None
+
+    def get_paths(self, options):
+        if options['paths']:
+            return options['paths']
+        post_id = Post.objects.order_by('-created_at', '-id').values_list('id', flat=True).first()
+        paths = ['/api/posts/', f'/api/posts/{post_id}/', '/api/categories/', '/api/tags/', '/api/my-posts/']
+        category_id = Category.objects.values_list('id', flat=True).first()
+        if category_id:
+            paths.append(f'/api/categories/{category_id}/')
+        tag_id = Tag.objects.values_list('id', flat=True).first()
+        if tag_id:
+            paths.append(f'/api/tags/{tag_id}/')
+        return paths
+
+    def work(self, options):
+        # Query logging would grow memory with every request.
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        token = f'Bearer {RoleRefreshToken.for_user(self.get_user()).access_token}'
+        paths = self.get_paths(options)
+        requests = [paths[i % len(paths)] for i in range(options['requests'])]
+        # A worker runs a single concurrency level.
+        concurrency, delay = options['concurrency'][0], options['client_delay']
+        run = self.run_wsgi if options['worker'] == 'wsgi' else self.run_asgi
+
+        # Warm up imports, the reference snapshot and connections first.
+        run(paths * 2, min(concurrency, len(paths)), 0, token)
+        baseline_kb = current_rss_kb()
+        started = time.perf_counter()
+        with Sampler() as sampler:
+            results = run(requests, concurrency, delay, token)
+        elapsed = time.perf_counter() - started
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        latencies = sorted(latency for _, latency in results)
+        self.stdout.write(json.dumps({
+            'rps': len(results) / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            'errors': sum(1 for code, _ in results if code != 200),
+            'threads': sampler.peak_threads,
+            'kb_per_connection': max(peak_kb - baseline_kb, 0) / concurrency,
+        }))
+
+    def run_wsgi(self, paths, concurrency, delay, token):
+        """One thread per connection, as a threaded WSGI server (gunicorn gthread) runs."""
+        from django.core.wsgi import get_wsgi_application
+        application = get_wsgi_application()
+
+        def request(path):
+            url = urlsplit(path)
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+                'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': token, 'wsgi.input': BytesIO(),
+            }
+            setup_testing_defaults(environ)
+            status = []
+            started = time.perf_counter()
+            body = application(environ, lambda code, headers, exc_info=None: status.append(code))
+            try:
+                for _ in body:
+                    # A slow client keeps the worker thread busy while it reads.
+                    time.sleep(delay)
+            finally:
+                body.close()
+            return int(status[0].split()[0]), time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(request, paths))
+
+    def run_asgi(self, paths, concurrency, delay, token):
+        """All connections on one event loop, as a single uvicorn/daphne worker runs them."""
+        from django.core.asgi import get_asgi_application
+        application = get_asgi_application()
+
+        async def request(path, slots):
+            url = urlsplit(path)
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(),
+                'query_string': url.query.encode(), 'root_path': '',
+                'headers': [(b'host', b'testserver'), (b'authorization', token.encode())],
+                'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+            }
+            received = False
+            status = []
+            finished = asyncio.Event()
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif not message.get('more_body'):
+                    # A slow client only holds this coroutine while it reads.
+                    await asyncio.sleep(delay)
+                    finished.set()
+
+            async with slots:
+                started = time.perf_counter()
+                await application(scope, receive, send)
+                return status[0], time.perf_counter() - started
+
+        async def main():
+            slots = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(request(path, slots) for path in paths))
+
+        return asyncio.run(main())
@@ -0,0 +1,396 @@
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+from wsgiref.util import setup_testing_defaults
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+from django.db.models import Count
+
+from api.authentication import RoleRefreshToken
+from api.models import Category, Post, Tag, UserProfile
+from api.rendering import render_content
+from api.view_counts import trending_update
+
+from .benchmark_search import make_vocabulary
+
+BENCHMARK_USERNAME = 'benchmark-editor'
+BENCHMARK_PASSWORD = 'benchmark-password'
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'endpoints_baseline.json'
+# Options a baseline is only comparable under.
+COMPARED_OPTIONS = ('posts', 'users', 'seed', 'processes', 'threads', 'requests', 'rounds')
+
+# (name, method, path, body, share of --requests). Paths and bodies are
+# formatted with the targets picked from the seeded data (see get_targets).
+# Writes (create, update, bulk) are left out: they would change the dataset
+# between runs, and SQLite serializes them across processes.
+ENDPOINTS = [
+    ('post-list', 'GET', '/api/posts/', None, 1),
+    ('post-list-deep-page', 'GET', '/api/posts/?page=100', None, 1),
+    ('post-list-cursor', 'GET', '/api/posts/?pagination=cursor&ordering=-published_at', None, 1),
+    ('post-list-sparse', 'GET', '/api/posts/?fields=id,title,status', None, 1),
+    ('post-search', 'GET', '/api/posts/?search={word}', None, 1),
+    ('post-filter', 'GET', '/api/posts/?category={category}&status=published&ordering=-published_at', None, 1),
+    ('post-tag-expression', 'GET', '/api/posts/?{tag_expr}', None, 1),
+    ('post-detail', 'GET', '/api/posts/{post}/', None, 1),
+    ('post-related', 'GET', '/api/posts/{post}/related/', None, 1),
+    ('post-trending', 'GET', '/api/posts/trending/', None, 1),
+    ('post-export', 'GET', '/api/posts/export/?author={author}&status=draft', None, 1),
+    ('my-posts', 'GET', '/api/my-posts/', None, 1),
+    ('my-posts-summary', 'GET', '/api/my-posts/summary/', None, 1),
+    ('categories', 'GET', '/api/categories/', None, 1),
+    ('category-detail', 'GET', '/api/categories/{category}/', None, 1),
+    ('category-stats', 'GET', '/api/categories/stats/', None, 1),
+    ('tags', 'GET', '/api/tags/', None, 1),
+    ('tag-detail', 'GET', '/api/tags/{tag}/', None, 1),
+    ('tag-cloud', 'GET', '/api/tags/cloud/', None, 1),
+    ('users', 'GET', '/api/user/', None, 1),
+    ('user-detail', 'GET', '/api/user/{author}/', None, 1),
+    ('feed', 'GET', '/api/feeds/category/{category}/atom/', None, 1),
+    # Password hashing makes logins slow by design; fewer of them keep runs short.
+    ('auth-login', 'POST', '/api/auth/login/', {'username': '{username}', 'password': BENCHMARK_PASSWORD}, 0.1),
+    ('auth-refresh', 'POST', '/api/auth/refresh/', {'refresh': '{refresh}'}, 1),
+]
+# api routes with no entry in ENDPOINTS: the browsable root and bulk writes.
+UNBENCHMARKED_ROUTES = ('api-root', 'post-bulk')
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def calibrate(rounds=7):
+    """
+    Median milliseconds of a fixed CPU-bound workload (JSON round trip and a
+    Markdown render). Baselines are scaled by it, so a slower or busier
+    machine does not read as a regression.
+    """
+    payload = [{'id': i, 'title': f'Post {i}', 'tags': list(range(i % 5))} for i in range(2000)]
+    markdown = '\n\n'.join(f'## Part {i}\n\nSome *text* with a [link](https://example.com/{i}).' for i in range(50))
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        json.loads(json.dumps(payload))
+        render_content(markdown)
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+def summarize(latencies, requests_per_second, errors):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(requests_per_second, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every API route in-process on a seeded dataset, from parallel worker '
+        'processes and threads, and compare p50/p95 latency and throughput with a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20_000, help='Posts in the seeded dataset')
+        parser.add_argument('--users', type=int, default=500, help='Users in the seeded dataset')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--database-file',
+                            help='SQLite file to seed and benchmark (default: one per dataset in the temp dir)')
+        parser.add_argument('--reseed', action='store_true', help='Seed the database file again')
+        parser.add_argument('--processes', type=int, default=2, help='Worker processes')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per worker process')
+        parser.add_argument('--requests', type=int, default=40,
+                            help='Requests per endpoint per worker process')
+        parser.add_argument('--rounds', type=int, default=3,
+                            help='Times to run the load; each figure is the median over the rounds')
+        parser.add_argument('--endpoints', nargs='+', help='Only these endpoints (see ENDPOINTS)')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON to compare with')
+        parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline')
+        parser.add_argument('--threshold', type=float, default=0.5,
+                            help='Allowed relative regression of p50 latency and throughput')
+        parser.add_argument('--tail-threshold', type=float, default=1.0,
+                            help='Allowed relative regression of p95 latency, which queueing makes noisier')
+        # Threads of a worker take turns on the GIL every 5 ms (sys.getswitchinterval()),
+        # so a few milliseconds either way is scheduling, not the endpoint.
+        parser.add_argument('--slack-ms', type=float, default=10.0,
+                            help='Latency allowed on top of the thresholds')
+        parser.add_argument('--output', help='Also write the results as JSON to this file')
+        parser.add_argument('--worker', action='store_true', help='Internal: run one worker process')
+        parser.add_argument('--targets', help='Internal: JSON targets for a worker')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            return self.work(options)
+        names = [name for name, *_ in ENDPOINTS]
+        unknown = set(options['endpoints'] or ()) - set(names)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}; choose from {", ".join(names)}')
+
+        path = options['database_file'] or os.path.join(
+            tempfile.gettempdir(), f'blog-benchmark-p{options["posts"]}-u{options["users"]}-s{options["seed"]}.sqlite3'
+        )
+        if str(settings.DATABASES['default']['NAME']) != str(path):
+            # Everything below runs against the benchmark file, never the
+            # configured database.
+            env = dict(os.environ, BLOG_DATABASE_PATH=str(path))
+            completed = subprocess.run([sys.executable, sys.argv[0], *sys.argv[1:]], env=env)
+            if completed.returncode:
+                raise CommandError('Benchmark failed')
+            return
+
+        if options['reseed'] and os.path.exists(path):
+            connections.close_all()
+            os.remove(path)
+        if not self.is_seeded():
+            self.seed(options)
+        targets = self.get_targets()
+        results = self.run(options, targets)
+        self.report(results)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+        if options['update_baseline']:
+            baseline = Path(options['baseline'])
+            baseline.parent.mkdir(parents=True, exist_ok=True)
+            baseline.write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline}'))
+            return
+        self.compare(results, options)
+
+    def is_seeded(self):
+        try:
+            return User.objects.filter(username=BENCHMARK_USERNAME).exists()
+        except DatabaseError:
+            # Not migrated yet.
+            return False
+
+    def seed(self, options):
+        started = time.perf_counter()
+        self.stdout.write(f'Seeding {options["posts"]} posts and {options["users"]} users...')
+        call_command('migrate', interactive=False, verbosity=0)
+        call_command(
+            'generate_dataset', posts=options['posts'], users=options['users'],
+            categories=30, tags=max(100, options['posts'] // 50), seed=options['seed'],
+            prefix='bench', stdout=StringIO(),
+        )
+        # The busiest author logs in, so my-posts and export have data to read.
+        author_id = (
+            Post.objects.values('author_id').annotate(posts=Count('id')).order_by('-posts', 'author_id')
+            .values_list('author_id', flat=True).first()
+        )
+        author = User.objects.get(pk=author_id)
+        author.username = BENCHMARK_USERNAME
+        author.set_password(BENCHMARK_PASSWORD)
+        author.save()
+        UserProfile.objects.filter(user=author).update(role='editor')
+        # Views for trending, spread over a deterministic sample of posts.
+        rng = random.Random(options['seed'])
+        published = list(Post.objects.filter(status='published').values_list('id', flat=True)[:5000])
+        now = time.time()
+        for post_id in rng.sample(published, min(500, len(published))):
+            Post.objects.filter(pk=post_id).update(**trending_update(rng.randint(1, 200), now))
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    def get_targets(self):
+        """The ids and names the endpoint paths are formatted with."""
+        user = User.objects.get(username=BENCHMARK_USERNAME)
+        tags = list(Tag.objects.order_by('-published_post_count', 'id').values_list('name', flat=True)[:2])
+        return {
+            'username': user.username,
+            'author': user.id,
+            'post': Post.objects.filter(status='published').order_by('-created_at', '-id')
+            .values_list('id', flat=True).first(),
+            'category': Category.objects.order_by('-published_post_count', 'id').values_list('id', flat=True).first(),
+            'tag': Tag.objects.order_by('-published_post_count', 'id').values_list('id', flat=True).first(),
+            'tag_expr': urlencode({'tag_expr': ' OR '.join(f'"{name}"' for name in tags)}),
+            'word': make_vocabulary()[50],
+            'refresh': str(RoleRefreshToken.for_user(user)),
+        }
+
+    def run(self, options, targets):
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_endpoints', '--worker', '--targets', json.dumps(targets),
+            '--threads', str(options['threads']), '--requests', str(options['requests']),
+        ]
+        if options['endpoints']:
+            command += ['--endpoints', *options['endpoints']]
+        self.stdout.write(
+            f'Running {options["rounds"]} rounds of {options["processes"]} processes x {options["threads"]} '
+            f'threads, {options["requests"]} requests per endpoint each...'
+        )
+        rounds = [self.run_round(command, options['processes']) for _ in range(options['rounds'])]
+        # The median round per figure: one burst of noise on a shared machine
+        # does not move it.
+        endpoints = {}
+        for name in rounds[0]['endpoints']:
+            results = [run['endpoints'][name] for run in rounds]
+            endpoints[name] = {
+                'requests': sum(result['requests'] for result in results),
+                'errors': sum(result['errors'] for result in results),
+                **{
+                    metric: statistics.median(result[metric] for result in results)
+                    for metric in ('rps', 'p50_ms', 'p95_ms', 'p99_ms')
+                },
+            }
+        return {
+            'options': {name: options[name] for name in COMPARED_OPTIONS},
+            'environment': {
+                'python': platform.python_version(), 'django': django.get_version(),
+                'cpus': os.cpu_count(), 'platform': platform.platform(terse=True),
+            },
+            'calibration_ms': statistics.median(run['calibration_ms'] for run in rounds),
+            'total': {
+                'requests': sum(run['requests'] for run in rounds),
+                'rps': statistics.median(run['rps'] for run in rounds),
+            },
+            'endpoints': endpoints,
+        }
+
+    def run_round(self, command, processes):
+        calibration = calibrate()
+        started = time.perf_counter()
+        # Each worker logs to its own file, so a full pipe never stalls it.
+        logs = [tempfile.TemporaryFile(mode='w+') for _ in range(processes)]
+        workers = [subprocess.Popen(command, stdout=subprocess.PIPE, stderr=log, text=True) for log in logs]
+        outputs = []
+        for worker, log in zip(workers, logs):
+            stdout, _ = worker.communicate()
+            log.seek(0)
+            if worker.returncode:
+                raise CommandError(f'Worker failed:\n{log.read()}')
+            outputs.append(json.loads(stdout.strip().splitlines()[-1]))
+            log.close()
+        elapsed = time.perf_counter() - started
+        calibration = statistics.median([calibration, calibrate()])
+
+        endpoints = {}
+        for name in outputs[0]:
+            latencies = [latency for output in outputs for latency in output[name]['latencies']]
+            errors = sum(output[name]['errors'] for output in outputs)
+            # Workers run the endpoints in the same order, roughly in step.
+            rps = sum(len(output[name]['latencies']) / output[name]['elapsed'] for output in outputs)
+            endpoints[name] = summarize(latencies, rps, errors)
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'calibration_ms': calibration, 'requests': total, 'rps': round(total / elapsed, 1),
+            'endpoints': endpoints,
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"endpoint":<22}{"requests":>9}{"errors":>8}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+        )
+        for name, result in results['endpoints'].items():
+            self.stdout.write(
+                f'{name:<22}{result["requests"]:>9}{result["errors"]:>8}{result["rps"]:>9.1f}'
+                f'{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+            )
+        self.stdout.write(f'{results["total"]["requests"]} requests, {results["total"]["rps"]:.1f} req/s overall')
+
+    def compare(self, results, options):
+        failures = [
+            f'{name}: {result["errors"]} failed requests'
+            for name, result in results['endpoints'].items() if result['errors']
+        ]
+        baseline_path = Path(options['baseline'])
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f'No baseline at {baseline_path}; run with --update-baseline'))
+        else:
+            baseline = json.loads(baseline_path.read_text())
+            if baseline['options'] != results['options']:
+                raise CommandError(
+                    f'The baseline was recorded with {baseline["options"]}, not {results["options"]}; '
+                    f'rerun with those options or --update-baseline'
+                )
+            # > 1 when this machine is slower than the baseline's, right now.
+            scale = results['calibration_ms'] / baseline['calibration_ms']
+            self.stdout.write(f'Machine speed relative to the baseline: {1 / scale:.2f}x')
+            thresholds = {'p50_ms': options['threshold'], 'p95_ms': options['tail_threshold']}
+            threshold, slack = options['threshold'], options['slack_ms']
+            for name, result in results['endpoints'].items():
+                before = baseline['endpoints'].get(name)
+                if before is None:
+                    continue
+                for metric, allowed in thresholds.items():
+                    expected = before[metric] * scale
+                    if result[metric] > expected * (1 + allowed) + slack:
+                        failures.append(f'{name}: {metric} {expected:.2f} expected, {result[metric]} measured')
+                expected = before['rps'] / scale
+                if result['rps'] < expected * (1 - threshold):
+                    failures.append(f'{name}: req/s {expected:.1f} expected, {result["rps"]} measured')
+        if failures:
+            raise CommandError('Regressions beyond the threshold:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def work(self, options):
+        from django.core.wsgi import get_wsgi_application
+        from rest_framework.throttling import ScopedRateThrottle
+
+        # Query logging would grow memory with every request.
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        # Measure the endpoints, not the throttle.
+        ScopedRateThrottle.THROTTLE_RATES = dict.fromkeys(ScopedRateThrottle.THROTTLE_RATES)
+        targets = json.loads(options['targets'])
+        application = get_wsgi_application()
+        token = f'Bearer {RoleRefreshToken.for_user(User.objects.get(pk=targets["author"])).access_token}'
+
+        def request(method, path, body):
+            url = urlsplit(path)
+            payload = json.dumps(body).encode() if body is not None else b''
+            environ = {
+                'REQUEST_METHOD': method, 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+                'HTTP_HOST': 'testserver', 'wsgi.input': BytesIO(payload),
+                'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(payload)),
+            }
+            if body is None:
+                environ['HTTP_AUTHORIZATION'] = token
+            setup_testing_defaults(environ)
+            status = []
+            started = time.perf_counter()
+            response = application(environ, lambda code, headers, exc_info=None: status.append(code))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+            return int(status[0].split()[0]), time.perf_counter() - started
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            for name, method, path, body, share in ENDPOINTS:
+                if options['endpoints'] and name not in options['endpoints']:
+                    continue
+                path = path.format(**targets)
+                if body is not None:
+                    body = {key: value.format(**targets) for key, value in body.items()}
+                count = max(1, round(options['requests'] * share))
+                # Warm up imports, caches and connections in every thread.
+                list(pool.map(lambda _: request(method, path, body), range(options['threads'])))
+                started = time.perf_counter()
+                responses = list(pool.map(lambda _: request(method, path, body), range(count)))
+                results[name] = {
+                    'latencies': [latency for _, latency in responses],
+                    'errors': sum(1 for code, _ in responses if code >= 400),
+                    'elapsed': time.perf_counter() - started,
+                }
+        self.stdout.write(json.dumps(results))
@@ -0,0 +1,89 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import Post
+from api.search import LikeSearchBackend, get_search_backend
+
+VOCABULARY_SIZE = 5000
+WORDS_PER_POST = 120
+
+
+def make_vocabulary():
+    syllables = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'do', 'gu']
+    rng = random.Random(0)
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = 'Compare search latency of the full-text index against LIKE scans (SearchFilter)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000,
+                            help='Number of posts to benchmark against; missing posts are generated')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        vocabulary = make_vocabulary()
+        # Zipf-like word frequencies so queries range from rare to very common terms.
+        weights = [1.0 / rank for rank in range(1, len(vocabulary) + 1)]
+        self.seed_posts(options['posts'], options['batch_size'], vocabulary, weights, options['seed'])
+
+        queries = [
+            [vocabulary[0]],
+            [vocabulary[50]],
+            [vocabulary[2000]],
+            [vocabulary[10], vocabulary[200]],
+            [vocabulary[3][:3]],
+        ]
+        backends = [('SearchFilter (LIKE)', LikeSearchBackend(connection)), ('Index', get_search_backend())]
+        self.stdout.write(f'{"query":<24}{"backend":<22}{"matches":>10}{"p50 ms":>10}{"max ms":>10}')
+        for terms in queries:
+            for label, backend in backends:
+                timings, matches = [], 0
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    queryset = backend.search(Post.objects.all(), terms)
+                    if 'search_rank' in queryset.query.extra:
+                        queryset = queryset.order_by('-search_rank', '-created_at', '-id')
+                    matches = queryset.count()
+                    page = list(queryset[:10])
+                    backend.snippets([post.pk for post in page], terms)
+                    timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(
+                    f'{" ".join(terms):<24}{label:<22}{matches:>10}'
+                    f'{statistics.median(timings):>10.1f}{max(timings):>10.1f}'
+                )
+
+    def seed_posts(self, target, batch_size, vocabulary, weights, seed):
+        existing = Post.objects.count()
+        if existing >= target:
+            return
+        self.stdout.write(f'Generating {target - existing} posts...')
+        author, _ = User.objects.get_or_create(username='search-benchmark')
+        backend = get_search_backend()
+        rng = random.Random(seed)
+        remaining = target - existing
+        while remaining:
+            size = min(batch_size, remaining)
+            posts = [
+                Post(
+                    title=' '.join(rng.choices(vocabulary, weights, k=6)).capitalize(),
+                    content=' '.join(rng.choices(vocabulary, weights, k=WORDS_PER_POST)),
+                    author=author,
+                    status='published',
+                )
+                for _ in range(size)
+            ]
+            with transaction.atomic():
+                backend.index_posts(Post.objects.bulk_create(posts))
+            remaining -= size
@@ -0,0 +1,100 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.cache import REFERENCE_GENERATION, bump_generation
+from api.fast_serializers import category_serializer, post_list_serializer, tag_serializer
+from api.models import Category, Post, Tag
+from api.serializers import CategorySerializer, PostListSerializer, TagSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/second of the DRF list serializers against their values() fast paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per size')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Benchmark rows are generated inside a transaction that is rolled back.
+        try:
+            with transaction.atomic():
+                self.seed(max(options['rows']), options['seed'])
+                self.run(options['rows'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            # Drop reference snapshots that saw the rolled-back rows.
+            bump_generation(REFERENCE_GENERATION)
+
+    def run(self, sizes, repeat):
+        cases = [
+            ('posts', PostListSerializer, post_list_serializer, Post.objects.with_list_relations()),
+            ('categories', CategorySerializer, category_serializer, Category.objects.all()),
+            ('tags', TagSerializer, tag_serializer, Tag.objects.all()),
+        ]
+        renderer = JSONRenderer()
+        self.stdout.write(f'{"serializer":<12}{"rows":>8}{"drf rows/s":>14}{"fast rows/s":>14}{"speedup":>10}')
+        for label, serializer_class, fast, queryset in cases:
+            for size in sizes:
+                queryset_page = queryset.order_by('-id')[:size]
+
+                def drf():
+                    return renderer.render(serializer_class(queryset_page, many=True).data)
+
+                def compiled():
+                    return renderer.render(fast.serialize(fast.values(queryset_page)))
+
+                if drf() != compiled():
+                    raise CommandError(f'{label}: fast path output differs from {serializer_class.__name__}')
+                rows = queryset_page.count()
+                drf_rate = rows / self.median_seconds(drf, repeat)
+                fast_rate = rows / self.median_seconds(compiled, repeat)
+                self.stdout.write(
+                    f'{label:<12}{rows:>8}{drf_rate:>14,.0f}{fast_rate:>14,.0f}'
+                    f'{fast_rate / drf_rate:>9.1f}x'
+                )
+        self.stdout.write(self.style.SUCCESS('Fast path output is byte-identical'))
+
+    def median_seconds(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    def seed(self, count, seed):
+        rng = random.Random(seed)
+        authors = [
+            User.objects.create(username=f'serializer-benchmark-{i}') for i in range(10)
+        ]
+        categories = Category.objects.bulk_create(
+            Category(name=f'serializer-benchmark-{i}', description='Benchmark') for i in range(count)
+        )
+        tags = Tag.objects.bulk_create(Tag(name=f'serializer-benchmark-{i}') for i in range(count))
+        posts = Post.objects.bulk_create(
+            Post(
+                title=f'Benchmark post {i}', content='Content', author=rng.choice(authors),
+                category=rng.choice(categories[:20] + [None]),
+                status=rng.choice(['draft', 'published', 'archived']),
+            )
+            for i in range(count)
+        )
+        Post.tags.through.objects.bulk_create(
+            Post.tags.through(post_id=post.id, tag_id=tag.id)
+            for post in posts for tag in rng.sample(tags[:50], rng.randint(0, min(4, len(tags))))
+        )
+        # bulk_create sends no signals.
+        bump_generation(REFERENCE_GENERATION)
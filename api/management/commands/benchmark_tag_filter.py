@@ -0,0 +1,91 @@
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.filters import TagExpressionFilter
+from api.models import Post, Tag
+from api.tag_index import tag_index
+
+
+def quote(name):
+    return f'"{name}"'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare boolean tag filtering on the in-memory tag index (?tag_expr=) against '
+        'chained tag joins with DISTINCT, on the current dataset (see generate_dataset)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tags-per-query', type=int, default=100)
+        parser.add_argument('--queries', type=int, default=5, help='Random queries per shape')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        names = list(Tag.objects.order_by('id').values_list('name', flat=True))
+        count = options['tags_per_query']
+        if not Post.objects.exists() or len(names) < count:
+            raise CommandError(f'Need posts and at least {count} tags; run generate_dataset first')
+
+        started = time.perf_counter()
+        tag_index.clear()
+        tag_index.get()
+        self.stdout.write(
+            f'Index built in {time.perf_counter() - started:.1f}s, '
+            f'{tag_index.memory_bytes() / 2**20:.1f} MiB of post ids'
+        )
+
+        rng = random.Random(options['seed'])
+        shapes = ['any', 'all-groups', 'any-but']
+        self.stdout.write(f'{"shape":<12}{"approach":<10}{"matches":>10}{"p50 ms":>10}{"max ms":>10}')
+        for shape in shapes:
+            timings = {'joins': [], 'index': []}
+            matches = {}
+            for _ in range(options['queries']):
+                groups = self.split(rng.sample(names, count), 2 if shape == 'any-but' else 3)
+                for approach in timings:
+                    start = time.perf_counter()
+                    queryset = getattr(self, approach)(shape, groups).order_by('-created_at', '-id')
+                    matches[approach] = queryset.count()
+                    list(queryset.values_list('id', flat=True)[:options['page_size']])
+                    timings[approach].append((time.perf_counter() - start) * 1000)
+                if matches['joins'] != matches['index']:
+                    raise CommandError(f'{shape}: {matches["index"]} index matches, {matches["joins"]} with joins')
+            for approach, runs in timings.items():
+                self.stdout.write(
+                    f'{shape:<12}{approach:<10}{matches[approach]:>10}'
+                    f'{statistics.median(runs):>10.1f}{max(runs):>10.1f}'
+                )
+
+    @staticmethod
+    def split(names, parts):
+        size = -(-len(names) // parts)
+        return [names[i:i + size] for i in range(0, len(names), size)]
+
+    def joins(self, shape, groups):
+        """The expression as tag__name filters: one join per group, DISTINCT to drop duplicates."""
+        queryset = Post.objects.all()
+        if shape == 'any':
+            queryset = queryset.filter(tags__name__in=[name for group in groups for name in group])
+        elif shape == 'all-groups':
+            for group in groups:
+                queryset = queryset.filter(tags__name__in=group)
+        else:
+            queryset = queryset.filter(tags__name__in=groups[0]).exclude(tags__name__in=groups[1])
+        return queryset.distinct()
+
+    def index(self, shape, groups):
+        any_of = [f'({" OR ".join(map(quote, group))})' for group in groups]
+        if shape == 'any':
+            expression = ' OR '.join(any_of)
+        elif shape == 'all-groups':
+            expression = ' AND '.join(any_of)
+        else:
+            expression = f'{any_of[0]} AND NOT {any_of[1]}'
+        request = SimpleNamespace(query_params={TagExpressionFilter.query_param: expression})
+        return TagExpressionFilter().filter_queryset(request, Post.objects.all(), None)
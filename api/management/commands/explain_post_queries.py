@@ -0,0 +1,97 @@
+import itertools
+import re
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+
+from api.models import Category, Post, Tag, UserProfile
+from api.views import PostViewSet
+
+# Plan lines that mean the posts table is read or sorted in full. An ordered
+# index walk ("SCAN api_post USING INDEX ...") stops at the page limit, so it
+# is not flagged.
+FULL_SCAN_PATTERNS = {
+    'sqlite': [r'\bSCAN api_post\b(?! USING)', r'USE TEMP B-TREE FOR ORDER BY'],
+    'postgresql': [r'Seq Scan on api_post\b', r'->\s+Sort\b|^\s*Sort\b'],
+}
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN every PostViewSet filter/ordering combination and flag full scans or sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strict', action='store_true',
+                            help='Exit with an error if any combination is flagged')
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Print the full plan for every combination')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Refresh planner statistics (ANALYZE) before explaining')
+
+    def handle(self, *args, **options):
+        patterns = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(f'Unsupported database vendor: {connection.vendor}')
+        patterns = [re.compile(pattern) for pattern in patterns]
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        factory = APIRequestFactory()
+        filters = self.get_filters()
+        orderings = [''] + [
+            prefix + field for field in PostViewSet.ordering_fields for prefix in ('', '-')
+        ]
+        flagged = 0
+        for (scope, user), (filter_name, params), ordering in itertools.product(
+            self.get_scopes(), filters, orderings
+        ):
+            query = dict(params)
+            if ordering:
+                query['ordering'] = ordering
+            queryset = self.get_page_queryset(factory, user, query)
+            plan = queryset.explain()
+            bad = [
+                line.strip() for line in plan.splitlines()
+                if any(pattern.search(line) for pattern in patterns)
+            ]
+            label = f'{scope:<8}{filter_name:<10}{ordering or "(default)":<16}'
+            if bad:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f'{label}SCAN/SORT: {"; ".join(bad)}'))
+            else:
+                self.stdout.write(f'{label}ok')
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+
+        summary = f'{flagged} combination(s) still scan or sort the full posts table'
+        if flagged and options['strict']:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary) if not flagged else self.style.WARNING(summary))
+
+    def get_scopes(self):
+        editor = User(id=0, username='explain-editor')
+        editor.userprofile = UserProfile(role='editor')
+        return [('reader', AnonymousUser()), ('editor', editor)]
+
+    def get_filters(self):
+        # Filters on related ids are validated against the database, so only
+        # combinations with an existing row can be explained.
+        related = [
+            ('category', 'category', Category.objects.values_list('id', flat=True).first()),
+            ('tag', 'tags', Tag.objects.values_list('id', flat=True).first()),
+            ('author', 'author', Post.objects.values_list('author_id', flat=True).first()),
+        ]
+        filters = [('none', {}), ('status', {'status': 'published'})]
+        filters += [(name, {param: value}) for name, param, value in related if value is not None]
+        return filters
+
+    def get_page_queryset(self, factory, user, query):
+        view = PostViewSet(action_map={'get': 'list'})
+        view.format_kwarg = None
+        view.request = view.initialize_request(factory.get('/api/posts/', query))
+        view.request.user = user
+        queryset = view.filter_queryset(view.get_queryset())
+        page_size = view.paginator.get_page_size(view.request)
+        return queryset[:page_size]
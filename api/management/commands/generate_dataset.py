@@ -0,0 +1,214 @@
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from api.cache import COUNTERS_GENERATION, POSTS_GENERATION, REFERENCE_GENERATION, bump_generation
+from api.counters import repair_counters
+from api.models import Category, Post, Tag, UserProfile
+from api.search import get_search_backend
+from api.tag_index import RELOAD, publish
+
+from .benchmark_search import make_vocabulary
+from .populate_categories_tags import CATEGORIES, TAGS, bulk_insert_by_name
+
+ROLE_MIX = [('admin', 0.01), ('editor', 0.19), ('reader', 0.80)]
+DEFAULT_STATUS_MIX = 'published=0.7,draft=0.2,archived=0.1'
+
+
+def zipf_cum_weights(count, exponent):
+    """Cumulative Zipf weights for ranks 1..count, for random.choices(cum_weights=...)."""
+    return list(itertools.accumulate(1.0 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def parse_mix(value):
+    try:
+        mix = [(name, float(weight)) for name, weight in (part.split('=') for part in value.split(','))]
+    except ValueError:
+        raise CommandError(f'Invalid mix "{value}"; expected e.g. {DEFAULT_STATUS_MIX}')
+    unknown = {name for name, _ in mix} - {choice for choice, _ in Post.STATUS_CHOICES}
+    if unknown:
+        raise CommandError(f'Unknown status: {", ".join(sorted(unknown))}')
+    return mix
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    """Let bulk_create write generated values into auto_now/auto_now_add fields."""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic, production-sized dataset of users, posts, categories and tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--categories', type=int, default=50,
+                            help='Total categories, the seed categories first')
+        parser.add_argument('--tags', type=int, default=2_000, help='Total tags, the seed tags first')
+        parser.add_argument('--max-tags', type=int, default=5, help='Maximum tags per post')
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Zipf exponent for category, tag and author popularity')
+        parser.add_argument('--status-mix', default=DEFAULT_STATUS_MIX)
+        parser.add_argument('--words', type=int, default=120, help='Average words per post body')
+        parser.add_argument('--days', type=int, default=3 * 365, help='Spread of created_at')
+        parser.add_argument('--end', default='2025-01-01T00:00:00+00:00',
+                            help='Latest created_at; fixed so runs are reproducible')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per transaction')
+        parser.add_argument('--prefix', default='synthetic', help='Username prefix')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--no-index', action='store_true',
+                            help='Skip the search index rebuild (run rebuild_search_index later)')
+        parser.add_argument('--no-render', action='store_true',
+                            help='Skip rendering post content (run rerender_posts later)')
+        parser.add_argument('--no-related', action='store_true',
+                            help='Skip computing related posts (run rebuild_related_posts later)')
+
+    def handle(self, *args, **options):
+        end = parse_datetime(options['end'])
+        if end is None:
+            raise CommandError(f'Invalid --end datetime: {options["end"]}')
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=dt_timezone.utc)
+        status_mix = parse_mix(options['status_mix'])
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        category_ids = self.make_categories(options['categories'])
+        tag_ids = self.make_tags(options['tags'])
+        author_ids = self.make_users(rng, options['users'], options['prefix'], options['batch_size'])
+        if not author_ids:
+            raise CommandError('No admin or editor users to author posts; raise --users')
+        self.stdout.write(
+            f'{len(category_ids)} categories, {len(tag_ids)} tags, {len(author_ids)} authors '
+            f'({time.perf_counter() - started:.1f}s)'
+        )
+
+        self.make_posts(rng, options, end, status_mix, category_ids, tag_ids, author_ids, started)
+
+        if not options['no_index']:
+            self.stdout.write('Rebuilding the search index...')
+            get_search_backend().rebuild()
+        if not options['no_render']:
+            call_command('rerender_posts', stdout=self.stdout)
+        # bulk_create sends no signals.
+        self.stdout.write('Recomputing published post counters...')
+        with transaction.atomic():
+            repair_counters(Category, Tag, Post)
+        if not options['no_related']:
+            # After the counters: the rebuild sets the published total for idf.
+            call_command('rebuild_related_posts', stdout=self.stdout)
+        bump_generation(REFERENCE_GENERATION)
+        bump_generation(COUNTERS_GENERATION)
+        bump_generation(POSTS_GENERATION)
+        # Every worker rebuilds its tag index.
+        publish(RELOAD)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {options["posts"]} posts in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def make_categories(self, count):
+        rows = CATEGORIES[:count] + [
+            {'name': f'Category {i}', 'description': f'Generated category {i}'}
+            for i in range(len(CATEGORIES), count)
+        ]
+        bulk_insert_by_name(Category, rows)
+        ids = dict(Category.objects.filter(name__in=[row['name'] for row in rows]).values_list('name', 'id'))
+        return [ids[row['name']] for row in rows]
+
+    def make_tags(self, count):
+        names = TAGS[:count] + [f'tag-{i}' for i in range(len(TAGS), count)]
+        bulk_insert_by_name(Tag, [{'name': name} for name in names])
+        ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+        return [ids[name] for name in names]
+
+    def make_users(self, rng, count, prefix, batch_size):
+        """Create `count` users with profiles; returns the admin/editor ids, in creation order."""
+        roles = rng.choices([role for role, _ in ROLE_MIX], [weight for _, weight in ROLE_MIX], k=count)
+        usernames = [f'{prefix}-{i}' for i in range(count)]
+        # Generated accounts cannot log in; one hash is shared to keep this fast.
+        password = make_password(None)
+        for start in range(0, count, batch_size):
+            batch = usernames[start:start + batch_size]
+            with transaction.atomic():
+                User.objects.bulk_create(
+                    [User(username=name, password=password) for name in batch], ignore_conflicts=True
+                )
+                ids = dict(User.objects.filter(username__in=batch).values_list('username', 'id'))
+                UserProfile.objects.bulk_create(
+                    [
+                        UserProfile(user_id=ids[name], role=role)
+                        for name, role in zip(batch, roles[start:start + batch_size])
+                    ],
+                    ignore_conflicts=True,
+                )
+        return list(
+            UserProfile.objects.filter(user__username__startswith=f'{prefix}-', role__in=['admin', 'editor'])
+            .order_by('user_id').values_list('user_id', flat=True)
+        )
+
+    def make_posts(self, rng, options, end, status_mix, category_ids, tag_ids, author_ids, started):
+        vocabulary = make_vocabulary()
+        word_weights = zipf_cum_weights(len(vocabulary), 1.0)
+        # About one post in eleven has no category.
+        category_choices = category_ids + [None]
+        category_weights = zipf_cum_weights(len(category_ids), options['zipf'])
+        category_weights.append(category_weights[-1] * 1.1)
+        tag_weights = zipf_cum_weights(len(tag_ids), options['zipf'])
+        author_weights = zipf_cum_weights(len(author_ids), options['zipf'])
+        statuses = [name for name, _ in status_mix]
+        status_weights = [weight for _, weight in status_mix]
+        span = options['days'] * 86400
+        words, max_tags = options['words'], options['max_tags']
+        through = Post.tags.through
+
+        total, batch_size = options['posts'], options['batch_size']
+        with explicit_timestamps(Post, 'created_at', 'updated_at'):
+            for start in range(0, total, batch_size):
+                size = min(batch_size, total - start)
+                posts, post_tags = [], []
+                for status in rng.choices(statuses, status_weights, k=size):
+                    created_at = end - timedelta(seconds=rng.randrange(span))
+                    updated_at = min(end, created_at + timedelta(seconds=int(rng.expovariate(1 / 86400))))
+                    published_at = None
+                    if status != 'draft':
+                        published_at = min(updated_at, created_at + timedelta(seconds=rng.randrange(3600)))
+                    category = rng.choices(category_choices, cum_weights=category_weights)[0]
+                    body = rng.choices(vocabulary, cum_weights=word_weights, k=rng.randint(words // 2, words * 3 // 2))
+                    posts.append(Post(
+                        title=' '.join(rng.choices(vocabulary, cum_weights=word_weights, k=6)).capitalize(),
+                        content=' '.join(body),
+                        author_id=rng.choices(author_ids, cum_weights=author_weights)[0],
+                        category_id=category,
+                        status=status,
+                        created_at=created_at,
+                        updated_at=updated_at,
+                        published_at=published_at,
+                    ))
+                    post_tags.append(set(rng.choices(tag_ids, cum_weights=tag_weights, k=rng.randint(0, max_tags))))
+                with transaction.atomic():
+                    Post.objects.bulk_create(posts)
+                    through.objects.bulk_create([
+                        through(post_id=post.id, tag_id=tag_id)
+                        for post, tags in zip(posts, post_tags) for tag_id in tags
+                    ])
+                done = start + size
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{done}/{total} posts ({elapsed:.1f}s)')
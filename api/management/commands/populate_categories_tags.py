@@ -1,6 +1,52 @@
 from django.core.management.base import BaseCommand
+from api.cache import POSTS_GENERATION, REFERENCE_GENERATION, bump_generation
 from api.models import Category, Tag
 
+# Categories to create
+CATEGORIES = [
+    {'name': 'Technology', 'description': 'Posts about technology, programming, and software development'},
+    {'name': 'Science', 'description': 'Scientific discoveries, research, and innovations'},
+    {'name': 'Health', 'description': 'Health tips, medical news, and wellness advice'},
+    {'name': 'Travel', 'description': 'Travel guides, destinations, and experiences'},
+    {'name': 'Food', 'description': 'Recipes, restaurant reviews, and culinary adventures'},
+    {'name': 'Lifestyle', 'description': 'Life tips, personal development, and lifestyle content'},
+    {'name': 'Sports', 'description': 'Sports news, analysis, and commentary'},
+    {'name': 'Entertainment', 'description': 'Movies, music, games, and entertainment news'},
+    {'name': 'Business', 'description': 'Business news, entrepreneurship, and finance'},
+    {'name': 'Education', 'description': 'Educational content, tutorials, and learning resources'},
+]
+
+# Tags to create
+TAGS = [
+    'python', 'django', 'javascript', 'web-development', 'mobile-app',
+    'artificial-intelligence', 'machine-learning', 'data-science', 'blockchain',
+    'cybersecurity', 'cloud-computing', 'devops', 'frontend', 'backend',
+    'tutorial', 'beginners', 'advanced', 'tips-and-tricks', 'best-practices',
+    'review', 'news', 'opinion', 'analysis', 'case-study',
+    'productivity', 'career', 'remote-work', 'startup', 'innovation',
+    'fitness', 'nutrition', 'mental-health', 'cooking', 'recipe',
+    'adventure', 'budget-travel', 'photography', 'nature', 'culture',
+    'movies', 'books', 'gaming', 'music', 'art',
+    'finance', 'investment', 'marketing', 'management', 'leadership'
+]
+
+
+def bulk_insert_by_name(model, rows, batch_size=1000):
+    """
+    Insert the rows whose name is not taken yet with one existence query and
+    batched INSERTs; rows that race in concurrently are skipped by the
+    database. Returns (names that were missing, in row order, set of names
+    that already existed).
+    """
+    names = [row['name'] for row in rows]
+    existing = set(model.objects.filter(name__in=names).values_list('name', flat=True))
+    missing = [row for row in rows if row['name'] not in existing]
+    model.objects.bulk_create(
+        [model(**row) for row in missing], batch_size=batch_size, ignore_conflicts=True
+    )
+    return [row['name'] for row in missing], existing
+
+
 class Command(BaseCommand):
     help = 'Populate database with initial categories and tags'
 
@@ -18,64 +64,25 @@ class Command(BaseCommand):
             Tag.objects.all().delete()
             self.stdout.write(self.style.SUCCESS('Cleared successfully'))
 
-        # Categories to create
-        categories_data = [
-            {'name': 'Technology', 'description': 'Posts about technology, programming, and software development'},
-            {'name': 'Science', 'description': 'Scientific discoveries, research, and innovations'},
-            {'name': 'Health', 'description': 'Health tips, medical news, and wellness advice'},
-            {'name': 'Travel', 'description': 'Travel guides, destinations, and experiences'},
-            {'name': 'Food', 'description': 'Recipes, restaurant reviews, and culinary adventures'},
-            {'name': 'Lifestyle', 'description': 'Life tips, personal development, and lifestyle content'},
-            {'name': 'Sports', 'description': 'Sports news, analysis, and commentary'},
-            {'name': 'Entertainment', 'description': 'Movies, music, games, and entertainment news'},
-            {'name': 'Business', 'description': 'Business news, entrepreneurship, and finance'},
-            {'name': 'Education', 'description': 'Educational content, tutorials, and learning resources'},
-        ]
-
-        # Tags to create
-        tags_data = [
-            'python', 'django', 'javascript', 'web-development', 'mobile-app',
-            'artificial-intelligence', 'machine-learning', 'data-science', 'blockchain',
-            'cybersecurity', 'cloud-computing', 'devops', 'frontend', 'backend',
-            'tutorial', 'beginners', 'advanced', 'tips-and-tricks', 'best-practices',
-            'review', 'news', 'opinion', 'analysis', 'case-study',
-            'productivity', 'career', 'remote-work', 'startup', 'innovation',
-            'fitness', 'nutrition', 'mental-health', 'cooking', 'recipe',
-            'adventure', 'budget-travel', 'photography', 'nature', 'culture',
-            'movies', 'books', 'gaming', 'music', 'art',
-            'finance', 'investment', 'marketing', 'management', 'leadership'
-        ]
-
         # Create categories
-        created_categories = 0
-        for category_data in categories_data:
-            category, created = Category.objects.get_or_create(
-                name=category_data['name'],
-                defaults={'description': category_data['description']}
-            )
-            if created:
-                created_categories += 1
-                self.stdout.write(
-                    self.style.SUCCESS(f'Created category: {category.name}')
-                )
-            else:
-                self.stdout.write(
-                    self.style.WARNING(f'Category already exists: {category.name}')
-                )
+        created, existing = bulk_insert_by_name(Category, CATEGORIES)
+        for name in created:
+            self.stdout.write(self.style.SUCCESS(f'Created category: {name}'))
+        for name in sorted(existing):
+            self.stdout.write(self.style.WARNING(f'Category already exists: {name}'))
+        created_categories = len(created)
 
         # Create tags
-        created_tags = 0
-        for tag_name in tags_data:
-            tag, created = Tag.objects.get_or_create(name=tag_name)
-            if created:
-                created_tags += 1
-                self.stdout.write(
-                    self.style.SUCCESS(f'Created tag: {tag.name}')
-                )
-            else:
-                self.stdout.write(
-                    self.style.WARNING(f'Tag already exists: {tag.name}')
-                )
+        created, existing = bulk_insert_by_name(Tag, [{'name': name} for name in TAGS])
+        for name in created:
+            self.stdout.write(self.style.SUCCESS(f'Created tag: {name}'))
+        for name in sorted(existing):
+            self.stdout.write(self.style.WARNING(f'Tag already exists: {name}'))
+        created_tags = len(created)
+
+        # bulk_create sends no signals.
+        bump_generation(REFERENCE_GENERATION)
+        bump_generation(POSTS_GENERATION)
 
         # Summary
         self.stdout.write(
@@ -0,0 +1,126 @@
+import time
+
+import numpy as np
+from scipy import sparse
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from api.models import Post, RelatedPost
+from api.related import CATEGORY_WEIGHT, TOP_K, max_tag_posts, set_published_total
+
+INSERT_BATCH_SIZE = 10_000
+
+
+class Command(BaseCommand):
+    help = "Recompute every post's related posts (api.related) with sparse tag-matrix products"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Posts scored per matrix product')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using, chunk_size = options['database'], options['chunk_size']
+        started = time.perf_counter()
+        posts = Post.objects.using(using).order_by('id').values_list('id', 'category_id', 'status')
+        ids, categories, published = [], [], []
+        for post_id, category_id, status in posts.iterator(chunk_size=20_000):
+            ids.append(post_id)
+            categories.append(-1 if category_id is None else category_id)
+            published.append(status == 'published')
+        ids, categories, published = np.array(ids), np.array(categories), np.array(published, dtype=bool)
+        tagged = np.array(
+            list(Post.tags.through.objects.using(using).values_list('post_id', 'tag_id').iterator(chunk_size=20_000)),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+
+        # Posts x tags, one 1 per tagging.
+        tag_ids, columns = np.unique(tagged[:, 1], return_inverse=True)
+        tags = sparse.csr_matrix(
+            (np.ones(len(tagged)), (np.searchsorted(ids, tagged[:, 0]), columns)),
+            shape=(len(ids), len(tag_ids)),
+        )
+        published_rows = np.flatnonzero(published)
+        published_count = len(published_rows)
+        set_published_total(published_count, using)
+        document_frequencies = np.asarray(tags[published_rows].sum(axis=0)).ravel()
+        limit = max_tag_posts(published_count)
+        scored = np.flatnonzero(
+            (document_frequencies > 0) & (document_frequencies <= limit)
+            & (document_frequencies < published_count)
+        )
+        idf = np.log(published_count / document_frequencies[scored])
+        sources = tags[:, scored].tocsr()
+        # Scored tags x published posts, idf-weighted: sources @ targets is
+        # the shared-tag score of every pair.
+        targets = (tags[published_rows][:, scored] @ sparse.diags(idf)).T.tocsr()
+        self.stdout.write(
+            f'{len(ids)} posts, {published_count} published, {len(scored)}/{len(tag_ids)} tags scored '
+            f'(skipping tags on more than {limit} posts) ({time.perf_counter() - started:.1f}s)'
+        )
+
+        newest = self.newest_by_category(using, categories)
+        connection = connections[using]
+        table = connection.ops.quote_name(RelatedPost._meta.db_table)
+        insert = f'INSERT INTO {table} (post_id, related_id, score) VALUES (%s, %s, %s)'
+        written = 0
+        for start in range(0, len(ids), chunk_size):
+            rows = self.score_chunk(
+                sources[start:start + chunk_size], start, ids, categories, published_rows, targets, newest
+            )
+            chunk_ids = ids[start:start + chunk_size]
+            # Each chunk's lists are replaced in a short transaction of its
+            # own: readers see a post's old list or its new one, and no lock
+            # is held on the whole table for the whole rebuild.
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                RelatedPost.objects.using(using).filter(
+                    post_id__gte=int(chunk_ids[0]), post_id__lte=int(chunk_ids[-1])
+                ).delete()
+                for batch in range(0, len(rows), INSERT_BATCH_SIZE):
+                    cursor.executemany(insert, rows[batch:batch + INSERT_BATCH_SIZE])
+            written += len(rows)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} related posts in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def newest_by_category(self, using, categories):
+        """Enough of each category's newest published posts to top up any list (see api.related)."""
+        return {
+            category_id: list(
+                Post.objects.using(using).filter(status='published', category_id=category_id)
+                .order_by('-created_at', '-id').values_list('id', flat=True)[:TOP_K + 1]
+            )
+            for category_id in np.unique(categories[categories >= 0]).tolist()
+        }
+
+    def score_chunk(self, chunk, start, ids, categories, published_rows, targets, newest):
+        scores = (chunk @ targets).tocsr()
+        indptr, related_rows, values = scores.indptr, published_rows[scores.indices], scores.data
+        rows = start + np.repeat(np.arange(chunk.shape[0]), np.diff(indptr))
+        # A shared category adds its weight; no post is related to itself.
+        values += CATEGORY_WEIGHT * ((categories[rows] == categories[related_rows]) & (categories[rows] >= 0))
+        values[rows == related_rows] = -1
+        related_ids = ids[related_rows]
+
+        result = []
+        for local in range(chunk.shape[0]):
+            post_id = int(ids[start + local])
+            low, high = indptr[local], indptr[local + 1]
+            row_values, row_ids = values[low:high], related_ids[low:high]
+            if high - low > TOP_K:
+                # Only candidates tied with or above the TOP_K-th score are sorted.
+                threshold = np.partition(row_values, high - low - TOP_K)[high - low - TOP_K]
+                selected = np.flatnonzero(row_values >= threshold)
+            else:
+                selected = np.arange(high - low)
+            # Best first, newest first among equal scores (see api.related.rank).
+            selected = selected[np.lexsort((-row_ids[selected], -row_values[selected]))][:TOP_K]
+            selected = selected[row_values[selected] >= 0]
+            result += zip([post_id] * len(selected), row_ids[selected].tolist(), row_values[selected].tolist())
+
+            # Top up short lists with the category's newest posts.
+            category_id = int(categories[start + local])
+            if len(selected) < TOP_K and category_id >= 0:
+                taken = set(row_ids.tolist())
+                fill = [other for other in newest[category_id] if other != post_id and other not in taken]
+                result += [(post_id, other, CATEGORY_WEIGHT) for other in fill[:TOP_K - len(selected)]]
+        return result
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Post
+from api.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to rebuild')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'])
+        self.stdout.write(f'Rebuilding search index with {type(backend).__name__}...')
+        backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {Post.objects.using(options["database"]).count()} posts')
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import COUNTERS_GENERATION, bump_generation
+from api.counters import repair_counters
+from api.models import Category, Post, Tag
+
+
+class Command(BaseCommand):
+    help = 'Recompute the published post counters of every category and tag'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report how many counters have drifted')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            categories, tags = repair_counters(Category, Tag, Post, dry_run=options['check'])
+        verb = 'drifted' if options['check'] else 'repaired'
+        self.stdout.write(f'{categories} category counter(s) and {tags} tag counter(s) {verb}')
+        if not options['check'] and (categories or tags):
+            bump_generation(COUNTERS_GENERATION)
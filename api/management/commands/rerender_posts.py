@@ -0,0 +1,94 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from api.cache import POSTS_GENERATION, bump_generation
+from api.feeds import invalidate_feeds, post_feed_scopes
+from api.models import Post
+from api.rendering import RENDERER_VERSION, render_content
+
+
+def render_batch(using, post_ids):
+    """Worker: the rendered columns of `post_ids`, with the content they were rendered from."""
+    rows = []
+    for post_id, content in Post.objects.using(using).filter(pk__in=post_ids).values_list('id', 'content'):
+        rendered = render_content(content)
+        rows.append((
+            rendered['content_html'], rendered['excerpt'], rendered['word_count'], rendered['render_version'],
+            post_id, content,
+        ))
+    return rows
+
+
+def feed_scopes(using, post_ids):
+    """The feeds the published posts among `post_ids` appear in."""
+    posts = Post.objects.using(using).filter(pk__in=post_ids, status='published')
+    scopes = set()
+    for category_id, author_id in posts.values_list('category_id', 'author_id').distinct():
+        scopes |= post_feed_scopes(category_id, author_id)
+    tagged = Post.tags.through.objects.using(using).filter(post__in=posts)
+    scopes.update(('tag', tag_id) for tag_id in tagged.values_list('tag_id', flat=True).distinct())
+    return scopes
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-render the stored HTML, excerpt and word count of posts rendered by an older '
+        'renderer (api.rendering), in parallel worker processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render every post, not only outdated ones')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=1000, help='Posts per worker task and transaction')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using, batch_size = options['database'], options['batch_size']
+        started = time.perf_counter()
+        queryset = Post.objects.using(using)
+        if not options['all']:
+            queryset = queryset.filter(render_version__lt=RENDERER_VERSION)
+        post_ids = list(queryset.order_by('id').values_list('id', flat=True))
+        batches = [post_ids[start:start + batch_size] for start in range(0, len(post_ids), batch_size)]
+        self.stdout.write(f'Rendering {len(post_ids)} posts with {options["workers"]} workers')
+
+        connection = connections[using]
+        table = connection.ops.quote_name(Post._meta.db_table)
+        columns = ', '.join(f'{connection.ops.quote_name(field)} = %s' for field in Post.RENDERED_FIELDS)
+        # Posts saved since they were read were rendered by their save: the
+        # content check leaves them alone.
+        update = f'UPDATE {table} SET {columns} WHERE id = %s AND content = %s'
+        written, scopes = 0, set()
+        for done, rows in enumerate(self.render(using, batches, options['workers']), 1):
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                cursor.executemany(update, rows)
+            written += len(rows)
+            scopes |= feed_scopes(using, [row[4] for row in rows])
+            if done % 100 == 0 or done == len(batches):
+                self.stdout.write(f'{written}/{len(post_ids)} posts ({time.perf_counter() - started:.1f}s)')
+        # Cached responses and feeds (which embed the excerpt) hold the
+        # previous rendering.
+        bump_generation(POSTS_GENERATION)
+        invalidate_feeds(scopes, using)
+        self.stdout.write(self.style.SUCCESS(
+            f'Re-rendered {written} posts in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def render(self, using, batches, workers):
+        """Rendered rows per batch, in order; rendering runs in `workers` processes."""
+        connection = connections[using]
+        in_memory = connection.vendor == 'sqlite' and connection.is_in_memory_db()
+        if workers <= 1 or in_memory or connection.in_atomic_block:
+            # Other processes could not see this database or its uncommitted rows.
+            for batch in batches:
+                yield render_batch(using, batch)
+            return
+        # Workers open their own connections; a forked copy of this one must not be used.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            yield from pool.map(render_batch, [using] * len(batches), batches)
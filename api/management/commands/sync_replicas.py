@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.replicas import PRIMARY, replica_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database over the read replicas in BLOG_READ_REPLICAS '
+        '(api.replicas), standing in for replication in local setups'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Replicas to refresh (default: all)')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or replica_aliases()
+        if not aliases:
+            raise CommandError('No read replicas configured (BLOG_READ_REPLICAS).')
+        unknown = [alias for alias in aliases if alias not in replica_aliases()]
+        if unknown:
+            raise CommandError(f'Not read replicas: {", ".join(unknown)}')
+        primary = connections[PRIMARY]
+        for alias in [PRIMARY, *aliases]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias} is not SQLite; use the database\'s own replication.')
+        primary.ensure_connection()
+        for alias in aliases:
+            started = time.perf_counter()
+            replica = connections[alias]
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            self.stdout.write(self.style.SUCCESS(
+                f'Copied {PRIMARY} to {alias} in {time.perf_counter() - started:.2f}s'
+            ))
@@ -0,0 +1,59 @@
+from django.db import OperationalError, migrations
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value)')
+            cursor.execute('DROP TABLE temp.fts5_probe')
+        except OperationalError:
+            return False
+    return True
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        if not sqlite_has_fts5(connection):
+            return
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE api_post_fts USING fts5("
+            "title, content, tokenize = 'porter unicode61', prefix = '2 3')"
+        )
+        schema_editor.execute(
+            'INSERT INTO api_post_fts (rowid, title, content) SELECT id, title, content FROM api_post'
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE api_post_search ('
+            'post_id bigint PRIMARY KEY REFERENCES api_post (id) '
+            'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX api_post_search_document_gin ON api_post_search USING GIN (document)'
+        )
+        schema_editor.execute(
+            "INSERT INTO api_post_search (post_id, document) SELECT id, "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(content, '')), 'B') FROM api_post"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS api_post_fts')
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS api_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
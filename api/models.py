@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from .rendering import render_content
+
 class UserProfile(models.Model):
     ROLE_CHOICES = [
         ('admin', 'Admin'),
@@ -14,6 +17,12 @@ class UserProfile(models.Model):
     bio = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        # The user directory's ?role= filter, walked in user id order.
+        indexes = [
+            models.Index(fields=['role', 'user'], name='profile_role_user_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} - {self.role}"
 
@@ -21,6 +30,8 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by api.counters; repair with `manage.py repair_post_counters`.
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         verbose_name_plural = "Categories"
@@ -31,10 +42,31 @@ class Category(models.Model):
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by api.counters; repair with `manage.py repair_post_counters`.
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
     
     def __str__(self):
         return self.name
 
+class PostQuerySet(models.QuerySet):
+    def with_list_relations(self):
+        tag_counts = (
+            Post.tags.through.objects
+            .filter(post_id=models.OuterRef('pk'))
+            .order_by()
+            .values('post_id')
+            .annotate(count=models.Count('tag_id'))
+            .values('count')
+        )
+        # Category names come from the reference cache, so only the author is
+        # joined; list items show the excerpt, never the content.
+        return self.select_related('author').defer('content', 'content_html').annotate(
+            tags_count=Coalesce(models.Subquery(tag_counts), 0)
+        )
+
+    def with_detail_relations(self):
+        return self.select_related('author')
+
 class Post(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -44,6 +76,11 @@ class Post(models.Model):
     
     title = models.CharField(max_length=200)
     content = models.TextField()
+    # Rendered from content on save (api.rendering); lists read only excerpt.
+    content_html = models.TextField(blank=True, editable=False)
+    excerpt = models.CharField(max_length=320, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    render_version = models.PositiveSmallIntegerField(default=0, editable=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
@@ -51,14 +88,99 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
+    # Written behind by api.view_counts, never by save().
+    view_count = models.PositiveBigIntegerField(default=0, editable=False)
+    trending_score = models.FloatField(null=True, blank=True, editable=False)
+    
+    objects = PostQuerySet.as_manager()
+    
+    WRITE_BEHIND_FIELDS = ('view_count', 'trending_score')
+    RENDERED_FIELDS = ('content_html', 'excerpt', 'word_count', 'render_version')
     
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        # Every list ordering ends with id so keyset pagination can walk these
+        # indexes without a sort step.
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='post_status_created_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='post_author_created_idx'),
+            # /api/my-posts/?status=... and the per-author status summary.
+            models.Index(fields=['author', 'status', '-created_at', '-id'], name='post_author_status_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='post_category_created_idx'),
+            models.Index(fields=['status', '-updated_at', '-id'], name='post_status_updated_idx'),
+            models.Index(
+                fields=['-published_at', '-id'], name='post_published_idx',
+                condition=models.Q(status='published'),
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'], name='post_trending_idx',
+                condition=models.Q(status='published'),
+            ),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the category/tag counters currently include for this post.
+        instance._counted_state = instance.get_counted_state()
+        return instance
+    
+    def get_counted_state(self):
+        """(status, category_id) as loaded, or None if either field is deferred."""
+        if 'status' not in self.__dict__ or 'category_id' not in self.__dict__:
+            return None
+        return self.status, self.category_id
     
     def save(self, *args, **kwargs):
+        self.stamp_published_at()
+        deferred = self.get_deferred_fields()
+        update_fields = kwargs.get('update_fields')
+        if 'content' not in deferred and (update_fields is None or 'content' in update_fields):
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.RENDERED_FIELDS}
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            # Saving a loaded post must not write back the view counts it was
+            # loaded with over the ones flushed since.
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+                and field.attname not in self.WRITE_BEHIND_FIELDS
+            ]
+        # post_save handlers adjust the category/tag counters; they commit or
+        # roll back together with the row.
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+    
+    def render_content(self):
+        """Store content's HTML, excerpt and word count (also used by bulk writes)."""
+        for field, value in render_content(self.content).items():
+            setattr(self, field, value)
+    
+    def stamp_published_at(self, now=None):
+        """Set published_at the first time the post is published (also used by bulk writes)."""
         if self.status == 'published' and not self.published_at:
-            self.published_at = timezone.now()
-        super().save(*args, **kwargs)
+            self.published_at = now or timezone.now()
     
     def __str__(self):
         return self.title
+
+class RelatedPost(models.Model):
+    """
+    One of a post's precomputed top-K related posts (see api.related).
+    Maintained on writes; rebuild with `manage.py rebuild_related_posts`.
+    """
+    # post_related_score_idx leads with post, so no separate index on it.
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_posts', db_index=False)
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_from')
+    score = models.FloatField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-score', '-related'], name='post_related_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id} ({self.score:.3f})'
@@ -0,0 +1,233 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (ordering field, id).
+
+    Each page is a single indexed range query: no COUNT and no OFFSET, so the
+    cost of a page does not depend on how deep into the result set it is.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    page_size = api_settings.PAGE_SIZE
+    ordering_fields = ('created_at', 'updated_at', 'published_at')
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        if request is None:
+            return False
+        params = request.query_params
+        return params.get(cls.mode_query_param) == 'cursor' or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page([row async for row in page_queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """The page's rows plus one, to tell whether another page follows."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, view)
+        self.field = self.ordering.lstrip('-')
+        self.nullable = self.is_nullable(queryset.model, self.field)
+
+        cursor = self.cursor = self.decode_cursor(request)
+        self.reverse = cursor['r'] if cursor else False
+        descending = self.ordering.startswith('-') != self.reverse
+        # Forward pages put NULLs last; walking backwards mirrors that.
+        nulls_last = not self.reverse
+
+        queryset = queryset.order_by(*self.get_order_by(descending, nulls_last))
+        if cursor:
+            queryset = queryset.filter(
+                self.get_keyset_filter(cursor['v'], cursor['pk'], descending, nulls_last)
+            )
+
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        cursor = self.cursor
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        if self.reverse:
+            self.has_next, self.has_previous = cursor is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def get_ordering(self, request, view):
+        allowed = getattr(view, 'ordering_fields', None) or self.ordering_fields
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM, '')
+        # Only the first term matters; ties are always broken on id.
+        ordering = ordering.split(',')[0].strip()
+        if ordering.lstrip('-') in allowed:
+            return ordering
+        return self.default_ordering
+
+    def is_nullable(self, model, field_name):
+        try:
+            return model._meta.get_field(field_name).null
+        except FieldDoesNotExist:
+            return False
+
+    def get_order_by(self, descending, nulls_last):
+        if not self.nullable:
+            prefix = '-' if descending else ''
+            return [f'{prefix}{self.field}', f'{prefix}id']
+        expression = F(self.field)
+        if descending:
+            field_order = expression.desc(nulls_last=True) if nulls_last else expression.desc(nulls_first=True)
+        else:
+            field_order = expression.asc(nulls_last=True) if nulls_last else expression.asc(nulls_first=True)
+        return [field_order, '-id' if descending else 'id']
+
+    def get_keyset_filter(self, value, pk, descending, nulls_last):
+        lookup = 'lt' if descending else 'gt'
+        field = self.field
+        if value is None:
+            after = Q(**{f'{field}__isnull': True, f'id__{lookup}': pk})
+            if not nulls_last:
+                after |= Q(**{f'{field}__isnull': False})
+            return after
+        after = Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': pk})
+        if self.nullable and nulls_last:
+            after |= Q(**{f'{field}__isnull': True})
+        return after
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            pk = int(cursor['pk'])
+            value = cursor['v']
+            if value is not None:
+                value = parse_datetime(value)
+                if value is None:
+                    raise ValueError
+            return {'v': value, 'pk': pk, 'r': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_row_value(self, row, name):
+        # Pages may hold model instances or `.values()` dicts.
+        if isinstance(row, dict):
+            return row['id' if name == 'pk' else name]
+        return getattr(row, name)
+
+    def encode_cursor(self, row, reverse):
+        value = self.get_row_value(row, self.field)
+        cursor = {
+            'v': value.isoformat() if value is not None else None,
+            'pk': self.get_row_value(row, 'pk'),
+            'r': reverse,
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode('utf-8'))
+        url = remove_query_param(self.base_url, 'page')
+        url = replace_query_param(url, self.mode_query_param, 'cursor')
+        return replace_query_param(url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class CappedPaginator(Paginator):
+    """Paginator whose COUNT stops after `max_count` rows instead of scanning the whole table."""
+    max_count = 10_000
+
+    @cached_property
+    def count(self):
+        return self.object_list[:self.max_count].count()
+
+
+class CappedPageNumberPagination(PageNumberPagination):
+    """
+    Page-number pagination for large tables: `count` saturates at
+    `CappedPaginator.max_count`, so neither the COUNT nor the OFFSET of a page
+    ever scans past that many rows. Clients narrow the results with filters
+    instead of paging deeper.
+    """
+    django_paginator_class = CappedPaginator
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+async def apaginate_page_number(pagination, queryset, request):
+    """
+    `PageNumberPagination.paginate_queryset` on the async ORM: one `acount()`
+    and one async slice, leaving `pagination` ready for
+    `get_paginated_response()`.
+    """
+    pagination.request = request
+    page_size = pagination.get_page_size(request)
+    if not page_size:
+        return None
+    paginator = pagination.django_paginator_class(queryset, page_size)
+    # Paginator.count is a cached_property; fill it without a sync query.
+    # CappedPaginator bounds the count the same way its property does.
+    max_count = getattr(paginator, 'max_count', None)
+    paginator.count = await (queryset[:max_count] if max_count else queryset).acount()
+    page_number = pagination.get_page_number(request, paginator)
+    try:
+        number = paginator.validate_number(page_number)
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    bottom = (number - 1) * page_size
+    top = bottom + page_size
+    if top + paginator.orphans >= paginator.count:
+        top = paginator.count
+    rows = [row async for row in queryset[bottom:top]]
+    pagination.page = Page(rows, number, paginator)
+    if paginator.num_pages > 1 and pagination.template is not None:
+        pagination.display_page_controls = True
+    return rows
@@ -1,10 +1,20 @@
 from rest_framework import permissions
 
+from .authentication import RoleTokenUser
+
+
+def get_user_role(user):
+    """Role of a token user (from its claims) or of a User (from its profile)."""
+    if isinstance(user, RoleTokenUser):
+        return user.role
+    profile = getattr(user, 'userprofile', None)
+    return profile.role if profile is not None else None
+
 class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return request.user.is_authenticated and hasattr(request.user, 'userprofile') and request.user.userprofile.role == 'admin'
+        return request.user.is_authenticated and get_user_role(request.user) == 'admin'
 
 class IsOwnerOrAdminOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -12,13 +22,14 @@ class IsOwnerOrAdminOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         
+        role = get_user_role(request.user)
         # Admin can do anything
-        if hasattr(request.user, 'userprofile') and request.user.userprofile.role == 'admin':
+        if role == 'admin':
             return True
         
         # Editors can edit their own posts
-        if hasattr(request.user, 'userprofile') and request.user.userprofile.role == 'editor':
-            return obj.author == request.user
+        if role == 'editor':
+            return obj.author_id == request.user.id
         
         return False
 
@@ -26,15 +37,13 @@ class CanCreatePost(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method == 'POST':
             return (request.user.is_authenticated and 
-                   hasattr(request.user, 'userprofile') and 
-                   request.user.userprofile.role in ['admin', 'editor'])
+                   get_user_role(request.user) in ['admin', 'editor'])
         return True
 
 class CanViewPublishedOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # Admins and editors can see all posts
-        if (hasattr(request.user, 'userprofile') and 
-            request.user.userprofile.role in ['admin', 'editor']):
+        if get_user_role(request.user) in ['admin', 'editor']:
             return True
         
         # Readers can only see published posts
@@ -0,0 +1,189 @@
+import threading
+
+from .cache import COUNTERS_GENERATION, REFERENCE_GENERATION, aget_generation, get_generation
+from .counters import COUNTER_FIELD
+from .replicas import primary_reads
+
+
+def uncounted_fields(serializer):
+    """The fields of a category/tag FastSerializer but its published post counter."""
+    return [key for key, _, _ in serializer.columns if key != COUNTER_FIELD]
+
+
+class ReferenceSnapshot:
+    """Category and tag rows without their counters, which CountedSnapshot adds."""
+
+    def __init__(self, generation, categories, tags):
+        self.generation = generation
+        self.categories = categories
+        self.tags = tags
+        self.category_names = {row['id']: row['name'] for row in categories}
+        self.tags_by_id = {row['id']: row for row in tags}
+        self.tag_ids_by_name = {row['name']: row['id'] for row in tags}
+
+    def covers(self, category_ids=(), tag_ids=()):
+        """Whether every given category and tag is in the snapshot, so no fallback query is needed."""
+        return (
+            all(category_id in self.category_names for category_id in category_ids if category_id is not None)
+            and all(tag_id in self.tags_by_id for tag_id in tag_ids)
+        )
+
+
+class CountedSnapshot:
+    """A ReferenceSnapshot's rows with the published post counters of one COUNTERS_GENERATION."""
+
+    def __init__(self, reference, generation, category_counts, tag_counts):
+        self.reference = reference
+        self.generation = generation
+        self.categories = [
+            {**row, COUNTER_FIELD: category_counts.get(row['id'], 0)} for row in reference.categories
+        ]
+        self.tags = [{**row, COUNTER_FIELD: tag_counts.get(row['id'], 0)} for row in reference.tags]
+
+
+class ReferenceCache:
+    """
+    Per-process copy of the serialized category and tag lists.
+
+    Categories and tags are small and rarely change, so every worker keeps
+    them in memory and only checks the shared REFERENCE_GENERATION counter on
+    each read: one cache get instead of a query plus serialization.
+
+    Their published post counters change with every publish, so they are kept
+    apart (`counted()`), under COUNTERS_GENERATION: a counter update reloads
+    two (id, count) columns, and leaves the names, and the ETags of the posts
+    embedding them, alone.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._counted = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        generation = get_generation(REFERENCE_GENERATION)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.generation == generation:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.generation != generation:
+                snapshot = self._snapshot = self.load(generation)
+        return snapshot
+
+    async def aget(self):
+        """`get()` for async views: a stale snapshot is reloaded with the async ORM."""
+        generation = await aget_generation(REFERENCE_GENERATION)
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.generation != generation:
+            # No lock: the event loop runs one coroutine at a time, and two
+            # that reload concurrently build the same snapshot.
+            snapshot = self._snapshot = await self.aload(generation)
+        return snapshot
+
+    def counted(self):
+        """The categories and tags with their current published post counters."""
+        reference = self.get()
+        generation = get_generation(COUNTERS_GENERATION)
+        counted = self._counted
+        if counted is not None and counted.reference is reference and counted.generation == generation:
+            return counted
+        with self._lock:
+            counted = self._counted
+            if counted is None or counted.reference is not reference or counted.generation != generation:
+                counted = self._counted = self.load_counts(reference, generation)
+        return counted
+
+    async def acounted(self):
+        reference = await self.aget()
+        generation = await aget_generation(COUNTERS_GENERATION)
+        counted = self._counted
+        if counted is None or counted.reference is not reference or counted.generation != generation:
+            counted = self._counted = await self.aload_counts(reference, generation)
+        return counted
+
+    def load(self, generation):
+        # The generation is read before the tables, so a write that lands in
+        # between only makes this snapshot newer than its label.
+        from .fast_serializers import category_serializer, tag_serializer
+        from .models import Category, Tag
+        category_fields, tag_fields = uncounted_fields(category_serializer), uncounted_fields(tag_serializer)
+        with primary_reads():
+            return ReferenceSnapshot(
+                generation,
+                category_serializer.serialize(
+                    category_serializer.values(Category.objects.all(), fields=category_fields), fields=category_fields
+                ),
+                tag_serializer.serialize(tag_serializer.values(Tag.objects.all(), fields=tag_fields), fields=tag_fields),
+            )
+
+    async def aload(self, generation):
+        from .fast_serializers import category_serializer, tag_serializer
+        from .models import Category, Tag
+        category_fields, tag_fields = uncounted_fields(category_serializer), uncounted_fields(tag_serializer)
+        with primary_reads():
+            categories = [
+                row async for row in category_serializer.values(Category.objects.all(), fields=category_fields)
+            ]
+            tags = [row async for row in tag_serializer.values(Tag.objects.all(), fields=tag_fields)]
+        return ReferenceSnapshot(
+            generation,
+            category_serializer.serialize(categories, fields=category_fields),
+            tag_serializer.serialize(tags, fields=tag_fields),
+        )
+
+    def load_counts(self, reference, generation):
+        from .models import Category, Tag
+        with primary_reads():
+            return CountedSnapshot(
+                reference, generation,
+                dict(Category.objects.values_list('id', COUNTER_FIELD)),
+                dict(Tag.objects.values_list('id', COUNTER_FIELD)),
+            )
+
+    async def aload_counts(self, reference, generation):
+        from .models import Category, Tag
+        with primary_reads():
+            category_counts = {pk: count async for pk, count in Category.objects.values_list('id', COUNTER_FIELD)}
+            tag_counts = {pk: count async for pk, count in Tag.objects.values_list('id', COUNTER_FIELD)}
+        return CountedSnapshot(reference, generation, category_counts, tag_counts)
+
+    def clear(self):
+        self._snapshot = None
+        self._counted = None
+
+    def category_name(self, category_id):
+        name = self.get().category_names.get(category_id)
+        if name is None:
+            from .models import Category
+            name = Category.objects.filter(pk=category_id).values_list('name', flat=True).first()
+        return name
+
+    def tags(self, tag_ids):
+        tags_by_id = self.get().tags_by_id
+        missing = [tag_id for tag_id in tag_ids if tag_id not in tags_by_id]
+        if missing:
+            from .fast_serializers import tag_serializer
+            from .models import Tag
+            fields = uncounted_fields(tag_serializer)
+            tags_by_id = dict(tags_by_id)
+            tags_by_id.update(
+                (row['id'], row)
+                for row in tag_serializer.serialize(
+                    tag_serializer.values(Tag.objects.filter(pk__in=missing), fields=fields), fields=fields
+                )
+            )
+        return [tags_by_id[tag_id] for tag_id in tag_ids if tag_id in tags_by_id]
+
+    def tag_ids_by_name(self, names):
+        """Ids of the named tags that exist, keyed by name."""
+        known = self.get().tag_ids_by_name
+        tag_ids = {name: known[name] for name in names if name in known}
+        missing = [name for name in names if name not in known]
+        if missing:
+            from .models import Tag
+            tag_ids.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+        return tag_ids
+
+
+reference_cache = ReferenceCache()
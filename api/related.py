@@ -0,0 +1,239 @@
+"""
+Related posts: every post's top TOP_K published neighbours, stored in
+RelatedPost so `/api/posts/{id}/related/` is a single indexed read.
+
+    score(a, b) = sum(idf(t) for t in tags(a) & tags(b))
+                  + CATEGORY_WEIGHT if a and b share a category
+    idf(t) = log(N / df(t)), over the N published posts
+
+Only posts sharing a tag with `a` are scored. Tags on more than
+`max_tag_posts(N)` posts are skipped like stop words: they carry almost no
+weight and would make most posts candidates of each other. A post with fewer
+than TOP_K scored neighbours is topped up with the newest published posts of
+its category, at CATEGORY_WEIGHT.
+
+Writes refresh the affected posts once their transaction commits
+(`refresh_posts`): their own lists are recomputed, and they are offered to the
+lists of their new neighbours (the score is symmetric). That keeps lists
+close, not exact: other posts' scores keep the idf of their last refresh,
+lists that lose a neighbour shrink, drafts' lists only change with their
+own writes, and N is a cached total kept in step by the writes
+(`published_total`) rather than a COUNT per write.
+`manage.py rebuild_related_posts` recomputes every list with sparse matrix
+products, replacing them a chunk of posts at a time while reads go on; run it
+periodically, e.g. nightly.
+"""
+import heapq
+import math
+
+from django.db import transaction
+
+from .cache import get_cache
+
+TOP_K = 10
+CATEGORY_WEIGHT = 1.0
+MAX_TAG_SHARE = 0.01
+MIN_MAX_TAG_POSTS = 1000
+CANDIDATE_BATCH_SIZE = 500
+# Recounted this often, in case the running total drifted.
+PUBLISHED_TOTAL_TIMEOUT = 60 * 60
+
+
+def _published_total_key(using):
+    return f'related:published_total:{using}'
+
+
+def published_total(using='default'):
+    """
+    N, the number of published posts: counted at most once per
+    PUBLISHED_TOTAL_TIMEOUT and adjusted by writes in between.
+    """
+    from .models import Post
+    total = get_cache().get(_published_total_key(using))
+    if total is None:
+        total = Post.objects.using(using).filter(status='published').count()
+        set_published_total(total, using)
+    return total
+
+
+def set_published_total(total, using='default'):
+    get_cache().set(_published_total_key(using), total, PUBLISHED_TOTAL_TIMEOUT)
+
+
+def adjust_published_total_on_commit(delta, using='default'):
+    """Add `delta` published posts to the cached total once the write commits."""
+    def adjust():
+        try:
+            get_cache().incr(_published_total_key(using), delta)
+        except ValueError:
+            # Not cached: the next read counts.
+            pass
+    if delta:
+        transaction.on_commit(adjust, using=using)
+
+
+def max_tag_posts(published_count):
+    return max(MIN_MAX_TAG_POSTS, int(published_count * MAX_TAG_SHARE))
+
+
+def tag_weights(published_count, document_frequencies):
+    """idf per tag from (tag_id, published post count) pairs; stop-word tags are left out."""
+    limit = max_tag_posts(published_count)
+    return {
+        tag_id: math.log(published_count / count)
+        for tag_id, count in document_frequencies
+        if 0 < count <= limit and count < published_count
+    }
+
+
+def rank(scored):
+    """The TOP_K best (post_id, score) pairs, newest first among equal scores."""
+    return heapq.nlargest(TOP_K, scored, key=lambda item: (item[1], item[0]))
+
+
+def score_neighbours(post_id, category_id, tag_ids, weights, using='default'):
+    """A post's top TOP_K (post_id, score) neighbours among the published posts."""
+    from .models import Post
+    weights = {tag_id: weights[tag_id] for tag_id in tag_ids if tag_id in weights}
+    shared = {}
+    if weights:
+        # Tag matches first, through the tag_id index; joining posts here
+        # lets the planner scan every published post instead.
+        tagged = (
+            Post.tags.through.objects.using(using)
+            .filter(tag_id__in=weights).exclude(post_id=post_id).values_list('post_id', 'tag_id')
+        )
+        for other, tag_id in tagged:
+            shared[other] = shared.get(other, 0.0) + weights[tag_id]
+    # Candidates are confirmed published, and given their category bonus, best
+    # first, until none left can reach the top TOP_K. Candidates come in
+    # rank() order, so later ones tied with the TOP_K-th can never pass it.
+    candidates = sorted(shared.items(), key=lambda item: (item[1], item[0]), reverse=True)
+    scores = {}
+    for start in range(0, len(candidates), CANDIDATE_BATCH_SIZE):
+        best = rank(scores.items())
+        other, score = candidates[start]
+        if len(best) == TOP_K and (score + CATEGORY_WEIGHT, other) < (best[-1][1], best[-1][0]):
+            break
+        batch = dict(candidates[start:start + CANDIDATE_BATCH_SIZE])
+        # Looked up by primary key alone: with the status in the query, the
+        # planner prefers scanning the status index.
+        for other, status, other_category_id in (
+            Post.objects.using(using).filter(pk__in=batch).values_list('id', 'status', 'category_id')
+        ):
+            if status != 'published':
+                continue
+            same_category = category_id is not None and other_category_id == category_id
+            scores[other] = batch[other] + (CATEGORY_WEIGHT if same_category else 0.0)
+    best = rank(scores.items())
+    if len(best) < TOP_K and category_id is not None:
+        newest = (
+            Post.objects.using(using).filter(status='published', category_id=category_id)
+            .exclude(pk__in=[post_id, *scores]).order_by('-created_at', '-id')
+            .values_list('id', flat=True)[:TOP_K - len(best)]
+        )
+        best += [(other, CATEGORY_WEIGHT) for other in newest]
+    return best
+
+
+def pair_score(tag_ids, category_id, other_tag_ids, other_category_id, weights):
+    score = sum(weights.get(tag_id, 0.0) for tag_id in set(tag_ids) & set(other_tag_ids))
+    if category_id is not None and category_id == other_category_id:
+        score += CATEGORY_WEIGHT
+    return score
+
+
+def refresh_posts(post_ids, using='default'):
+    """Recompute the related posts of `post_ids` and offer them to their neighbours' lists."""
+    from .models import Post, RelatedPost, Tag
+    post_ids = set(post_ids)
+    if not post_ids:
+        return
+    through = Post.tags.through.objects.using(using)
+    published_count = published_total(using)
+    tags_by_post = {}
+    for post_id, tag_id in through.filter(post_id__in=post_ids).values_list('post_id', 'tag_id'):
+        tags_by_post.setdefault(post_id, []).append(tag_id)
+    weights = tag_weights(
+        published_count,
+        Tag.objects.using(using)
+        .filter(id__in={tag_id for tag_ids in tags_by_post.values() for tag_id in tag_ids})
+        .values_list('id', 'published_post_count'),
+    )
+    posts = {
+        post_id: (status, category_id)
+        for post_id, status, category_id in (
+            Post.objects.using(using).filter(pk__in=post_ids).values_list('id', 'status', 'category_id')
+        )
+    }
+
+    with transaction.atomic(using=using):
+        # A refreshed post's score against everyone else may have changed.
+        holders = RelatedPost.objects.using(using).filter(related_id__in=post_ids).exclude(post_id__in=post_ids)
+        previous = set(holders.values_list('post_id', 'related_id'))
+        RelatedPost.objects.using(using).filter(post_id__in=post_ids).delete()
+        RelatedPost.objects.using(using).filter(related_id__in=post_ids).delete()
+        rows, offers = [], {}
+        for post_id, (status, category_id) in posts.items():
+            neighbours = score_neighbours(post_id, category_id, tags_by_post.get(post_id, []), weights, using)
+            rows += [RelatedPost(post_id=post_id, related_id=other, score=score) for other, score in neighbours]
+            if status == 'published':
+                for other, score in neighbours:
+                    if other not in post_ids:
+                        offers.setdefault(other, []).append((post_id, score))
+                        previous.discard((other, post_id))
+        RelatedPost.objects.using(using).bulk_create(rows)
+
+        # Lists that held a refreshed post outside its own top TOP_K get it
+        # back at its new score, if it still scores and is still published.
+        previous = [
+            (other, post_id) for other, post_id in previous
+            if post_id in posts and posts[post_id][0] == 'published'
+        ]
+        if previous:
+            holder_ids = {other for other, _ in previous}
+            holder_tags = {}
+            for other, tag_id in through.filter(post_id__in=holder_ids).values_list('post_id', 'tag_id'):
+                holder_tags.setdefault(other, []).append(tag_id)
+            holder_categories = dict(
+                Post.objects.using(using).filter(pk__in=holder_ids).values_list('id', 'category_id')
+            )
+            for other, post_id in previous:
+                score = pair_score(
+                    holder_tags.get(other, []), holder_categories.get(other),
+                    tags_by_post.get(post_id, []), posts[post_id][1], weights,
+                )
+                if score > 0:
+                    offers.setdefault(other, []).append((post_id, score))
+        offer(offers, using)
+
+
+def offer(offers, using='default'):
+    """Merge {post_id: [(related_id, score)]} into those posts' lists, keeping each list's TOP_K best."""
+    from .models import RelatedPost
+    if not offers:
+        return
+    current = {}
+    for row in (
+        RelatedPost.objects.using(using).filter(post_id__in=offers)
+        .values_list('id', 'post_id', 'related_id', 'score')
+    ):
+        current.setdefault(row[1], []).append(row)
+    created, dropped = [], []
+    for post_id, candidates in offers.items():
+        # Candidates are never in the list already: refresh_posts removed them.
+        rows = current.get(post_id, [])
+        keep = {related_id for related_id, _ in rank([(row[2], row[3]) for row in rows] + candidates)}
+        dropped += [row[0] for row in rows if row[2] not in keep]
+        created += [
+            RelatedPost(post_id=post_id, related_id=related_id, score=score)
+            for related_id, score in candidates if related_id in keep
+        ]
+    RelatedPost.objects.using(using).filter(id__in=dropped).delete()
+    RelatedPost.objects.using(using).bulk_create(created)
+
+
+def refresh_posts_on_commit(post_ids, using='default'):
+    post_ids = list(post_ids)
+    if post_ids:
+        transaction.on_commit(lambda: refresh_posts(post_ids, using), using=using)
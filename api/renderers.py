@@ -0,0 +1,51 @@
+import csv
+import json
+
+from rest_framework import renderers
+
+
+class Echo:
+    """File-like object whose write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def as_rows(data):
+    if data is None:
+        return []
+    if isinstance(data, dict):
+        return [data]
+    return data
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """One compact JSON object per line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return ''.join(self.lines(as_rows(data))).encode(self.charset)
+
+    def lines(self, rows):
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """A header row followed by one line per row; None becomes an empty cell."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = as_rows(data)
+        header = list(rows[0]) if rows else []
+        return ''.join(self.lines(header, rows)).encode(self.charset)
+
+    def lines(self, header, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([row[key] for key in header])
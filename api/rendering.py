@@ -0,0 +1,80 @@
+"""
+Render-on-write Markdown: a post's content is converted once, when it is
+saved, into sanitized HTML, a plain-text excerpt and a word count, stored
+next to it (see Post.render_content). Readers get the stored HTML; lists get
+the excerpt and never load the content.
+
+Sanitizing: raw HTML in the Markdown is escaped rather than passed through,
+and links or images whose URL scheme is not in SAFE_URL_SCHEMES lose the
+URL, so the output can be embedded as is.
+
+Bump RENDERER_VERSION whenever the output changes (new extensions, a
+Markdown upgrade), then run `manage.py rerender_posts` to re-render the
+posts stored with an older version.
+"""
+import html
+import re
+import threading
+from urllib.parse import urlsplit
+
+import markdown
+from django.utils.html import strip_tags
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+RENDERER_VERSION = 1
+EXCERPT_LENGTH = 300
+EXTENSIONS = ['fenced_code', 'tables', 'sane_lists']
+SAFE_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+URL_ATTRIBUTES = ('href', 'src')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+class SafeUrlTreeprocessor(Treeprocessor):
+    def run(self, root):
+        for element in root.iter():
+            for attribute in URL_ATTRIBUTES:
+                url = element.get(attribute)
+                if url is not None and urlsplit(html.unescape(url).strip()).scheme.lower() not in SAFE_URL_SCHEMES:
+                    element.set(attribute, '')
+
+
+class SanitizeExtension(Extension):
+    """Escape raw HTML and drop unsafe link/image URLs."""
+
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        md.treeprocessors.register(SafeUrlTreeprocessor(md), 'safe_urls', 0)
+
+
+_local = threading.local()
+
+
+def get_renderer():
+    # Markdown instances keep state between conversions, so each thread gets its own.
+    renderer = getattr(_local, 'renderer', None)
+    if renderer is None:
+        renderer = _local.renderer = markdown.Markdown(extensions=[*EXTENSIONS, SanitizeExtension()])
+    return renderer
+
+
+def make_excerpt(text):
+    """The first EXCERPT_LENGTH characters of `text`, cut at a word boundary."""
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    cut = text[:EXCERPT_LENGTH].rsplit(' ', 1)[0] if ' ' in text[:EXCERPT_LENGTH] else text[:EXCERPT_LENGTH - 1]
+    return cut.rstrip() + '\u2026'
+
+
+def render_content(content):
+    """The stored rendering of `content`: {'content_html', 'excerpt', 'word_count', 'render_version'}."""
+    renderer = get_renderer()
+    content_html = renderer.reset().convert(content or '')
+    text = WHITESPACE_RE.sub(' ', html.unescape(strip_tags(content_html))).strip()
+    return {
+        'content_html': content_html,
+        'excerpt': make_excerpt(text),
+        'word_count': len(text.split()),
+        'render_version': RENDERER_VERSION,
+    }
@@ -0,0 +1,267 @@
+"""
+Read replicas: GET/HEAD/OPTIONS requests read from the database aliases in
+BLOG_READ_REPLICAS; everything else, and every write, uses the primary
+(`default`).
+
+ReplicaMiddleware marks which requests may read from a replica;
+ReplicaRouter picks one at the request's first read and keeps it for the
+rest of the request, so a response is built from one consistent copy.
+Queries outside a request (commands, on_commit hooks, the view count flush)
+stay on the primary.
+
+Selection (BLOG_REPLICA_SELECTION):
+
+    round_robin             rotate over the replicas that have not failed
+                            in the last BLOG_REPLICA_RETRY_AFTER seconds
+    least_recently_failed   prefer the replicas whose last failure is the
+                            oldest (never failed first), rotating between
+                            equals; a replica that failed within the retry
+                            window is not used
+
+A request whose replica raises a DatabaseError marks it failed and is served
+once more from the primary. With no replica to use, reads go to the primary.
+
+Reads that fill a shared or per-process cache (the response and feed caches,
+the reference snapshot, the tag index) run under `primary_reads()`: those
+caches are labelled with the current generation or journal sequence, so a
+lagging replica's rows stored under them would outlive the lag.
+
+Read-your-writes: a user whose write succeeded is pinned to the primary for
+BLOG_PRIMARY_PIN_SECONDS, so replication lag never hides their own change.
+Pins live in the blog cache, so they are shared by the workers that share it
+(see BLOG_CACHE_URL).
+"""
+import itertools
+import logging
+import threading
+import time
+
+from asgiref.local import Local
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.utils.functional import SimpleLazyObject, empty
+
+from .cache import get_cache
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = DEFAULT_DB_ALIAS
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+SELECTIONS = ('round_robin', 'least_recently_failed')
+
+
+def replica_aliases():
+    return list(getattr(settings, 'BLOG_READ_REPLICAS', []))
+
+
+def pin_seconds():
+    return getattr(settings, 'BLOG_PRIMARY_PIN_SECONDS', 10)
+
+
+def _pin_key(user_id):
+    return f'replicas:pinned:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send `user_id`'s reads to the primary for the next BLOG_PRIMARY_PIN_SECONDS."""
+    get_cache().set(_pin_key(user_id), True, pin_seconds())
+
+
+def is_pinned(user_id):
+    return user_id is not None and get_cache().get(_pin_key(user_id)) is not None
+
+
+def request_user_id(request):
+    """
+    The id of the user the request was authenticated as, or None. A session
+    user nobody has asked for yet is left unresolved: resolving it would read
+    the session from inside the router.
+    """
+    user = request.__dict__.get('user')
+    if isinstance(user, SimpleLazyObject):
+        if user._wrapped is empty:
+            return None
+        user = user._wrapped
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+class ReplicaPool:
+    """Per-process replica selection and failure bookkeeping."""
+
+    def __init__(self):
+        self._failed_at = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def choose(self):
+        """A replica alias to read from, or None for the primary."""
+        replicas = replica_aliases()
+        if not replicas:
+            return None
+        selection = getattr(settings, 'BLOG_REPLICA_SELECTION', 'round_robin')
+        if selection not in SELECTIONS:
+            raise ImproperlyConfigured(f'BLOG_REPLICA_SELECTION must be one of {", ".join(SELECTIONS)}')
+        retry_after = getattr(settings, 'BLOG_REPLICA_RETRY_AFTER', 30)
+        now = time.monotonic()
+        with self._lock:
+            turn = next(self._counter)
+            failed_at = {alias: self._failed_at.get(alias) for alias in replicas}
+        healthy = [
+            alias for alias in replicas
+            if failed_at[alias] is None or now - failed_at[alias] >= retry_after
+        ]
+        if not healthy:
+            return None
+        if selection == 'least_recently_failed':
+            oldest = min(failed_at[alias] or float('-inf') for alias in healthy)
+            healthy = [alias for alias in healthy if (failed_at[alias] or float('-inf')) == oldest]
+        return healthy[turn % len(healthy)]
+
+    def mark_failed(self, alias):
+        with self._lock:
+            self._failed_at[alias] = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._failed_at.clear()
+            self._counter = itertools.count()
+
+
+replica_pool = ReplicaPool()
+
+
+class RequestRouting:
+    """Where the current request reads from; resolved at its first read."""
+
+    def __init__(self, request):
+        self.request = request
+        self.may_use_replica = request.method in SAFE_METHODS
+        self.resolved = False
+        self.alias = None
+        self.primary_depth = 0
+
+    def read_alias(self):
+        if self.primary_depth:
+            return PRIMARY
+        if not self.resolved:
+            self.resolved = True
+            if self.may_use_replica and not is_pinned(request_user_id(self.request)):
+                self.alias = replica_pool.choose()
+        return self.alias or PRIMARY
+
+    def use_primary(self):
+        self.resolved, self.alias = True, None
+
+
+_local = Local()
+
+
+def current_routing():
+    return getattr(_local, 'routing', None)
+
+
+class primary_reads:
+    """Send the current request's reads in the block to the primary (see module docstring)."""
+
+    __slots__ = ('routing',)
+
+    def __enter__(self):
+        self.routing = current_routing()
+        if self.routing is not None:
+            self.routing.primary_depth += 1
+
+    def __exit__(self, *exc_info):
+        if self.routing is not None:
+            self.routing.primary_depth -= 1
+
+
+class ReplicaRouter:
+    """Database router sending the reads of safe requests to a replica (see module docstring)."""
+
+    def db_for_read(self, model, **hints):
+        routing = current_routing()
+        if routing is None or not replica_aliases():
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == PRIMARY:
+            # Related objects of a row read from the primary come from it too.
+            return PRIMARY
+        return routing.read_alias()
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in replica_aliases():
+            return PRIMARY
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY, *replica_aliases()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, never migrated on their own.
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Scopes ReplicaRouter to each request, pins users to the primary after
+    a successful write and retries reads whose replica failed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        previous = current_routing()
+        _local.routing = RequestRouting(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.routing = previous
+        self.pin_writer(request, response)
+        return response
+
+    async def __acall__(self, request):
+        previous = current_routing()
+        _local.routing = RequestRouting(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _local.routing = previous
+        self.pin_writer(request, response)
+        return response
+
+    def pin_writer(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400 or not replica_aliases():
+            return
+        user_id = request_user_id(request)
+        if user_id is not None:
+            pin_to_primary(user_id)
+
+    def process_exception(self, request, exception):
+        routing = current_routing()
+        if routing is None or routing.alias is None or not isinstance(exception, DatabaseError):
+            return None
+        logger.warning('Read replica %s failed; reading from the primary', routing.alias, exc_info=exception)
+        replica_pool.mark_failed(routing.alias)
+        routing.use_primary()
+        match = request.resolver_match
+        view = match.func
+        if iscoroutinefunction(view):
+            view = async_to_sync(view)
+        return view(request, *match.args, **match.kwargs)
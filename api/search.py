@@ -0,0 +1,235 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.html import escape
+
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+SNIPPET_WORDS = 16
+POSTGRES_SEARCH_CONFIG = 'english'
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(terms):
+    words = []
+    for term in terms:
+        words.extend(_TERM_RE.findall(term))
+    return words
+
+
+def format_snippet(snippet):
+    """Escape a raw index snippet and turn the match markers into <mark> tags."""
+    return (
+        escape(snippet)
+        .replace(SNIPPET_START, '<mark>')
+        .replace(SNIPPET_END, '</mark>')
+    )
+
+
+def make_snippet(text, words, size=SNIPPET_WORDS):
+    """Cut a window of `size` words around the first match and mark every matching word."""
+    prefixes = tuple(word.lower() for word in words)
+
+    def is_match(token):
+        return any(core.lower().startswith(prefixes) for core in _TERM_RE.findall(token))
+
+    tokens = text.split()
+    start = 0
+    for index, token in enumerate(tokens):
+        if is_match(token):
+            start = max(0, index - size // 4)
+            break
+    window = [
+        f'{SNIPPET_START}{token}{SNIPPET_END}' if is_match(token) else token
+        for token in tokens[start:start + size]
+    ]
+    snippet = ' '.join(window)
+    if start > 0:
+        snippet = '… ' + snippet
+    if start + size < len(tokens):
+        snippet += ' …'
+    return snippet
+
+
+class BaseSearchBackend:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index_posts(self, posts):
+        pass
+
+    def remove_posts(self, post_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, terms):
+        """
+        Restrict `queryset` to posts matching every term, annotated with
+        `search_rank` (higher is better).
+        """
+        raise NotImplementedError
+
+    def snippets(self, post_ids, terms):
+        """Return {post_id: raw snippet} for an already paginated set of posts."""
+        words = tokenize(terms)
+        post_ids = list(post_ids)
+        if not words or not post_ids:
+            return {}
+        from .models import Post
+        contents = Post.objects.using(self.connection.alias).filter(id__in=post_ids).values_list('id', 'content')
+        return {post_id: make_snippet(content, words) for post_id, content in contents}
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """Unindexed fallback matching DRF's SearchFilter behaviour."""
+    search_fields = ['title', 'content']
+
+    def search(self, queryset, terms):
+        words = tokenize(terms)
+        if not words:
+            return queryset
+        conditions = [
+            reduce(or_, [Q(**{f'{field}__icontains': word}) for field in self.search_fields])
+            for word in words
+        ]
+        return queryset.filter(reduce(and_, conditions))
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    table = 'api_post_fts'
+
+    def index_posts(self, posts):
+        posts = list(posts)
+        if not posts:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [(post.pk,) for post in posts]
+            )
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, content) VALUES (%s, %s, %s)',
+                [(post.pk, post.title, post.content) for post in posts],
+            )
+
+    def remove_posts(self, post_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in post_ids]
+            )
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, content) '
+                f'SELECT id, title, content FROM api_post'
+            )
+
+    def build_query(self, words):
+        # Quote every word so user input can never be parsed as FTS5 syntax, and
+        # prefix-match so results appear while the user is still typing.
+        return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+    def search(self, queryset, terms):
+        words = tokenize(terms)
+        if not words:
+            return queryset
+        query = self.build_query(words)
+        table = self.table
+        # Join the FTS table so MATCH drives the query and bm25() is evaluated
+        # against the matched row, instead of re-running MATCH per post.
+        return queryset.extra(
+            tables=[table],
+            where=[f'{table}.rowid = "api_post"."id"', f'{table} MATCH %s'],
+            params=[query],
+            # bm25() is lower for better matches; title hits weigh ten times more.
+            select={'search_rank': f'-bm25({table}, 10.0, 1.0)'},
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    table = 'api_post_search'
+    document_sql = (
+        "setweight(to_tsvector(%(config)s, coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector(%(config)s, coalesce(content, '')), 'B')"
+    )
+
+    def _index_where(self, where, params):
+        document = self.document_sql % {'config': "'{}'".format(POSTGRES_SEARCH_CONFIG)}
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.table} (post_id, document) '
+                f'SELECT id, {document} FROM api_post {where} '
+                f'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+                params,
+            )
+
+    def index_posts(self, posts):
+        post_ids = [post.pk for post in posts]
+        if post_ids:
+            self._index_where('WHERE id = ANY(%s)', [post_ids])
+
+    def remove_posts(self, post_ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE post_id = ANY(%s)', [list(post_ids)])
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.table}')
+        self._index_where('', [])
+
+    def build_query(self, words):
+        return ' & '.join(f'{word}:*' for word in words)
+
+    def search(self, queryset, terms):
+        words = tokenize(terms)
+        if not words:
+            return queryset
+        table = self.table
+        return queryset.extra(
+            tables=[table],
+            where=[f'{table}.post_id = "api_post"."id"', f'{table}.document @@ to_tsquery(%s, %s)'],
+            params=[POSTGRES_SEARCH_CONFIG, self.build_query(words)],
+            select={'search_rank': f'ts_rank({table}.document, to_tsquery(%s, %s))'},
+            select_params=[POSTGRES_SEARCH_CONFIG, self.build_query(words)],
+        )
+
+    def snippets(self, post_ids, terms):
+        words = tokenize(terms)
+        post_ids = list(post_ids)
+        if not words or not post_ids:
+            return {}
+        options = f'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords={SNIPPET_WORDS}, MinWords=8'
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT id, ts_headline(%s, content, to_tsquery(%s, %s), %s) '
+                'FROM api_post WHERE id = ANY(%s)',
+                [POSTGRES_SEARCH_CONFIG, POSTGRES_SEARCH_CONFIG, self.build_query(words), options, post_ids],
+            )
+            return dict(cursor.fetchall())
+
+
+_index_tables = {}
+
+
+def _has_table(connection, table):
+    key = (connection.alias, connection.settings_dict['NAME'], table)
+    if key not in _index_tables:
+        with connection.cursor() as cursor:
+            _index_tables[key] = table in connection.introspection.table_names(cursor)
+    return _index_tables[key]
+
+
+def get_search_backend(using='default'):
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and _has_table(connection, SQLiteFTS5Backend.table):
+        return SQLiteFTS5Backend(connection)
+    if connection.vendor == 'postgresql' and _has_table(connection, PostgresSearchBackend.table):
+        return PostgresSearchBackend(connection)
+    return LikeSearchBackend(connection)
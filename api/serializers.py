@@ -1,40 +1,100 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth.models import User
+from .authentication import RoleRefreshToken
 from .models import UserProfile, Post, Category, Tag
+from .reference import reference_cache
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
-    role = serializers.ChoiceField(choices=UserProfile.ROLE_CHOICES, default='reader')
+    role = serializers.ChoiceField(
+        source='userprofile.role', choices=UserProfile.ROLE_CHOICES, default='reader'
+    )
     
     class Meta:
         model = User
         fields = ['username', 'email', 'password', 'first_name', 'last_name', 'role']
     
     def create(self, validated_data):
-        role = validated_data.pop('role', 'reader')
+        role = validated_data.pop('userprofile', {}).get('role', 'reader')
         user = User.objects.create_user(**validated_data)
         UserProfile.objects.create(user=user, role=role)
         return user
+    
+    def update(self, instance, validated_data):
+        # Roles are not self-service.
+        validated_data.pop('userprofile', None)
+        return super().update(instance, validated_data)
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RoleRefreshToken
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RoleRefreshToken
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'created_at']
+        fields = ['id', 'name', 'description', 'created_at', 'published_post_count']
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
-        fields = ['id', 'name', 'created_at']
+        fields = ['id', 'name', 'created_at', 'published_post_count']
+
+class CategoryNameField(serializers.ReadOnlyField):
+    """
+    Category name looked up in the reference cache instead of a join, or in
+    the `reference_snapshot` passed in the serializer context.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'category_id'
+        super().__init__(**kwargs)
+
+    def to_representation(self, category_id):
+        snapshot = self.context.get('reference_snapshot')
+        if snapshot is not None and category_id in snapshot.category_names:
+            return snapshot.category_names[category_id]
+        return reference_cache.category_name(category_id)
+
+class CachedTagsField(serializers.Field):
+    """
+    A post's serialized tags, built from its tag ids and the reference cache.
+    Uses `post.prefetched_tag_ids` when set instead of querying them.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def tag_ids(post_id):
+        return (
+            Post.tags.through.objects.filter(post_id=post_id)
+            .order_by('pk').values_list('tag_id', flat=True)
+        )
+
+    def to_representation(self, post):
+        tag_ids = getattr(post, 'prefetched_tag_ids', None)
+        if tag_ids is None:
+            tag_ids = list(self.tag_ids(post.pk))
+        snapshot = self.context.get('reference_snapshot')
+        if snapshot is not None and snapshot.covers(tag_ids=tag_ids):
+            return [snapshot.tags_by_id[tag_id] for tag_id in tag_ids]
+        return reference_cache.tags(tag_ids)
 
 class PostSerializer(serializers.ModelSerializer):
     author_username = serializers.CharField(source='author.username', read_only=True)
-    category_name = serializers.CharField(source='category.name', read_only=True)
-    tags = TagSerializer(many=True, read_only=True)
+    category_name = CategoryNameField()
+    tags = CachedTagsField()
     tag_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
     
     class Meta:
         model = Post
-        fields = ['id', 'title', 'content', 'author', 'author_username', 'category', 
+        fields = ['id', 'title', 'content', 'content_html', 'excerpt', 'word_count',
+                 'author', 'author_username', 'category', 
                  'category_name', 'tags', 'tag_ids', 'status', 'created_at', 
                  'updated_at', 'published_at']
         read_only_fields = ['author', 'created_at', 'updated_at', 'published_at']
@@ -57,10 +117,37 @@ class PostSerializer(serializers.ModelSerializer):
 
 class PostListSerializer(serializers.ModelSerializer):
     author_username = serializers.CharField(source='author.username', read_only=True)
-    category_name = serializers.CharField(source='category.name', read_only=True)
-    tags_count = serializers.IntegerField(source='tags.count', read_only=True)
+    category_name = CategoryNameField()
+    tags_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Post
+        fields = ['id', 'title', 'excerpt', 'word_count', 'author_username', 'category_name',
+                 'tags_count', 'status', 'created_at', 'published_at']
+
+
+class PostExportSerializer(serializers.ModelSerializer):
+    author_username = serializers.CharField(source='author.username', read_only=True)
+    category_name = CategoryNameField()
+    tags_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Post
+        fields = ['id', 'title', 'content', 'author', 'author_username', 'category',
+                 'category_name', 'tags_count', 'status', 'created_at', 'updated_at',
+                 'published_at']
+        read_only_fields = fields
+
+class PostBulkItemSerializer(serializers.ModelSerializer):
+    """
+    One item of a bulk write. Items with an `id` update that post (partially),
+    items without one create a post. Category and tag ids are only
+    type-checked here; their existence is checked for the whole batch at once.
+    """
+    id = serializers.IntegerField(required=False)
+    category = serializers.IntegerField(required=False, allow_null=True)
+    tag_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
     
     class Meta:
         model = Post
-        fields = ['id', 'title', 'author_username', 'category_name', 'tags_count', 
-                 'status', 'created_at', 'published_at']
+        fields = ['id', 'title', 'content', 'category', 'status', 'tag_ids']
@@ -0,0 +1,346 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .cache import POSTS_GENERATION, REFERENCE_GENERATION, bump_generation_on_commit
+from .counters import CounterDelta
+from .feeds import invalidate_feeds, post_feed_scopes
+from .models import Category, Post, Tag
+from .related import adjust_published_total_on_commit, refresh_posts_on_commit
+from .search import get_search_backend
+from .tag_index import publish_on_commit
+
+# Sent after bulk writes that bypass Model.save() and m2m_changed, with the
+# saved `posts`, the database alias as `using` and, when tags were written,
+# `tag_changes`: (post_id, removed_tag_ids, added_tag_ids) per retagged post.
+posts_bulk_saved = Signal()
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    get_search_backend(using).index_posts([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, using='default', **kwargs):
+    get_search_backend(using).remove_posts([instance.pk])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_post_responses(sender, raw=False, **kwargs):
+    if raw:
+        return
+    bump_generation_on_commit(POSTS_GENERATION)
+    if sender is not Post:
+        bump_generation_on_commit(REFERENCE_GENERATION)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def touch_posts_on_tag_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # A post's tags are part of the post: keep updated_at (and so its ETag and
+    # Last-Modified) truthful.
+    now = timezone.now()
+    if not reverse:
+        Post.objects.filter(pk=instance.pk).update(updated_at=now)
+        instance.updated_at = now
+    elif pk_set:
+        Post.objects.filter(pk__in=pk_set).update(updated_at=now)
+    bump_generation_on_commit(POSTS_GENERATION)
+
+
+@receiver(posts_bulk_saved)
+def index_bulk_saved_posts(sender, posts, using='default', **kwargs):
+    get_search_backend(using).index_posts(posts)
+    bump_generation_on_commit(POSTS_GENERATION)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def capture_cleared_tags(sender, instance, action, reverse, using='default', **kwargs):
+    """
+    post_clear carries no pk_set: capture what a clear() removes, once, for
+    the post_clear handlers below (see cleared_tags).
+    """
+    if action != 'pre_clear':
+        return
+    through = Post.tags.through.objects.using(using)
+    if reverse:
+        rows = list(through.filter(tag_id=instance.pk).values_list('post_id', 'post__status'))
+        instance._cleared_tags = (
+            [post_id for post_id, _ in rows],
+            [post_id for post_id, status in rows if status == 'published'],
+        )
+    else:
+        tag_ids = list(through.filter(post_id=instance.pk).values_list('tag_id', flat=True))
+        instance._cleared_tags = (tag_ids, tag_ids if is_counted(instance) else [])
+
+
+def cleared_tags(instance):
+    """
+    (ids on the other side, those of them the counters include) of the rows
+    the clear() being handled removed: tag ids for a post, post ids for a tag.
+    """
+    return getattr(instance, '_cleared_tags', None) or ([], [])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def index_tag_changes(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    if action == 'post_clear':
+        pk_set = cleared_tags(instance)[0]
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if not pk_set:
+        return
+    operation = '+' if action == 'post_add' else '-'
+    if reverse:
+        changes = [(operation, instance.pk, sorted(pk_set))]
+    else:
+        changes = [(operation, tag_id, [instance.pk]) for tag_id in pk_set]
+    publish_on_commit(changes, using)
+
+
+@receiver(pre_delete, sender=Post)
+def unindex_deleted_post_tags(sender, instance, using='default', **kwargs):
+    tag_ids = Post.tags.through.objects.using(using).filter(post_id=instance.pk).values_list('tag_id', flat=True)
+    publish_on_commit([('-', tag_id, [instance.pk]) for tag_id in tag_ids], using)
+
+
+@receiver(post_delete, sender=Tag)
+def unindex_deleted_tag(sender, instance, using='default', **kwargs):
+    publish_on_commit([('drop', instance.pk, None)], using)
+
+
+@receiver(posts_bulk_saved)
+def index_bulk_tag_changes(sender, posts, using='default', tag_changes=(), **kwargs):
+    changes = []
+    for post_id, removed, added in tag_changes:
+        changes += [('-', tag_id, [post_id]) for tag_id in removed]
+        changes += [('+', tag_id, [post_id]) for tag_id in added]
+    publish_on_commit(changes, using)
+
+
+def is_counted(post):
+    """Whether the counters currently include `post` (i.e. it is published in the database)."""
+    state = getattr(post, '_counted_state', None)
+    return (state[0] if state is not None else post.status) == 'published'
+
+
+@receiver(pre_save, sender=Post)
+def remember_counted_state(sender, instance, raw=False, using='default', **kwargs):
+    if raw or instance._state.adding or getattr(instance, '_counted_state', None) is not None:
+        return
+    # Loaded with status or category deferred: read what the counters include.
+    instance._counted_state = (
+        Post.objects.using(using).filter(pk=instance.pk).values_list('status', 'category_id').first()
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    old = None if created else getattr(instance, '_counted_state', None)
+    new = instance._counted_state = (instance.status, instance.category_id)
+    was_published = old is not None and old[0] == 'published'
+    is_published = new[0] == 'published'
+    delta = CounterDelta()
+    delta.add(was_published, old[1] if old else None, sign=-1)
+    delta.add(is_published, new[1])
+    if was_published != is_published and not created:
+        tag_ids = Post.tags.through.objects.using(using).filter(post_id=instance.pk).values_list('tag_id', flat=True)
+        delta.add(True, tag_ids=list(tag_ids), sign=1 if is_published else -1)
+    delta.apply(using)
+
+
+@receiver(pre_delete, sender=Post)
+def uncount_deleted_post(sender, instance, using='default', **kwargs):
+    # pre_delete runs inside the deletion's transaction, before the tag rows
+    # are cascaded away.
+    row = Post.objects.using(using).filter(pk=instance.pk).values_list('status', 'category_id').first()
+    if row is None or row[0] != 'published':
+        return
+    tag_ids = Post.tags.through.objects.using(using).filter(post_id=instance.pk).values_list('tag_id', flat=True)
+    delta = CounterDelta()
+    delta.add(True, row[1], list(tag_ids), sign=-1)
+    delta.apply(using)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def count_tag_changes(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    through = Post.tags.through.objects.using(using)
+    if action == 'pre_remove':
+        # pk_set may name rows that do not exist; capture the counted rows
+        # that will actually be removed.
+        if reverse:
+            rows = through.filter(tag_id=instance.pk, post__status='published', post_id__in=pk_set)
+            instance._uncounted_tag_rows = rows.count()
+        else:
+            rows = through.filter(post_id=instance.pk, tag_id__in=pk_set) if is_counted(instance) else through.none()
+            instance._uncounted_tag_rows = list(rows.values_list('tag_id', flat=True))
+        return
+
+    delta = CounterDelta()
+    if action == 'post_add' and pk_set:
+        if reverse:
+            delta.tags[instance.pk] += Post.objects.using(using).filter(pk__in=pk_set, status='published').count()
+        else:
+            delta.add(is_counted(instance), tag_ids=pk_set)
+    elif action in ('post_remove', 'post_clear'):
+        if action == 'post_clear':
+            removed = cleared_tags(instance)[1]
+            removed = len(removed) if reverse else removed
+        else:
+            removed = getattr(instance, '_uncounted_tag_rows', None)
+            instance._uncounted_tag_rows = None
+        if reverse:
+            delta.tags[instance.pk] -= removed or 0
+        else:
+            delta.add(True, tag_ids=removed or [], sign=-1)
+    delta.apply(using)
+
+
+@receiver(pre_save, sender=Post)
+def remember_related_state(sender, instance, raw=False, **kwargs):
+    # Connected after remember_counted_state, which loads the stored state if needed.
+    if raw or instance._state.adding:
+        return
+    instance._related_state = getattr(instance, '_counted_state', None)
+
+
+@receiver(post_save, sender=Post)
+def refresh_related_on_save(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    old = instance.__dict__.pop('_related_state', None)
+    was_published = old is not None and old[0] == 'published'
+    # Before the refresh, which may count the total with this post in it.
+    adjust_published_total_on_commit((instance.status == 'published') - was_published, using)
+    if created or old != (instance.status, instance.category_id):
+        refresh_posts_on_commit([instance.pk], using)
+
+
+@receiver(pre_delete, sender=Post)
+def uncount_related_total(sender, instance, using='default', **kwargs):
+    if is_counted(instance):
+        adjust_published_total_on_commit(-1, using)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def refresh_related_on_tag_change(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    if action == 'post_clear':
+        post_ids = cleared_tags(instance)[0] if reverse else [instance.pk]
+    elif action in ('post_add', 'post_remove') and pk_set:
+        post_ids = pk_set if reverse else [instance.pk]
+    else:
+        return
+    refresh_posts_on_commit(post_ids or (), using)
+
+
+@receiver(posts_bulk_saved)
+def refresh_related_on_bulk_save(sender, posts, using='default', **kwargs):
+    delta = 0
+    for post in posts:
+        previous = getattr(post, '_previous_counted_state', None)
+        delta += (post.status == 'published') - (previous is not None and previous[0] == 'published')
+    adjust_published_total_on_commit(delta, using)
+    refresh_posts_on_commit([post.pk for post in posts], using)
+
+
+def tag_ids_of(post_ids, using='default'):
+    through = Post.tags.through.objects.using(using)
+    return set(through.filter(post_id__in=post_ids).values_list('tag_id', flat=True))
+
+
+@receiver(pre_save, sender=Post)
+def remember_feed_state(sender, instance, raw=False, **kwargs):
+    # Connected after remember_counted_state, which loads the stored state if needed.
+    if raw or instance._state.adding:
+        return
+    instance._feed_state = getattr(instance, '_counted_state', None)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_feeds_on_save(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    old = instance.__dict__.pop('_feed_state', None)
+    was_published = old is not None and old[0] == 'published'
+    if not was_published and instance.status != 'published':
+        return
+    tag_ids = () if created else tag_ids_of([instance.pk], using)
+    scopes = post_feed_scopes(instance.category_id, instance.author_id, tag_ids)
+    if old is not None and old[1] is not None:
+        scopes.add(('category', old[1]))
+    invalidate_feeds(scopes, using)
+
+
+@receiver(pre_delete, sender=Post)
+def invalidate_feeds_on_delete(sender, instance, using='default', **kwargs):
+    row = Post.objects.using(using).filter(pk=instance.pk).values_list('status', 'category_id', 'author_id').first()
+    if row is not None and row[0] == 'published':
+        invalidate_feeds(post_feed_scopes(row[1], row[2], tag_ids_of([instance.pk], using)), using)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_feeds_on_tag_change(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    if action == 'post_clear':
+        pk_set = cleared_tags(instance)[0]
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if not pk_set:
+        return
+    # Tag names are shown on feed entries, so the post's other feeds change too.
+    if reverse:
+        posts = Post.objects.using(using).filter(pk__in=pk_set, status='published')
+        scopes = {('tag', instance.pk)}
+        for category_id, author_id in posts.values_list('category_id', 'author_id'):
+            scopes |= post_feed_scopes(category_id, author_id)
+    elif is_counted(instance):
+        tag_ids = set(pk_set) | tag_ids_of([instance.pk], using)
+        scopes = post_feed_scopes(instance.category_id, instance.author_id, tag_ids)
+    else:
+        return
+    invalidate_feeds(scopes, using)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def forget_cleared_tags(sender, instance, action, **kwargs):
+    # Connected after every handler reading cleared_tags().
+    if action == 'post_clear':
+        instance.__dict__.pop('_cleared_tags', None)
+
+
+@receiver(posts_bulk_saved)
+def invalidate_feeds_on_bulk_save(sender, posts, using='default', tag_changes=(), **kwargs):
+    scopes = set()
+    for post_id, removed, added in tag_changes:
+        scopes.update(('tag', tag_id) for tag_id in removed | added)
+    current_tags = {}
+    for post_id, tag_id in Post.tags.through.objects.using(using).filter(
+        post_id__in=[post.pk for post in posts]
+    ).values_list('post_id', 'tag_id'):
+        current_tags.setdefault(post_id, []).append(tag_id)
+    for post in posts:
+        previous = getattr(post, '_previous_counted_state', None)
+        if post.status != 'published' and (previous is None or previous[0] != 'published'):
+            continue
+        scopes |= post_feed_scopes(post.category_id, post.author_id, current_tags.get(post.pk, ()))
+        if previous is not None and previous[1] is not None:
+            scopes.add(('category', previous[1]))
+    invalidate_feeds(scopes, using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author_feed(sender, instance, raw=False, using='default', **kwargs):
+    if not raw:
+        invalidate_feeds([('author', instance.pk)], using)
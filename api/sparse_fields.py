@@ -0,0 +1,124 @@
+"""
+Sparse fieldsets for the read endpoints: `?fields=id,title` returns only the
+named fields, `?exclude=content` every field but those.
+
+The projection reaches the database, not just the response. Model instances
+are loaded with `.only()` the columns the requested fields read, relations
+are joined only when a requested field goes through them, and fields left
+out are removed from the serializer, so they are neither read nor
+serialized. Views rendering `.values()` rows (FastSerializer) pass the same
+field list to `values()` and `serialize()`.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def requested_fields(query_params, available):
+    """
+    The names in `available`, in order, that `?fields=`/`?exclude=` ask for,
+    or None when neither is given. Unknown names are a 400.
+    """
+    fields = query_params.get(FIELDS_PARAM)
+    exclude = query_params.get(EXCLUDE_PARAM)
+    if fields is None and exclude is None:
+        return None
+    selected = list(available)
+    errors = {}
+    for param, value in ((FIELDS_PARAM, fields), (EXCLUDE_PARAM, exclude)):
+        if value is None:
+            continue
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = sorted(names.difference(available))
+        if unknown:
+            errors[param] = f'Unknown fields: {", ".join(unknown)}'
+        elif param == FIELDS_PARAM:
+            selected = [name for name in selected if name in names]
+        else:
+            selected = [name for name in selected if name not in names]
+    if errors:
+        raise ValidationError(errors)
+    return selected
+
+
+def model_columns(serializer, field_names):
+    """
+    (columns for `.only()`, relations for `select_related()`) read by the
+    `field_names` of a ModelSerializer. Fields that are not model columns
+    (annotations, `source='*'`) add nothing.
+    """
+    model = serializer.Meta.model
+    columns, relations = {model._meta.pk.name}, set()
+    for name in field_names:
+        source = serializer.fields[name].source
+        if source == '*':
+            continue
+        parts = source.split('.')
+        try:
+            model_field = model._meta.get_field(parts[0])
+        except FieldDoesNotExist:
+            continue
+        if model_field.many_to_many or model_field.one_to_many:
+            continue
+        if len(parts) > 1 and model_field.is_relation:
+            relations.add(parts[0])
+        columns.add('__'.join(parts))
+    return columns, relations
+
+
+class SparseFieldsMixin:
+    """
+    `?fields=`/`?exclude=` for a viewset's `sparse_actions`. Views call
+    `project_queryset()` on the queryset their instances come from; the
+    serializer drops the other fields itself.
+    """
+    sparse_actions = ('list', 'retrieve')
+    # Columns loaded whatever is requested, e.g. for object permissions.
+    always_loaded = ()
+
+    def get_sparse_fields(self):
+        """The requested field names, or None for every field."""
+        if self.action not in self.sparse_actions:
+            return None
+        if not hasattr(self, '_sparse_fields'):
+            fields = self.get_serializer_class()().fields
+            available = [name for name, field in fields.items() if not field.write_only]
+            self._sparse_fields = requested_fields(self.request.query_params, available)
+        return self._sparse_fields
+
+    def wants_field(self, name):
+        fields = self.get_sparse_fields()
+        return fields is None or name in fields
+
+    def project_queryset(self, queryset):
+        """`queryset` loading only what the readable (or requested) fields need."""
+        if self.action not in self.sparse_actions:
+            return queryset
+        serializer = self.get_serializer_class()()
+        fields = self.get_sparse_fields()
+        if fields is None:
+            fields = [name for name, field in serializer.fields.items() if not field.write_only]
+        columns, relations = model_columns(serializer, fields)
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns, *self.always_loaded)
+
+    def project_rows(self, rows):
+        """Cached or precomputed dict rows cut down to the requested fields."""
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return rows
+        return [{name: row[name] for name in fields} for row in rows]
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name, field in list(target.fields.items()):
+                if name not in fields and not field.write_only:
+                    target.fields.pop(name)
+        return serializer
@@ -0,0 +1,320 @@
+"""
+Boolean tag expressions for post lists (`?tag_expr=`), evaluated against a
+per-process tag -> post id index.
+
+    python AND django AND NOT beginners
+    (python OR django) AND NOT "tips-and-tricks"
+
+Each worker keeps, per tag, a sorted `array('q')` of the ids of its posts
+(8 bytes per tagging, about 20MB for a million posts with 2-3 tags each), so
+AND/OR/NOT run on those sorted arrays in memory (binary searches of the
+smaller into the larger, see `evaluate`) and the database only sees the
+resulting ids. Tag changes are published as deltas to a journal in the shared
+cache (see api.cache) once their transaction commits, and every worker
+replays the deltas it has not seen before answering; a gap in the journal, or
+a bulk load, makes workers rebuild from the through table instead.
+"""
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from functools import reduce
+from operator import and_, or_
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from .cache import _initial_generation, get_cache
+from .replicas import primary_reads
+
+JOURNAL_SEQUENCE_KEY = 'tag_index:sequence'
+JOURNAL_TIMEOUT = 24 * 60 * 60
+RELOAD = 'reload'
+
+TOKEN_RE = re.compile(r'\s*(?:"([^"]*)"|(\()|(\))|([^\s()"]+))')
+OPERATORS = ('AND', 'OR', 'NOT')
+
+
+class TagExpressionError(ValueError):
+    pass
+
+
+def parse_tag_expression(expression, max_tags=200):
+    """
+    Parse `expression` into nested tuples: ('tag', name), ('not', node),
+    ('and', [nodes]) or ('or', [nodes]). NOT binds tighter than AND, AND
+    tighter than OR. Names with spaces or parentheses are double-quoted.
+    """
+    tokens, position = [], 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN_RE.match(expression, position)
+        if match is None:
+            raise TagExpressionError('Unbalanced quotes.')
+        quoted, opening, closing, word = match.groups()
+        if quoted is not None:
+            tokens.append(('tag', quoted))
+        elif opening:
+            tokens.append(('(', None))
+        elif closing:
+            tokens.append((')', None))
+        elif word.upper() in OPERATORS:
+            tokens.append((word.upper(), None))
+        else:
+            tokens.append(('tag', word))
+        position = match.end()
+    if sum(1 for kind, _ in tokens if kind == 'tag') > max_tags:
+        raise TagExpressionError(f'At most {max_tags} tags per expression.')
+
+    def peek():
+        return tokens[0][0] if tokens else None
+
+    def expect(kind):
+        if peek() != kind:
+            found = f'"{tokens[0][1] or tokens[0][0]}"' if tokens else 'end of expression'
+            raise TagExpressionError(f'Expected {"a tag name" if kind == "tag" else kind}, found {found}.')
+        return tokens.pop(0)
+
+    def parse_any():
+        children = [parse_all()]
+        while peek() == 'OR':
+            tokens.pop(0)
+            children.append(parse_all())
+        return children[0] if len(children) == 1 else ('or', children)
+
+    def parse_all():
+        children = [parse_factor()]
+        while peek() == 'AND':
+            tokens.pop(0)
+            children.append(parse_factor())
+        return children[0] if len(children) == 1 else ('and', children)
+
+    def parse_factor():
+        if peek() == 'NOT':
+            tokens.pop(0)
+            return ('not', parse_factor())
+        if peek() == '(':
+            tokens.pop(0)
+            node = parse_any()
+            expect(')')
+            return node
+        return expect('tag')
+
+    if not tokens:
+        raise TagExpressionError('Empty expression.')
+    node = parse_any()
+    if tokens:
+        raise TagExpressionError(f'Unexpected "{tokens[0][1] or tokens[0][0]}".')
+    return node
+
+
+def tag_names(node):
+    if node[0] == 'tag':
+        return {node[1]}
+    if node[0] == 'not':
+        return tag_names(node[1])
+    return set().union(*(tag_names(child) for child in node[1]))
+
+
+def tag_expression_q(node, tag_ids):
+    """
+    The expression as `id IN (SELECT post_id ...)` subqueries on the through
+    table, for results too large for an `id__in` list. The subqueries are not
+    correlated, so each is evaluated once rather than per post.
+    """
+    from .models import Post
+
+    def tagged_with_any(names):
+        tagged = Post.tags.through.objects.filter(tag_id__in=[tag_ids[name] for name in names])
+        return Q(id__in=tagged.values('post_id'))
+
+    if node[0] == 'tag':
+        return tagged_with_any([node[1]])
+    if node[0] == 'not':
+        return ~tag_expression_q(node[1], tag_ids)
+    if node[0] == 'and':
+        return reduce(and_, (tag_expression_q(child, tag_ids) for child in node[1]))
+    # Tags ORed together share one subquery.
+    names = [child[1] for child in node[1] if child[0] == 'tag']
+    others = [tag_expression_q(child, tag_ids) for child in node[1] if child[0] != 'tag']
+    return reduce(or_, ([tagged_with_any(names)] if names else []) + others)
+
+
+def contained_in(post_ids, other):
+    """Mask of the `post_ids` also in `other`; both sorted, one binary search each."""
+    positions = np.searchsorted(other, post_ids)
+    found = np.zeros(len(post_ids), dtype=bool)
+    inside = positions < len(other)
+    found[inside] = other[positions[inside]] == post_ids[inside]
+    return found
+
+
+def intersect_all(arrays):
+    # Smallest first: every step searches at most that many ids.
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+    for post_ids in arrays[1:]:
+        result = result[contained_in(result, post_ids)]
+    return result
+
+
+def union_all(arrays):
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.unique(np.concatenate(arrays))
+
+
+def subtract_all(post_ids, arrays):
+    for other in arrays:
+        post_ids = post_ids[~contained_in(post_ids, other)]
+    return post_ids
+
+
+def evaluate(node, posts_for_tag):
+    """
+    Evaluate a parsed expression to `(post_ids, negated)`: the matching posts
+    are `post_ids`, a sorted int64 array, or every post except them when
+    `negated`. `posts_for_tag` returns a tag's sorted post ids. Complements
+    are never materialized, so NOT costs no more than the tag it applies to,
+    and intersections cost the smaller side's size times log the larger's.
+    """
+    kind = node[0]
+    if kind == 'tag':
+        return np.frombuffer(posts_for_tag(node[1]), dtype=np.int64), False
+    if kind == 'not':
+        post_ids, negated = evaluate(node[1], posts_for_tag)
+        return post_ids, not negated
+    parts = [evaluate(child, posts_for_tag) for child in node[1]]
+    positive = [post_ids for post_ids, negated in parts if not negated]
+    negative = [post_ids for post_ids, negated in parts if negated]
+    if kind == 'and':
+        if not positive:
+            # NOT a AND NOT b == NOT (a OR b)
+            return union_all(negative), True
+        return subtract_all(intersect_all(positive), negative), False
+    if not negative:
+        return union_all(positive), False
+    # NOT a OR NOT b == NOT (a AND b); NOT n OR p == NOT (n - p)
+    return subtract_all(intersect_all(negative), positive), True
+
+
+def _delta_key(sequence):
+    return f'tag_index:delta:{sequence}'
+
+
+def publish(changes):
+    """
+    Append `changes` to the shared journal: a list of ('+' or '-', tag_id,
+    post_ids) and ('drop', tag_id, None) entries, or RELOAD.
+    """
+    cache = get_cache()
+    cache.add(JOURNAL_SEQUENCE_KEY, _initial_generation(), None)
+    try:
+        sequence = cache.incr(JOURNAL_SEQUENCE_KEY)
+    except ValueError:
+        # Evicted between add() and incr(): workers see a jump and reload.
+        sequence = _initial_generation()
+        cache.set(JOURNAL_SEQUENCE_KEY, sequence, None)
+        changes = RELOAD
+    cache.set(_delta_key(sequence), changes, JOURNAL_TIMEOUT)
+
+
+def publish_on_commit(changes, using='default'):
+    if changes:
+        transaction.on_commit(lambda: publish(changes), using=using)
+
+
+class TagIndex:
+    """Per-process tag id -> sorted post id arrays, kept in step with the shared journal."""
+    max_replay = 1000
+
+    def __init__(self):
+        self._posts_by_tag = None
+        self._sequence = None
+        self._lock = threading.Lock()
+
+    def current_sequence(self):
+        cache = get_cache()
+        sequence = cache.get(JOURNAL_SEQUENCE_KEY)
+        if sequence is None:
+            cache.add(JOURNAL_SEQUENCE_KEY, _initial_generation(), None)
+            sequence = cache.get(JOURNAL_SEQUENCE_KEY)
+        return sequence
+
+    def get(self):
+        """The tag id -> post id arrays, caught up with every published change."""
+        sequence = self.current_sequence()
+        if self._posts_by_tag is not None and self._sequence == sequence:
+            return self._posts_by_tag
+        with self._lock:
+            if self._posts_by_tag is None or not self.replay(sequence):
+                self.load(sequence)
+            return self._posts_by_tag
+
+    def replay(self, sequence):
+        if sequence is None or self._sequence is None:
+            return False
+        missed = sequence - self._sequence
+        if missed < 0 or missed > self.max_replay:
+            return False
+        keys = [_delta_key(n) for n in range(self._sequence + 1, sequence + 1)]
+        deltas = get_cache().get_many(keys)
+        if len(deltas) != len(keys) or any(deltas[key] == RELOAD for key in keys):
+            return False
+        for key in keys:
+            self.apply(deltas[key])
+        self._sequence = sequence
+        return True
+
+    def load(self, sequence):
+        # The sequence is read before the table, so replaying deltas that the
+        # load already saw must be harmless: apply() is idempotent.
+        from .models import Post
+        posts_by_tag = {}
+        rows = (
+            Post.tags.through.objects.order_by('tag_id', 'post_id')
+            .values_list('tag_id', 'post_id').iterator(chunk_size=20_000)
+        )
+        current_tag, post_ids = None, None
+        with primary_reads():
+            for tag_id, post_id in rows:
+                if tag_id != current_tag:
+                    current_tag, post_ids = tag_id, posts_by_tag.setdefault(tag_id, array('q'))
+                post_ids.append(post_id)
+        self._posts_by_tag, self._sequence = posts_by_tag, sequence
+
+    def apply(self, changes):
+        posts_by_tag = self._posts_by_tag
+        for operation, tag_id, post_ids in changes:
+            if operation == 'drop':
+                posts_by_tag.pop(tag_id, None)
+                continue
+            # Copied, not changed in place: requests on other threads may be
+            # reading the current array.
+            tagged = array('q', posts_by_tag.get(tag_id, ()))
+            for post_id in post_ids:
+                position = bisect_left(tagged, post_id)
+                present = position < len(tagged) and tagged[position] == post_id
+                if operation == '+' and not present:
+                    tagged.insert(position, post_id)
+                elif operation == '-' and present:
+                    del tagged[position]
+            posts_by_tag[tag_id] = tagged
+
+    def clear(self):
+        self._posts_by_tag = self._sequence = None
+
+    def evaluate(self, node, tag_ids):
+        """`evaluate()` against this index, with tag names resolved through `tag_ids`."""
+        posts_by_tag = self.get()
+        empty = array('q')
+        return evaluate(node, lambda name: posts_by_tag.get(tag_ids[name], empty))
+
+    def memory_bytes(self):
+        # A snapshot of the values: replay() may add or drop tags meanwhile.
+        post_id_arrays = list(self.get().values())
+        return sum(post_ids.itemsize * len(post_ids) for post_ids in post_id_arrays)
+
+
+tag_index = TagIndex()
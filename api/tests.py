@@ -1,8 +1,37 @@
-from django.test import TestCase
+import json
+import math
+import os
+import re
+import tempfile
+import time
+from datetime import timedelta
+
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework import status
-from .models import UserProfile, Post, Category
+from rest_framework_simplejwt.tokens import AccessToken
+from .authentication import RoleRefreshToken
+from .instrumentation import metrics
+from .models import UserProfile, Post, Category, RelatedPost, Tag
+from .pagination import CappedPaginator
+from .reference import reference_cache
+from .replicas import replica_pool
+from .related import CATEGORY_WEIGHT, published_total, refresh_posts
+from .tag_index import TagExpressionError, evaluate, parse_tag_expression, tag_index
+from .view_counts import decayed_views, view_counter
 
 class UserRegistrationTestCase(APITestCase):
     def test_user_registration(self):
@@ -61,3 +90,1701 @@ class PostAPITestCase(APITestCase):
         data = {'title': 'Updated Title'}
         response = self.client.patch(f'/api/posts/{post.id}/', data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class QueryBudgetTestCase(APITestCase):
+    """Fails when an endpoint's query count exceeds its budget or grows with the result size."""
+
+    # endpoint -> maximum number of queries, whatever the page size. Post reads
+    # include the conditional-GET validator query; page-number pages a COUNT.
+    QUERY_BUDGETS = {
+        '/api/posts/': 3,
+        '/api/posts/?ordering=-published_at&status=published': 3,
+        '/api/my-posts/': 2,
+        '/api/my-posts/?status=published&ordering=-created_at': 2,
+        '/api/my-posts/summary/': 1,
+        '/api/categories/': 1,
+        '/api/tags/': 1,
+    }
+    DETAIL_BUDGET = 3
+
+    def setUp(self):
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.category = Category.objects.create(name='Tech')
+        self.tags = [Tag.objects.create(name=f'tag-{i}') for i in range(3)]
+        self.client.force_authenticate(user=self.editor_user)
+        # Warm the profile cache on the authenticated user object and the
+        # per-process category/tag snapshot.
+        self.editor_user.userprofile
+        reference_cache.get()
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                title=f'Post {i}', content='Content', author=self.editor_user,
+                category=self.category, status='published'
+            )
+            post.tags.set(self.tags)
+        # Publishing changes the category/tag counters, which are reloaded
+        # into the snapshot; budgets measure the warm steady state.
+        reference_cache.counted()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        return len(context.captured_queries)
+
+    def test_list_endpoints_stay_within_budget(self):
+        for page_size in (1, 10, 25):
+            Post.objects.all().delete()
+            self.create_posts(page_size)
+            for url, budget in self.QUERY_BUDGETS.items():
+                with self.subTest(url=url, page_size=page_size):
+                    self.assertLessEqual(self.count_queries(url), budget)
+
+    def test_detail_endpoint_stays_within_budget(self):
+        self.create_posts(1)
+        post = Post.objects.get()
+        self.assertLessEqual(self.count_queries(f'/api/posts/{post.id}/'), self.DETAIL_BUDGET)
+
+    def test_list_reports_tag_counts(self):
+        self.create_posts(2)
+        response = self.client.get('/api/posts/')
+        self.assertEqual(
+            [row['tags_count'] for row in response.data['results']['data']], [3, 3]
+        )
+
+class KeysetPaginationTestCase(APITestCase):
+    def setUp(self):
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.client.force_authenticate(user=self.editor_user)
+        self.editor_user.userprofile
+        created_at = timezone.now()
+        posts = []
+        for i in range(25):
+            post = Post.objects.create(
+                title=f'Post {i}', content='Content', author=self.editor_user,
+                status='published' if i % 3 else 'draft'
+            )
+            posts.append(post)
+        # Pairs of posts share a timestamp so ties must be broken on id.
+        for i, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(created_at=created_at - timedelta(minutes=i // 2))
+        self.post_ids = [post.id for post in posts]
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(row['id'] for row in response.data['results']['data'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_walks_every_post_once_in_order(self):
+        ids, pages = self.walk('/api/posts/?pagination=cursor')
+        expected = list(
+            Post.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_page_numbers_break_ties_on_id(self):
+        ids, url = [], '/api/posts/'
+        while url:
+            response = self.client.get(url)
+            ids.extend(row['id'] for row in response.data['results']['data'])
+            url = response.data['next']
+        self.assertEqual(ids, list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_nullable_ordering_field_puts_drafts_last(self):
+        ids, _ = self.walk('/api/posts/?pagination=cursor&ordering=-published_at')
+        self.assertEqual(sorted(ids), sorted(self.post_ids))
+        drafts = set(Post.objects.filter(status='draft').values_list('id', flat=True))
+        self.assertEqual(set(ids[-len(drafts):]), drafts)
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get('/api/posts/?pagination=cursor')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results']['data'], first.data['results']['data'])
+        self.assertIsNone(back.data['previous'])
+
+    def test_deep_page_is_a_single_query_without_count(self):
+        first = self.client.get('/api/posts/?pagination=cursor')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(first.data['next'])
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('COUNT(*)', context.captured_queries[0]['sql'])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_my_posts_supports_cursor_mode(self):
+        ids, _ = self.walk('/api/my-posts/?pagination=cursor')
+        self.assertEqual(len(ids), 25)
+
+class FullTextSearchTestCase(APITestCase):
+    def setUp(self):
+        self.reader_user = User.objects.create_user(username='reader', password='reader123')
+        UserProfile.objects.create(user=self.reader_user, role='reader')
+        self.client.force_authenticate(user=self.reader_user)
+        self.author = User.objects.create_user(username='author', password='author123')
+        self.in_body = Post.objects.create(
+            title='Weekend notes', content='A long story that mentions django only once.',
+            author=self.author, status='published'
+        )
+        self.in_title = Post.objects.create(
+            title='Django tips', content='Practical advice for web developers.',
+            author=self.author, status='published'
+        )
+        Post.objects.create(
+            title='Unrelated', content='Nothing to see here.', author=self.author, status='published'
+        )
+
+    def search(self, term, **params):
+        response = self.client.get('/api/posts/', {'search': term, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']['data']
+
+    def test_results_are_ranked_with_highlighted_snippets(self):
+        results = self.search('django')
+        self.assertEqual([row['id'] for row in results], [self.in_title.id, self.in_body.id])
+        self.assertIn('<mark>django</mark>', results[1]['snippet'])
+
+    def test_explicit_ordering_overrides_rank(self):
+        results = self.search('django', ordering='created_at')
+        self.assertEqual([row['id'] for row in results], [self.in_body.id, self.in_title.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.in_title.title = 'Flask tips'
+        self.in_title.save()
+        self.assertEqual([row['id'] for row in self.search('flask')], [self.in_title.id])
+        self.in_body.delete()
+        self.assertEqual(self.search('django'), [])
+
+    def test_prefix_match_and_query_syntax_is_escaped(self):
+        self.assertEqual(len(self.search('dja')), 2)
+        self.assertEqual(self.search('"NEAR( OR *'), [])
+
+    def test_snippet_escapes_post_html(self):
+        Post.objects.create(
+            title='Markup', content='<script>alert(1)</script> zebra',
+            author=self.author, status='published'
+        )
+        snippet = self.search('zebra')[0]['snippet']
+        self.assertNotIn('<script>', snippet)
+        self.assertIn('<mark>zebra</mark>', snippet)
+
+
+class ExplainPostQueriesTestCase(TestCase):
+    def test_hot_reader_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_post_queries', stdout=out)
+        lines = out.getvalue().splitlines()
+        for prefix in ('reader  none      (default)', 'reader  status    -created_at'):
+            with self.subTest(prefix=prefix):
+                line = next(line for line in lines if line.startswith(prefix))
+                self.assertTrue(line.endswith('ok'), line)
+
+class RoleTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        self.profile = UserProfile.objects.create(user=self.editor_user, role='editor')
+        Post.objects.create(title='Draft', content='Content', author=self.editor_user, status='draft')
+
+    def login(self, username='editor', password='editor123'):
+        response = self.client.post('/api/auth/login/', {'username': username, 'password': password})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_access_token_carries_role(self):
+        tokens = self.login()
+        self.assertEqual(AccessToken(tokens['access'])['role'], 'editor')
+
+    def test_authenticated_reads_need_no_auth_queries(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.login()["access"]}')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Editors see drafts: the role came from the token.
+        self.assertEqual(len(response.data['results']['data']), 1)
+        tables = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertNotIn('api_userprofile', tables)
+        self.assertNotIn('FROM "auth_user"', tables)
+
+    def test_token_role_drives_permissions(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.login()["access"]}')
+        response = self.client.post('/api/posts/', {'title': 'New', 'content': 'Body'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.get(title='New').author, self.editor_user)
+
+    def test_refresh_picks_up_role_changes(self):
+        tokens = self.login()
+        self.profile.role = 'reader'
+        self.profile.save()
+        response = self.client.post('/api/auth/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'reader')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        response = self.client.post('/api/posts/', {'title': 'New', 'content': 'Body'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class PublishedResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader_user = User.objects.create_user(username='reader', password='reader123')
+        UserProfile.objects.create(user=self.reader_user, role='reader')
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.category = Category.objects.create(name='Tech')
+        self.tag = Tag.objects.create(name='python')
+        self.post = Post.objects.create(
+            title='Cached', content='Content', author=self.editor_user,
+            category=self.category, status='published'
+        )
+        self.client.force_authenticate(user=self.reader_user)
+        self.reader_user.userprofile
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(context.captured_queries)
+
+    def test_second_read_is_served_from_cache(self):
+        for url in ('/api/posts/', f'/api/posts/{self.post.id}/'):
+            with self.subTest(url=url):
+                first, _ = self.get(url)
+                second, queries = self.get(url)
+                self.assertEqual(queries, 0)
+                self.assertEqual(second.data, first.data)
+
+    def test_query_parameters_are_part_of_the_key(self):
+        self.get('/api/posts/')
+        response, queries = self.get('/api/posts/?status=draft')
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.data['results']['data'], [])
+
+    def test_writes_invalidate_cached_responses(self):
+        changes = [
+            lambda: Post.objects.filter(pk=self.post.pk).get().save(),
+            lambda: self.post.tags.add(self.tag),
+            lambda: Category.objects.get(pk=self.category.pk).save(),
+            lambda: Tag.objects.create(name='django'),
+        ]
+        for change in changes:
+            self.get('/api/posts/')
+            change()
+            _, queries = self.get('/api/posts/')
+            self.assertGreater(queries, 0)
+
+    def test_editors_are_not_served_the_shared_cache(self):
+        self.get('/api/posts/')
+        self.client.force_authenticate(user=self.editor_user)
+        self.editor_user.userprofile
+        Post.objects.filter(pk=self.post.pk).update(status='draft')
+        response, _ = self.get('/api/posts/')
+        self.assertEqual(response.data['results']['data'][0]['status'], 'draft')
+
+class ConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader_user = User.objects.create_user(username='reader', password='reader123')
+        UserProfile.objects.create(user=self.reader_user, role='reader')
+        self.tag = Tag.objects.create(name='python')
+        self.post = Post.objects.create(
+            title='Polled', content='Content', author=self.reader_user, status='published'
+        )
+        self.client.force_authenticate(user=self.reader_user)
+        self.reader_user.userprofile
+
+    def revalidate(self, url, response):
+        with CaptureQueriesContext(connection) as context:
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        return again, len(context.captured_queries)
+
+    def test_unchanged_feed_is_a_single_aggregate_query(self):
+        response = self.client.get('/api/posts/')
+        self.assertIn('Last-Modified', response)
+        again, queries = self.revalidate('/api/posts/', response)
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again.content, b'')
+        self.assertEqual(queries, 1)
+
+    def test_if_modified_since(self):
+        response = self.client.get(f'/api/posts/{self.post.id}/')
+        again = self.client.get(
+            f'/api/posts/{self.post.id}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_changes_produce_new_validators(self):
+        urls = ['/api/posts/', f'/api/posts/{self.post.id}/', '/api/tags/']
+        changes = [
+            lambda: Post.objects.create(title='New', content='C', author=self.reader_user, status='published'),
+            lambda: self.post.tags.add(self.tag),
+            lambda: Tag.objects.filter(pk=self.tag.pk).get().save(),
+        ]
+        for change, url in zip(changes, urls):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                change()
+                again, _ = self.revalidate(url, response)
+                self.assertEqual(again.status_code, status.HTTP_200_OK)
+
+    def test_reference_lists_revalidate_without_queries(self):
+        response = self.client.get('/api/categories/')
+        again, queries = self.revalidate('/api/categories/', response)
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(queries, 0)
+
+    def test_cached_read_keeps_its_validators(self):
+        response = self.client.get('/api/posts/')
+        with CaptureQueriesContext(connection) as context:
+            cached = self.client.get('/api/posts/')
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(cached['Last-Modified'], response['Last-Modified'])
+
+    def test_missing_post_is_still_not_found(self):
+        response = self.client.get('/api/posts/999999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class ReferenceCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        self.admin_user = User.objects.create_user(username='admin', password='admin123')
+        UserProfile.objects.create(user=self.admin_user, role='admin')
+        self.category = Category.objects.create(name='Tech')
+        self.tag = Tag.objects.create(name='python')
+        self.post = Post.objects.create(
+            title='Post', content='Content', author=self.admin_user,
+            category=self.category, status='published'
+        )
+        self.post.tags.add(self.tag)
+        self.client.force_authenticate(user=self.admin_user)
+        self.admin_user.userprofile
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, context.captured_queries
+
+    def test_warm_reference_lists_cost_no_queries(self):
+        for url in ('/api/categories/', '/api/tags/'):
+            with self.subTest(url=url):
+                self.client.get(url)
+                response, queries = self.count_queries(url)
+                self.assertEqual(queries, [])
+                self.assertEqual(len(response.data['data']), 1)
+
+    def test_writes_refresh_every_reader(self):
+        self.client.get('/api/categories/')
+        self.client.post('/api/categories/', {'name': 'Science'})
+        Category.objects.filter(pk=self.category.pk).get().save()
+        response = self.client.get('/api/categories/')
+        self.assertEqual(
+            sorted(row['name'] for row in response.data['data']), ['Science', 'Tech']
+        )
+
+    def test_post_payloads_resolve_names_without_joins(self):
+        reference_cache.get()
+        response, queries = self.count_queries('/api/posts/')
+        self.assertEqual(response.data['results']['data'][0]['category_name'], 'Tech')
+        self.assertFalse(any('api_category' in query['sql'] for query in queries))
+        response, queries = self.count_queries(f'/api/posts/{self.post.id}/')
+        self.assertEqual([tag['name'] for tag in response.data['data']['tags']], ['python'])
+        self.assertFalse(any('"api_tag"' in query['sql'] for query in queries))
+
+    def test_renamed_category_shows_in_post_payloads(self):
+        self.client.get(f'/api/posts/{self.post.id}/')
+        self.category.name = 'Technology'
+        self.category.save()
+        response = self.client.get(f'/api/posts/{self.post.id}/')
+        self.assertEqual(response.data['data']['category_name'], 'Technology')
+
+class FastSerializerTestCase(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='author123')
+        category = Category.objects.create(name='Tech', description='Technology posts')
+        tags = [Tag.objects.create(name='python'), Tag.objects.create(name='django')]
+        published = Post.objects.create(
+            title='Published', content='Content', author=self.author,
+            category=category, status='published'
+        )
+        published.tags.set(tags)
+        Post.objects.create(title='Draft', content='Content', author=self.author)
+
+    def test_output_is_byte_identical(self):
+        from rest_framework.renderers import JSONRenderer
+        from .fast_serializers import category_serializer, post_list_serializer, tag_serializer
+        from .serializers import CategorySerializer, PostListSerializer, TagSerializer
+        renderer = JSONRenderer()
+        cases = [
+            (PostListSerializer, post_list_serializer, Post.objects.with_list_relations()),
+            (CategorySerializer, category_serializer, Category.objects.all()),
+            (TagSerializer, tag_serializer, Tag.objects.all()),
+        ]
+        for serializer_class, fast, queryset in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                expected = renderer.render(serializer_class(queryset, many=True).data)
+                self.assertEqual(renderer.render(fast.serialize(fast.values(queryset))), expected)
+
+    def test_benchmark_command_checks_output(self):
+        out = StringIO()
+        call_command('benchmark_serializers', rows=[3], repeat=1, stdout=out)
+        self.assertIn('byte-identical', out.getvalue())
+        self.assertEqual(Post.objects.count(), 2)
+
+class PostExportTestCase(APITestCase):
+    def setUp(self):
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.reader_user = User.objects.create_user(username='reader', password='reader123')
+        UserProfile.objects.create(user=self.reader_user, role='reader')
+        self.category = Category.objects.create(name='Tech')
+        self.posts = [
+            Post.objects.create(
+                title=f'Post {i}', content=f'Body {i}, with "quotes"', author=self.editor_user,
+                category=self.category if i % 2 else None,
+                status='published' if i % 3 else 'draft'
+            )
+            for i in range(7)
+        ]
+
+    def export(self, user, query=''):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(f'/api/posts/export/{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson_respects_visibility(self):
+        import json
+        rows = [json.loads(line) for line in self.export(self.reader_user).splitlines()]
+        published = [post.id for post in self.posts if post.status == 'published']
+        self.assertEqual([row['id'] for row in rows], published)
+        self.assertEqual(rows[0]['category_name'], 'Tech')
+        self.assertEqual(len(self.export(self.editor_user).splitlines()), len(self.posts))
+
+    def test_filters_and_id_cursor_resume(self):
+        import json
+        resume_after = self.posts[2].id
+        rows = [
+            json.loads(line)
+            for line in self.export(self.editor_user, f'?status=draft&after={resume_after}').splitlines()
+        ]
+        expected = [post.id for post in self.posts if post.status == 'draft' and post.id > resume_after]
+        self.assertEqual([row['id'] for row in rows], expected)
+
+    def test_csv(self):
+        import csv
+        rows = list(csv.DictReader(StringIO(self.export(self.editor_user, '?format=csv'))))
+        self.assertEqual(len(rows), len(self.posts))
+        self.assertEqual(rows[0]['content'], 'Body 0, with "quotes"')
+        self.assertEqual(rows[0]['category'], '')
+
+    def test_rows_are_read_while_streaming(self):
+        from .views import PostViewSet
+        PostViewSet.export_chunk_size, chunk_size = 2, PostViewSet.export_chunk_size
+        try:
+            self.client.force_authenticate(user=self.editor_user)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get('/api/posts/export/')
+                self.assertEqual(len(context.captured_queries), 0)
+                lines = list(response.streaming_content)
+            self.assertEqual(len(lines), len(self.posts))
+        finally:
+            PostViewSet.export_chunk_size = chunk_size
+
+    def test_invalid_cursor(self):
+        self.client.force_authenticate(user=self.editor_user)
+        response = self.client.get('/api/posts/export/?after=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class BulkPostTestCase(APITestCase):
+    def setUp(self):
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.other_editor = User.objects.create_user(username='other', password='other123')
+        UserProfile.objects.create(user=self.other_editor, role='editor')
+        self.reader_user = User.objects.create_user(username='reader', password='reader123')
+        UserProfile.objects.create(user=self.reader_user, role='reader')
+        self.category = Category.objects.create(name='Tech')
+        self.tags = [Tag.objects.create(name=f'tag-{i}') for i in range(3)]
+        self.client.force_authenticate(user=self.editor_user)
+        self.editor_user.userprofile
+
+    def post_items(self, items):
+        return self.client.post('/api/posts/bulk/', items, format='json')
+
+    def make_items(self, count):
+        return [
+            {
+                'title': f'Imported {i}', 'content': 'Imported content', 'status': 'published',
+                'category': self.category.id, 'tag_ids': [tag.id for tag in self.tags],
+            }
+            for i in range(count)
+        ]
+
+    def test_reader_cannot_bulk_create(self):
+        self.client.force_authenticate(user=self.reader_user)
+        response = self.post_items(self.make_items(1))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_per_item_results(self):
+        items = self.make_items(1) + [
+            {'title': 'Draft', 'content': 'Content'},
+            {'title': 'Bad tags', 'content': 'Content', 'tag_ids': [999]},
+            {'content': 'No title'},
+        ]
+        response = self.post_items(items)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data['data']
+        self.assertEqual([result['status'] for result in results], ['created', 'created', 'error', 'error'])
+        self.assertIn('tag_ids', results[2]['errors'])
+        self.assertIn('title', results[3]['errors'])
+
+        published = Post.objects.get(pk=results[0]['id'])
+        self.assertIsNotNone(published.published_at)
+        self.assertEqual(published.author, self.editor_user)
+        self.assertEqual(published.tags.count(), 3)
+        self.assertIsNone(Post.objects.get(pk=results[1]['id']).published_at)
+        search = self.client.get('/api/posts/?search=imported')
+        self.assertEqual(search.data['count'], 1)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        counts = []
+        for size in (5, 50):
+            with CaptureQueriesContext(connection) as context:
+                response = self.post_items(self.make_items(size))
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Post.tags.through.objects.count(), 55 * 3)
+
+    def test_updates_respect_ownership(self):
+        own = Post.objects.create(title='Own', content='C', author=self.editor_user)
+        own.tags.set(self.tags)
+        other = Post.objects.create(title='Other', content='C', author=self.other_editor)
+        response = self.post_items([
+            {'id': own.id, 'status': 'published', 'tag_ids': [self.tags[0].id]},
+            {'id': other.id, 'title': 'Hijacked'},
+            {'id': 999999, 'title': 'Missing'},
+        ])
+        self.assertEqual(
+            [result['status'] for result in response.data['data']], ['updated', 'error', 'error']
+        )
+        own.refresh_from_db()
+        self.assertEqual(own.title, 'Own')
+        self.assertIsNotNone(own.published_at)
+        self.assertEqual(list(own.tags.all()), [self.tags[0]])
+        other.refresh_from_db()
+        self.assertEqual(other.title, 'Other')
+
+    def test_body_must_be_a_list(self):
+        response = self.post_items({'title': 'Single'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class DatasetCommandsTestCase(TestCase):
+    def test_populate_is_idempotent_and_batched(self):
+        Tag.objects.create(name='python')
+        with CaptureQueriesContext(connection) as context:
+            call_command('populate_categories_tags', stdout=StringIO())
+        self.assertLess(len(context.captured_queries), 10)
+        call_command('populate_categories_tags', stdout=StringIO())
+        self.assertEqual(Category.objects.count(), 10)
+        self.assertEqual(Tag.objects.count(), 49)
+
+    def generate(self, **options):
+        call_command(
+            'generate_dataset', posts=300, users=50, categories=12, tags=60,
+            batch_size=100, stdout=StringIO(), **options
+        )
+        return list(
+            Post.objects.order_by('id').values_list(
+                'title', 'author_id', 'category_id', 'status', 'created_at', 'published_at'
+            )
+        )
+
+    def test_generate_dataset(self):
+        rows = self.generate()
+        self.assertEqual(len(rows), 300)
+        self.assertEqual(UserProfile.objects.count(), 50)
+        self.assertEqual(Category.objects.count(), 12)
+        self.assertTrue(Post.tags.through.objects.exists())
+        statuses = {row[3] for row in rows}
+        self.assertEqual(statuses, {'published', 'draft', 'archived'})
+        for _, author_id, _, status_value, created_at, published_at in rows:
+            self.assertEqual(published_at is None, status_value == 'draft')
+            if published_at is not None:
+                self.assertGreaterEqual(published_at, created_at)
+        authors = UserProfile.objects.filter(user_id__in={row[1] for row in rows})
+        self.assertTrue(all(profile.role in ('admin', 'editor') for profile in authors))
+        self.assertTrue(RelatedPost.objects.exists())
+
+    def test_generate_dataset_is_deterministic(self):
+        first = self.generate()
+        Post.objects.all().delete()
+        self.assertEqual(self.generate(), first)
+
+
+class EndpointBenchmarkTestCase(TestCase):
+    def test_endpoints_cover_every_route(self):
+        from django.urls import resolve
+        from .management.commands.benchmark_endpoints import ENDPOINTS, UNBENCHMARKED_ROUTES
+        from .urls import urlpatterns
+
+        def names(patterns):
+            for pattern in patterns:
+                if hasattr(pattern, 'url_patterns'):
+                    yield from names(pattern.url_patterns)
+                else:
+                    yield pattern.name
+        targets = dict.fromkeys(['username', 'author', 'post', 'category', 'tag', 'word', 'refresh'], 1)
+        targets['tag_expr'] = 'tag_expr=python'
+        covered = {resolve(path.format(**targets).split('?')[0]).url_name for _, _, path, _, _ in ENDPOINTS}
+        self.assertEqual(covered | set(UNBENCHMARKED_ROUTES), set(names(urlpatterns)))
+
+    def compare(self, calibration_ms, p50_ms, rps):
+        from .management.commands.benchmark_endpoints import Command
+        baseline = {
+            'options': {'posts': 10}, 'calibration_ms': 10.0,
+            'endpoints': {'post-list': {'errors': 0, 'rps': 100.0, 'p50_ms': 20.0, 'p95_ms': 40.0}},
+        }
+        results = {
+            'options': {'posts': 10}, 'calibration_ms': calibration_ms,
+            'endpoints': {'post-list': {'errors': 0, 'rps': rps, 'p50_ms': p50_ms, 'p95_ms': 40.0}},
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            with open(path, 'w') as file:
+                json.dump(baseline, file)
+            command = Command(stdout=StringIO())
+            command.compare(results, {
+                'baseline': path, 'threshold': 0.5, 'tail_threshold': 1.0, 'slack_ms': 10.0,
+            })
+
+    def test_compare_flags_regressions(self):
+        self.compare(10.0, 25.0, 80.0)
+        with self.assertRaisesMessage(CommandError, 'post-list: p50_ms 20.00 expected, 45.0 measured'):
+            self.compare(10.0, 45.0, 80.0)
+        with self.assertRaisesMessage(CommandError, 'post-list: req/s 100.0 expected, 40.0 measured'):
+            self.compare(10.0, 20.0, 40.0)
+
+    def test_compare_scales_with_machine_speed(self):
+        # Twice as slow a machine: twice the latency and half the throughput are expected.
+        self.compare(20.0, 40.0, 50.0)
+        with self.assertRaisesMessage(CommandError, 'p50_ms 40.00 expected, 80.0 measured'):
+            self.compare(20.0, 80.0, 50.0)
+
+
+class PostCounterTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.tech = Category.objects.create(name='Tech')
+        self.food = Category.objects.create(name='Food')
+        self.tags = [Tag.objects.create(name=f'tag-{i}') for i in range(3)]
+
+    def assertCounts(self, categories, tags):
+        self.assertEqual(
+            [Category.objects.get(pk=category.pk).published_post_count for category in (self.tech, self.food)],
+            categories,
+        )
+        self.assertEqual([Tag.objects.get(pk=tag.pk).published_post_count for tag in self.tags], tags)
+        self.assertEqual(call_command_output('repair_post_counters', '--check'),
+                         '0 category counter(s) and 0 tag counter(s) drifted')
+
+    def make_post(self, status_value='published', tags=()):
+        post = Post.objects.create(
+            title='Post', content='Content', author=self.editor_user, category=self.tech, status=status_value
+        )
+        post.tags.set(tags)
+        return post
+
+    def test_publish_unpublish_and_recategorize(self):
+        post = self.make_post('draft', self.tags[:2])
+        self.assertCounts([0, 0], [0, 0, 0])
+        post.status = 'published'
+        post.save()
+        self.assertCounts([1, 0], [1, 1, 0])
+        post.category = self.food
+        post.save()
+        self.assertCounts([0, 1], [1, 1, 0])
+        post.status = 'archived'
+        post.save()
+        self.assertCounts([0, 0], [0, 0, 0])
+
+    def test_tag_changes_in_both_directions(self):
+        post = self.make_post(tags=self.tags[:2])
+        self.make_post('draft', self.tags)
+        self.assertCounts([1, 0], [1, 1, 0])
+        post.tags.remove(self.tags[0], self.tags[2])
+        self.assertCounts([1, 0], [0, 1, 0])
+        self.tags[2].post_set.add(post)
+        self.assertCounts([1, 0], [0, 1, 1])
+        self.tags[2].post_set.clear()
+        self.assertCounts([1, 0], [0, 1, 0])
+        post.tags.clear()
+        self.assertCounts([1, 0], [0, 0, 0])
+
+    def test_clear_reads_the_cleared_rows_once(self):
+        post = self.make_post(tags=self.tags)
+        for clear in (post.tags.clear, self.tags[0].post_set.clear):
+            with CaptureQueriesContext(connection) as context:
+                clear()
+            selects = [query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT')]
+            self.assertEqual(len(selects), len(set(selects)))
+        self.assertCounts([1, 0], [0, 0, 0])
+
+    def test_delete(self):
+        post = self.make_post(tags=self.tags)
+        self.assertCounts([1, 0], [1, 1, 1])
+        post.delete()
+        self.assertCounts([0, 0], [0, 0, 0])
+        self.make_post(tags=self.tags)
+        self.tech.delete()
+        self.assertEqual([tag.published_post_count for tag in Tag.objects.order_by('pk')], [1, 1, 1])
+
+    def test_bulk_writes(self):
+        self.client.force_authenticate(user=self.editor_user)
+        draft = self.make_post('draft', self.tags[:1])
+        response = self.client.post('/api/posts/bulk/', [
+            {'title': 'New', 'content': 'C', 'status': 'published', 'category': self.food.id,
+             'tag_ids': [self.tags[1].id]},
+            {'id': draft.id, 'status': 'published'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertCounts([1, 1], [1, 1, 0])
+        response = self.client.post('/api/posts/bulk/', [
+            {'id': draft.id, 'category': self.food.id, 'tag_ids': [self.tags[2].id]},
+        ], format='json')
+        self.assertCounts([0, 2], [0, 1, 1])
+
+    def test_counter_updates_leave_reference_data_alone(self):
+        post = self.make_post(tags=self.tags[:1])
+        self.client.force_authenticate(user=self.editor_user)
+        detail = self.client.get(f'/api/posts/{post.id}/')['ETag']
+        tags = self.client.get('/api/tags/')
+        snapshot = reference_cache.get()
+        self.make_post(tags=self.tags[:1])
+        self.assertEqual(self.client.get(f'/api/posts/{post.id}/')['ETag'], detail)
+        self.assertIs(reference_cache.get(), snapshot)
+        response = self.client.get('/api/tags/')
+        self.assertNotEqual(response['ETag'], tags['ETag'])
+        self.assertEqual([tag['published_post_count'] for tag in response.data['data']], [2, 0, 0])
+
+    def test_repair_command(self):
+        self.make_post(tags=self.tags)
+        Category.objects.update(published_post_count=7)
+        Tag.objects.filter(pk=self.tags[0].pk).update(published_post_count=0)
+        self.assertEqual(call_command_output('repair_post_counters'),
+                         '2 category counter(s) and 1 tag counter(s) repaired')
+        self.assertCounts([1, 0], [1, 1, 1])
+
+    def test_tag_cloud_and_category_stats(self):
+        self.make_post(tags=self.tags[:2])
+        self.make_post(tags=self.tags[:1])
+        response = self.client.get('/api/tags/cloud/')
+        self.assertEqual(
+            [(tag['name'], tag['published_post_count'], tag['weight']) for tag in response.data['data']],
+            [('tag-0', 2, 5), ('tag-1', 1, 1)],
+        )
+        self.assertEqual(len(self.client.get('/api/tags/cloud/?limit=1').data['data']), 1)
+        response = self.client.get('/api/categories/stats/')
+        self.assertEqual(
+            [(row['name'], row['published_post_count']) for row in response.data['data']],
+            [('Tech', 2), ('Food', 0)],
+        )
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/tags/cloud/')
+            self.client.get('/api/categories/stats/')
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(self.client.get('/api/tags/cloud/?limit=x').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MyPostsTestCase(APITestCase):
+    def setUp(self):
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.other_editor = User.objects.create_user(username='other', password='other123')
+        UserProfile.objects.create(user=self.other_editor, role='editor')
+        self.category = Category.objects.create(name='Tech')
+        now = timezone.now()
+        for i, status_value in enumerate(['published'] * 12 + ['draft'] * 3 + ['archived']):
+            Post.objects.create(
+                title=f'Post {i}', content='Content', author=self.editor_user, status=status_value,
+                category=self.category if i % 2 else None
+            )
+        Post.objects.filter(author=self.editor_user).update(created_at=now)
+        Post.objects.create(title='Not mine', content='Content', author=self.other_editor, status='draft')
+        self.client.force_authenticate(user=self.editor_user)
+
+    def test_paginated_and_scoped_to_author(self):
+        response = self.client.get('/api/my-posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 16)
+        self.assertEqual(len(response.data['results']['data']), 10)
+        self.assertIsNotNone(response.data['next'])
+        second = self.client.get('/api/my-posts/?page=2').data['results']['data']
+        self.assertEqual(len(second), 6)
+        self.assertNotIn('Not mine', [row['title'] for row in second])
+
+    def test_filter_order_and_search(self):
+        response = self.client.get('/api/my-posts/?status=draft&ordering=created_at')
+        self.assertEqual(response.data['count'], 3)
+        self.assertTrue(all(row['status'] == 'draft' for row in response.data['results']['data']))
+        response = self.client.get(f'/api/my-posts/?category={self.category.id}')
+        self.assertEqual(response.data['count'], 8)
+        response = self.client.get('/api/my-posts/?search=post&status=archived')
+        self.assertEqual([row['title'] for row in response.data['results']['data']], ['Post 15'])
+
+    def test_summary(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/my-posts/summary/')
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(
+            response.data['data'], {'total': 16, 'draft': 3, 'published': 12, 'archived': 1}
+        )
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get('/api/my-posts/summary/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserDirectoryTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        roles = ['admin'] + ['editor'] * 4 + ['reader'] * 20
+        users = User.objects.bulk_create([User(username=f'user-{i:02d}') for i in range(len(roles))])
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, role=role) for user, role in zip(users, roles)]
+        )
+
+    def test_paginated_with_roles_in_fixed_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/user/?page_size=20')
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertEqual(response.data['count'], 25)
+        rows = response.data['results']['data']
+        self.assertEqual(len(rows), 20)
+        self.assertEqual(rows[0]['username'], 'user-00')
+        self.assertEqual(rows[0]['role'], 'admin')
+        self.assertNotIn('password', rows[0])
+        self.assertEqual(len(self.client.get('/api/user/?page_size=1000').data['results']['data']), 25)
+
+    def test_filter_and_search(self):
+        response = self.client.get('/api/user/?role=editor&ordering=-id')
+        self.assertEqual(
+            [row['username'] for row in response.data['results']['data']],
+            ['user-04', 'user-03', 'user-02', 'user-01'],
+        )
+        response = self.client.get('/api/user/?search=user-1')
+        self.assertEqual(response.data['count'], 10)
+        response = self.client.get('/api/user/?username=user-07')
+        self.assertEqual([row['role'] for row in response.data['results']['data']], ['reader'])
+        self.assertEqual(self.client.get('/api/user/?role=owner').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_count_is_capped(self):
+        with mock.patch.object(CappedPaginator, 'max_count', 12):
+            response = self.client.get('/api/user/?page=2')
+            self.assertEqual(response.data['count'], 12)
+            self.assertIsNone(response.data['next'])
+            self.assertEqual(self.client.get('/api/user/?page=3').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_is_throttled(self):
+        with mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', {'user_directory': '2/minute'}):
+            codes = [self.client.get('/api/user/').status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+
+    def test_create_sets_role(self):
+        response = self.client.post('/api/user/', {
+            'username': 'new-editor', 'password': 'secret123', 'role': 'editor'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['role'], 'editor')
+        self.assertEqual(UserProfile.objects.get(user__username='new-editor').role, 'editor')
+
+
+class SparseFieldsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.category = Category.objects.create(name='Tech', description='About tech')
+        self.tag = Tag.objects.create(name='django')
+        self.post = Post.objects.create(
+            title='Sparse', content='A long body', author=self.editor_user,
+            category=self.category, status='published'
+        )
+        self.post.tags.set([self.tag])
+        self.client.force_authenticate(user=self.editor_user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, ' '.join(query['sql'] for query in context.captured_queries)
+
+    def test_retrieve_reads_only_requested_columns(self):
+        data, sql = self.get(f'/api/posts/{self.post.id}/?fields=id,title,status')
+        self.assertEqual(data['data'], {'id': self.post.id, 'title': 'Sparse', 'status': 'published'})
+        for column in ('"content', '"excerpt"', 'auth_user', 'api_post_tags'):
+            self.assertNotIn(column, sql)
+
+        data, sql = self.get(f'/api/posts/{self.post.id}/?exclude=content,content_html,tags')
+        self.assertEqual(data['data']['author_username'], 'editor')
+        self.assertEqual(data['data']['category_name'], 'Tech')
+        self.assertNotIn('tags', data['data'])
+        self.assertNotIn('"content', sql)
+        self.assertNotIn('api_post_tags', sql)
+
+        data, _ = self.get(f'/api/posts/{self.post.id}/?fields=tags')
+        self.assertEqual([tag['name'] for tag in data['data']['tags']], ['django'])
+
+    def test_lists_select_only_requested_columns(self):
+        data, sql = self.get('/api/posts/?fields=id,title')
+        self.assertEqual(data['results']['data'], [{'id': self.post.id, 'title': 'Sparse'}])
+        for column in ('"excerpt"', 'auth_user', 'api_post_tags'):
+            self.assertNotIn(column, sql)
+        data, _ = self.get('/api/posts/?pagination=cursor&fields=title')
+        self.assertEqual(data['results']['data'], [{'title': 'Sparse'}])
+        data, _ = self.get('/api/my-posts/?exclude=excerpt,word_count,tags_count')
+        self.assertEqual(set(data['results']['data'][0]), {
+            'id', 'title', 'author_username', 'category_name', 'status', 'created_at', 'published_at'
+        })
+
+    def test_categories_tags_and_users(self):
+        data, _ = self.get('/api/categories/?fields=id,name')
+        self.assertEqual(data['data'], [{'id': self.category.id, 'name': 'Tech'}])
+        data, sql = self.get(f'/api/categories/{self.category.id}/?exclude=description')
+        self.assertNotIn('description', data['data'])
+        self.assertNotIn('"description"', sql)
+        data, _ = self.get(f'/api/tags/?exclude=created_at,published_post_count')
+        self.assertEqual(data['data'], [{'id': self.tag.id, 'name': 'django'}])
+        data, sql = self.get(f'/api/user/{self.editor_user.id}/?fields=username')
+        self.assertEqual(data['data'], {'username': 'editor'})
+        self.assertNotIn('api_userprofile', sql)
+        self.assertNotIn('"email"', sql)
+        data, _ = self.get('/api/user/?fields=username,role')
+        self.assertEqual(data['results']['data'], [{'username': 'editor', 'role': 'editor'}])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/posts/?fields=id,secret')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['fields'], 'Unknown fields: secret')
+        response = self.client.get(f'/api/posts/{self.post.id}/?exclude=tag_ids')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/tags/?fields=weight')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(ROOT_URLCONF='api.async_urls')
+class AsyncReadViewsTestCase(TestCase):
+    """The async read path (api.async_urls, mounted without the /api/ prefix here) matches the sync one."""
+
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.reader_user = User.objects.create_user(username='reader', password='reader123')
+        UserProfile.objects.create(user=self.reader_user, role='reader')
+        self.category = Category.objects.create(name='Tech')
+        self.tags = [Tag.objects.create(name=f'tag-{i}') for i in range(2)]
+        for i in range(12):
+            post = Post.objects.create(
+                title=f'Post {i}', content='Async content', author=self.editor_user,
+                category=self.category, status='draft' if i == 0 else 'published'
+            )
+            post.tags.set(self.tags[:i % 3])
+        self.draft = Post.objects.get(status='draft')
+        refresh_posts(Post.objects.values_list('id', flat=True))
+
+    def auth(self, user, **headers):
+        token = RoleRefreshToken.for_user(user).access_token
+        return {'headers': {'Authorization': f'Bearer {token}', **headers}}
+
+    def sync_get(self, url, user):
+        with override_settings(ROOT_URLCONF='Multi_User_Blog_Backend.urls'):
+            return self.client.get(f'/api{url}', **self.auth(user))
+
+    async def test_reads_match_the_sync_views(self):
+        urls = [
+            '/posts/', '/posts/?page=2', '/posts/?status=published&ordering=published_at',
+            f'/posts/?category={self.category.id}&search=async', '/posts/?pagination=cursor',
+            f'/posts/{self.draft.id}/', '/categories/', f'/categories/{self.category.id}/',
+            '/tags/', f'/tags/{self.tags[0].id}/', '/my-posts/', '/my-posts/?status=draft',
+            f'/posts/{self.draft.id}/related/', f'/posts/{self.draft.id + 1}/related/',
+            '/posts/?fields=id,title', '/posts/?pagination=cursor&exclude=category_name',
+            f'/posts/{self.draft.id}/?fields=title,tags', f'/posts/{self.draft.id}/?exclude=tags,category_name',
+            '/categories/?exclude=description', f'/tags/{self.tags[0].id}/?fields=name',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url, **self.auth(self.editor_user))
+                self.assertEqual(response.status_code, 200)
+                expected = await sync_to_async(self.sync_get)(url, self.editor_user)
+                self.assertEqual(
+                    response.json(), json.loads(expected.content.decode().replace('/api/', '/'))
+                )
+
+    async def test_permissions_and_errors(self):
+        reader = self.auth(self.reader_user)
+        for url in (f'/posts/{self.draft.id}/', f'/posts/{self.draft.id}/related/'):
+            response = await self.async_client.get(url, **reader)
+            self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/posts/999999/', **self.auth(self.editor_user))
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/posts/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/posts/?page=99', **reader)
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/posts/?category=999', **reader)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_tokens_without_role_claim(self):
+        token = RoleRefreshToken.for_user(self.editor_user).access_token
+        del token['role']
+        response = await self.async_client.get('/posts/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.json()['count'], 12)
+
+    async def test_conditional_get(self):
+        response = await self.async_client.get('/posts/', **self.auth(self.reader_user))
+        response = await self.async_client.get(
+            '/posts/', **self.auth(self.reader_user, **{'If-None-Match': response['ETag']})
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_writes_use_the_sync_views(self):
+        response = await self.async_client.post(
+            '/posts/', {'title': 'New', 'content': 'Body'}, content_type='application/json',
+            **self.auth(self.editor_user)
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Post.objects.filter(title='New').aexists())
+
+
+class TagExpressionTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        tag_index.clear()
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.client.force_authenticate(user=self.editor_user)
+        self.python, self.django, self.beginners, self.web = (
+            Tag.objects.create(name=name) for name in ('python', 'django', 'beginners', 'web development')
+        )
+        tagsets = {
+            'py': [self.python],
+            'py-dj': [self.python, self.django],
+            'py-dj-beginners': [self.python, self.django, self.beginners],
+            'dj-web': [self.django, self.web],
+            'untagged': [],
+        }
+        self.posts = {}
+        with self.captureOnCommitCallbacks(execute=True):
+            for title, tags in tagsets.items():
+                post = Post.objects.create(title=title, content='Content', author=self.editor_user, status='published')
+                post.tags.set(tags)
+                self.posts[title] = post
+
+    def titles(self, expression, **params):
+        response = self.client.get('/api/posts/', {'tag_expr': expression, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return sorted(row['title'] for row in response.data['results']['data'])
+
+    def test_parse_precedence_and_quoting(self):
+        self.assertEqual(
+            parse_tag_expression('a or NOT b AND (c OR "d e")'),
+            ('or', [('tag', 'a'), ('and', [('not', ('tag', 'b')), ('or', [('tag', 'c'), ('tag', 'd e')])])]),
+        )
+        for invalid in ('', 'a AND', '(a OR b', 'a b', '"a', 'NOT'):
+            with self.assertRaises(TagExpressionError):
+                parse_tag_expression(invalid)
+
+    def test_evaluate_on_sorted_arrays(self):
+        import random
+        from array import array
+        rng = random.Random(7)
+        postings = {name: sorted(rng.sample(range(1, 200), size)) for name, size in zip('abcd', (3, 40, 90, 150))}
+        node = parse_tag_expression('(a OR b) AND c AND NOT d OR NOT (b OR NOT c)')
+        post_ids, negated = evaluate(node, lambda name: array('q', postings[name]))
+        a, b, c, d = (set(postings[name]) for name in 'abcd')
+        every = set(range(1, 200))
+        expected = ((a | b) & c - d) | (every - (b | (every - c)))
+        self.assertEqual(post_ids.tolist(), sorted(set(post_ids.tolist())))
+        matched = every - set(post_ids.tolist()) if negated else set(post_ids.tolist())
+        self.assertEqual(matched, expected)
+
+    def test_boolean_expressions(self):
+        self.assertEqual(self.titles('python AND django AND NOT beginners'), ['py-dj'])
+        self.assertEqual(self.titles('python OR "web development"'), ['dj-web', 'py', 'py-dj', 'py-dj-beginners'])
+        self.assertEqual(self.titles('NOT django'), ['py', 'untagged'])
+        self.assertEqual(self.titles('NOT python OR beginners'), ['dj-web', 'py-dj-beginners', 'untagged'])
+        self.assertEqual(self.titles('NOT (python OR django)'), ['untagged'])
+        self.assertEqual(self.titles('python AND NOT django', ordering='created_at'), ['py'])
+
+    def test_large_results_are_pushed_down_to_sql(self):
+        expressions = ['python AND django AND NOT beginners', 'NOT python OR beginners', 'django OR NOT django']
+        expected = [self.titles(expression) for expression in expressions]
+        with mock.patch('api.filters.TagExpressionFilter.max_ids', 0):
+            self.assertEqual([self.titles(expression) for expression in expressions], expected)
+
+    def test_invalid_expressions_are_rejected(self):
+        response = self.client.get('/api/posts/', {'tag_expr': 'python AND rust'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['tag_expr'], ['Unknown tags: rust'])
+        response = self.client.get('/api/posts/', {'tag_expr': 'python AND'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tag_changes_are_replayed_without_reloading(self):
+        self.assertEqual(self.titles('beginners'), ['py-dj-beginners'])
+        with mock.patch.object(tag_index, 'load', side_effect=AssertionError('reloaded')):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.posts['py'].tags.add(self.beginners)
+                self.beginners.post_set.remove(self.posts['py-dj-beginners'])
+                self.posts['dj-web'].tags.clear()
+            self.assertEqual(self.titles('beginners'), ['py'])
+            self.assertEqual(self.titles('NOT django'), ['dj-web', 'py', 'untagged'])
+            with self.captureOnCommitCallbacks(execute=True):
+                self.posts['py-dj'].delete()
+                self.django.delete()
+            self.assertEqual(self.titles('python'), ['py', 'py-dj-beginners'])
+
+    def test_bulk_writes_update_the_index(self):
+        self.assertEqual(self.titles('beginners'), ['py-dj-beginners'])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/posts/bulk/', [
+                {'id': self.posts['py'].id, 'tag_ids': [self.beginners.id]},
+                {'title': 'new', 'content': 'Content', 'status': 'published', 'tag_ids': [self.beginners.id]},
+            ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.titles('beginners'), ['new', 'py', 'py-dj-beginners'])
+        self.assertEqual(self.titles('python AND NOT beginners'), ['py-dj'])
+
+    def test_journal_gap_reloads_the_index(self):
+        self.titles('python')
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['untagged'].tags.add(self.python)
+        self.assertIn('untagged', self.titles('python'))
+
+
+class RelatedPostsFixture:
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.reader_user = User.objects.create_user(username='reader', password='reader123')
+        UserProfile.objects.create(user=self.reader_user, role='reader')
+        self.tech = Category.objects.create(name='Tech')
+        self.food = Category.objects.create(name='Food')
+        self.rare = Tag.objects.create(name='rare')
+        self.common = Tag.objects.create(name='common')
+        specs = [
+            ('a', self.tech, [self.rare, self.common], 'published'),
+            ('b', self.food, [self.rare], 'published'),
+            ('c', self.tech, [self.common], 'published'),
+            ('d', None, [self.common], 'published'),
+            ('e', None, [self.common], 'published'),
+            ('f', self.tech, [], 'published'),
+            ('draft', self.tech, [self.rare], 'draft'),
+        ]
+        self.posts = {}
+        for title, category, tags, status_value in specs:
+            post = Post.objects.create(
+                title=title, content='Content', author=self.editor_user, category=category, status=status_value
+            )
+            post.tags.set(tags)
+            self.posts[title] = post
+        refresh_posts(Post.objects.values_list('id', flat=True))
+        self.client.force_authenticate(user=self.reader_user)
+        self.reader_user.userprofile
+        reference_cache.get()
+
+    def related(self, title):
+        response = self.client.get(f'/api/posts/{self.posts[title].id}/related/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['title'], row['score']) for row in response.data['data']]
+
+    def table(self):
+        return sorted(RelatedPost.objects.values_list('post_id', 'related_id', 'score'))
+
+
+class RelatedPostsTestCase(RelatedPostsFixture, APITestCase):
+    def test_scores_weight_rare_tags_and_shared_categories(self):
+        rare, common = math.log(6 / 2), math.log(6 / 4)
+        self.assertEqual(self.related('a'), [
+            ('c', round(common + CATEGORY_WEIGHT, 4)), ('b', round(rare, 4)), ('f', CATEGORY_WEIGHT),
+            ('e', round(common, 4)), ('d', round(common, 4)),
+        ])
+        self.assertNotIn('draft', [title for title, _ in self.related('b')])
+        # Drafts have related posts (for their authors) but are never one.
+        self.client.force_authenticate(user=self.editor_user)
+        self.assertEqual([title for title, _ in self.related('draft')[:2]], ['a', 'b'])
+
+    def test_writes_update_both_sides(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['b'].category = self.tech
+            self.posts['b'].save()
+        self.assertEqual(self.related('a')[0], ('b', round(math.log(3) + CATEGORY_WEIGHT, 4)))
+        self.assertEqual(self.related('b')[0], ('a', round(math.log(3) + CATEGORY_WEIGHT, 4)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['c'].tags.clear()
+            self.posts['e'].status = 'draft'
+            self.posts['e'].save()
+        self.assertNotIn('e', [title for title, _ in self.related('a')])
+        self.assertIn(('c', CATEGORY_WEIGHT), self.related('a'))
+
+    def test_related_is_one_query_and_respects_visibility(self):
+        with CaptureQueriesContext(connection) as context:
+            self.related('a')
+        self.assertEqual(len(context.captured_queries), 1)
+        for path in (f'{self.posts["draft"].id}', '999999', 'abc'):
+            response = self.client.get(f'/api/posts/{path}/related/')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, path)
+        RelatedPost.objects.filter(post=self.posts['f']).delete()
+        self.assertEqual(self.related('f'), [])
+
+    def test_refresh_reuses_the_published_total(self):
+        with CaptureQueriesContext(connection) as context:
+            refresh_posts([self.posts['a'].id])
+        self.assertFalse([query for query in context.captured_queries if 'COUNT(' in query['sql']])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['draft'].status = 'published'
+            self.posts['draft'].save()
+            self.posts['a'].delete()
+        self.assertEqual(published_total(), 6)
+
+
+class RelatedPostsRebuildTestCase(RelatedPostsFixture, APITransactionTestCase):
+    def test_rebuild_matches_refreshing_every_post(self):
+        self.posts['d'].tags.add(self.rare)
+        self.rare.post_set.remove(self.posts['b'])
+        refresh_posts(Post.objects.values_list('id', flat=True))
+        incremental = self.table()
+        RelatedPost.objects.all().delete()
+        call_command_output('rebuild_related_posts', '--chunk-size', '2')
+        self.assertTableEqual(self.table(), incremental)
+        # Over existing lists, and inside a caller's transaction.
+        with transaction.atomic():
+            call_command_output('rebuild_related_posts')
+        self.assertTableEqual(self.table(), incremental)
+
+    def assertTableEqual(self, rebuilt, incremental):
+        self.assertEqual(
+            [(post_id, related_id) for post_id, related_id, _ in rebuilt],
+            [(post_id, related_id) for post_id, related_id, _ in incremental],
+        )
+        for (_, _, rebuilt_score), (_, _, score) in zip(rebuilt, incremental):
+            self.assertAlmostEqual(rebuilt_score, score)
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=3600, BLOG_VIEW_COUNT_MAX_PENDING=1000)
+class ViewCountTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        view_counter.clear()
+        self.addCleanup(view_counter.clear)
+        self.reader_user = User.objects.create_user(username='reader', password='reader123')
+        UserProfile.objects.create(user=self.reader_user, role='reader')
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.posts = {
+            title: Post.objects.create(title=title, content=title, author=self.editor_user, status=post_status)
+            for title, post_status in (('hot', 'published'), ('warm', 'published'), ('draft', 'draft'))
+        }
+        self.client.force_authenticate(user=self.reader_user)
+
+    def view(self, title, times=1):
+        for _ in range(times):
+            self.client.get(f'/api/posts/{self.posts[title].id}/')
+
+    def view_counts(self):
+        return dict(Post.objects.values_list('title', 'view_count'))
+
+    def test_views_are_written_in_batches(self):
+        # Cached responses count too; a 404 does not.
+        self.view('hot', 3)
+        self.view('warm')
+        self.view('draft')
+        self.assertEqual(self.view_counts(), {'hot': 0, 'warm': 0, 'draft': 0})
+        self.assertEqual(view_counter.pending(), 4)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(view_counter.flush(), 4)
+        updates = [query for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(self.view_counts(), {'hot': 3, 'warm': 1, 'draft': 0})
+
+    @override_settings(BLOG_VIEW_COUNT_MAX_PENDING=5)
+    def test_a_crash_loses_fewer_than_max_pending_views(self):
+        self.view('hot', 7)
+        self.view('warm', 6)
+        # A worker killed now never flushes what it holds.
+        lost = view_counter.pending()
+        view_counter.clear()
+        self.assertEqual(sum(self.view_counts().values()), 13 - lost)
+        self.assertEqual(lost, 3)
+        self.assertLessEqual(lost, 5 - 1)
+        with override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0):
+            self.view('hot')
+        self.assertEqual(view_counter.pending(), 0)
+
+    def test_saving_a_post_keeps_flushed_views(self):
+        post = Post.objects.get(pk=self.posts['hot'].pk)
+        self.view('hot', 2)
+        view_counter.flush()
+        post.title = 'renamed'
+        post.save()
+        self.assertEqual(self.view_counts()['renamed'], 2)
+
+    def test_trending_score_decays_views(self):
+        half_life, start = 6 * 60 * 60, time.time()
+        self.view('hot', 8)
+        view_counter.flush(now=start)
+        self.view('warm', 4)
+        view_counter.flush(now=start + 2 * half_life)
+        scores = dict(Post.objects.values_list('title', 'trending_score'))
+        self.assertAlmostEqual(decayed_views(scores['hot'], start + 2 * half_life), 2)
+        self.assertAlmostEqual(decayed_views(scores['warm'], start + 2 * half_life), 4)
+        ranked = Post.objects.exclude(trending_score=None).order_by('-trending_score')
+        self.assertEqual([post.title for post in ranked], ['warm', 'hot'])
+        self.view('hot', 8)
+        view_counter.flush(now=start + 2 * half_life)
+        hot = Post.objects.get(pk=self.posts['hot'].pk)
+        self.assertAlmostEqual(decayed_views(hot.trending_score, start + 2 * half_life), 10)
+        self.assertEqual(hot.view_count, 16)
+
+    def test_trending_endpoint_is_cached_and_published_only(self):
+        self.view('warm', 2)
+        self.view('hot', 3)
+        view_counter.add(self.posts['draft'].id)
+        view_counter.flush()
+        response = self.client.get('/api/posts/trending/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['title'], item['view_count']) for item in response.data['data']], [('hot', 3), ('warm', 2)]
+        )
+        self.assertAlmostEqual(response.data['data'][0]['trending_score'], 3, places=1)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get('/api/posts/trending/').data, response.data)
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(len(self.client.get('/api/posts/trending/?limit=1').data['data']), 1)
+        response = self.client.get('/api/posts/trending/?limit=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class FeedTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.tech = Category.objects.create(name='Tech')
+        self.life = Category.objects.create(name='Life')
+        self.python = Tag.objects.create(name='python')
+        self.post = Post.objects.create(
+            title='Feeds', content='About feeds', author=self.editor_user, category=self.tech, status='published'
+        )
+        self.post.tags.add(self.python)
+        Post.objects.create(title='Draft', content='Draft', author=self.editor_user, category=self.tech)
+        Post.objects.create(
+            title='Living', content='Life', author=self.editor_user, category=self.life, status='published'
+        )
+
+    def feed(self, path, queries=None, **headers):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/feeds/{path}/', **headers)
+        if queries is not None:
+            self.assertEqual(len(context.captured_queries), queries, path)
+        return response
+
+    def titles(self, response):
+        return re.findall(r'<entry><title>([^<]*)</title>', response.content.decode())
+
+    def test_feeds_list_published_posts_per_scope(self):
+        response = self.feed(f'category/{self.tech.id}/atom')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/atom+xml; charset=utf-8')
+        self.assertEqual(self.titles(response), ['Feeds'])
+        self.assertIn('<category term="python"', response.content.decode())
+        self.assertEqual(self.titles(self.feed(f'tag/{self.python.id}/atom')), ['Feeds'])
+        self.assertEqual(self.titles(self.feed(f'author/{self.editor_user.id}/atom')), ['Living', 'Feeds'])
+        rss = self.feed(f'category/{self.life.id}/rss')
+        self.assertIn('<item><title>Living</title>', rss.content.decode())
+        for path in ('category/999/atom', f'tag/{self.python.id}/json', f'post/{self.post.id}/atom'):
+            self.assertEqual(self.feed(path).status_code, status.HTTP_404_NOT_FOUND, path)
+
+    def test_polls_are_served_from_cache_and_validators(self):
+        path = f'category/{self.tech.id}/atom'
+        first = self.feed(path)
+        second = self.feed(path, queries=0)
+        self.assertEqual(second.content, first.content)
+        not_modified = self.feed(path, queries=0, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        not_modified = self.feed(path, queries=0, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_writes_invalidate_only_their_scopes(self):
+        tech, life = f'category/{self.tech.id}/atom', f'category/{self.life.id}/atom'
+        tag = f'tag/{self.python.id}/atom'
+        before = {path: self.feed(path) for path in (tech, life, tag)}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Renamed'
+            self.post.save()
+        self.feed(life, queries=0)
+        self.assertEqual(self.titles(self.feed(tech)), ['Renamed'])
+        self.assertEqual(self.titles(self.feed(tag)), ['Renamed'])
+        # Unpublishing drops the entry without moving Last-Modified back.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.status = 'draft'
+            self.post.save()
+        response = self.feed(tech)
+        self.assertEqual(self.titles(response), [])
+        self.assertNotEqual(response['ETag'], before[tech]['ETag'])
+        self.assertGreaterEqual(
+            parse_http_date(response['Last-Modified']), parse_http_date(before[tech]['Last-Modified'])
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.python.post_set.add(Post.objects.get(title='Living'))
+        self.assertEqual(self.titles(self.feed(tag)), ['Living'])
+        self.assertIn('<category term="python"', self.feed(life).content.decode())
+
+    def test_publishing_elsewhere_keeps_cached_feeds(self):
+        path = f'category/{self.tech.id}/atom'
+        etag = self.feed(path)['ETag']
+        # Moves the published post counters, not the category and tag names.
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(
+                title='Later', content='Life', author=self.editor_user, category=self.life, status='published'
+            )
+        not_modified = self.feed(path, queries=0, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+class RenderedContentTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.post = Post.objects.create(
+            title='Markdown', author=self.editor_user, status='published',
+            content='# Title\n\nSome **bold** text <script>alert(1)</script> [x](javascript:alert(1))',
+        )
+        self.client.force_authenticate(user=self.editor_user)
+
+    def test_save_stores_sanitized_html_excerpt_and_word_count(self):
+        self.assertEqual(self.post.content_html, (
+            '<h1>Title</h1>\n<p>Some <strong>bold</strong> text '
+            '&lt;script&gt;alert(1)&lt;/script&gt; <a href="">x</a></p>'
+        ))
+        self.assertEqual(self.post.excerpt, 'Title Some bold text <script>alert(1)</script> x')
+        self.assertEqual(self.post.word_count, 6)
+        data = self.client.get(f'/api/posts/{self.post.id}/').data['data']
+        self.assertEqual(data['content_html'], self.post.content_html)
+        post = Post.objects.get(pk=self.post.pk)
+        post.content = ' '.join(['word'] * 100)
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.word_count, 100)
+        self.assertEqual(len(post.excerpt), 300)
+        self.assertTrue(post.excerpt.endswith('word\u2026'))
+
+    def test_lists_serve_the_excerpt_without_loading_content(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/posts/')
+        item = response.data['results']['data'][0]
+        self.assertEqual((item['excerpt'], item['word_count']), (self.post.excerpt, 6))
+        self.assertNotIn('content', item)
+        for query in context.captured_queries:
+            self.assertNotIn('"content', query['sql'])
+        listed = Post.objects.with_list_relations().get(pk=self.post.pk)
+        self.assertEqual(listed.get_deferred_fields(), {'content', 'content_html'})
+
+    def test_bulk_writes_and_rerender_command_render_content(self):
+        response = self.client.post('/api/posts/bulk/', [
+            {'title': 'New', 'content': '*new*'}, {'id': self.post.id, 'content': 'changed'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            dict(Post.objects.values_list('title', 'content_html')),
+            {'New': '<p><em>new</em></p>', 'Markdown': '<p>changed</p>'},
+        )
+        Post.objects.update(content_html='', excerpt='', word_count=0, render_version=0)
+        output = call_command_output('rerender_posts', '--workers', '1', '--batch-size', '1')
+        self.assertIn('Re-rendered 2 posts', output)
+        self.assertEqual(Post.objects.get(title='New').excerpt, 'new')
+        self.assertIn('Re-rendered 0 posts', call_command_output('rerender_posts'))
+
+    def test_rerender_command_invalidates_feeds(self):
+        path = f'/api/feeds/author/{self.editor_user.id}/atom/'
+        self.assertIn('Title Some bold text', self.client.get(path).content.decode())
+        Post.objects.update(content='Rewritten', render_version=0)
+        call_command_output('rerender_posts', '--workers', '1')
+        self.assertIn('>Rewritten</summary>', self.client.get(path).content.decode())
+
+@override_settings(BLOG_READ_REPLICAS=['replica'])
+class ReadReplicaTestCase(APITransactionTestCase):
+    """
+    The test database as primary and a temporary SQLite file as its replica,
+    added once the test runner has set up its databases.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections.settings['default'], 'NAME': os.path.join(cls.replica_dir.name, 'replica.sqlite3')
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.replica_dir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        replica_pool.clear()
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.reader_user = User.objects.create_user(username='reader', password='reader123')
+        UserProfile.objects.create(user=self.reader_user, role='reader')
+        Post.objects.create(title='Synced', content='Body', author=self.editor_user, status='published')
+        call_command_output('sync_replicas')
+        Post.objects.create(title='Unsynced', content='Body', author=self.editor_user, status='published')
+
+    def titles(self, user):
+        self.client.force_authenticate(user=user)
+        response = self.client.get('/api/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item['title'] for item in response.data['results']['data']}
+
+    def test_reads_use_the_replica_and_writers_read_their_writes(self):
+        # Readers share the published list's response cache, which is filled
+        # from the primary.
+        self.assertEqual(self.titles(self.reader_user), {'Synced', 'Unsynced'})
+        self.assertEqual(self.titles(self.editor_user), {'Synced'})
+        response = self.client.post('/api/posts/', {'title': 'Mine', 'content': 'Body', 'status': 'published'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.titles(self.editor_user), {'Synced', 'Unsynced', 'Mine'})
+        cache.clear()  # The pin expires.
+        self.assertEqual(self.titles(self.editor_user), {'Synced'})
+        call_command_output('sync_replicas')
+        self.assertEqual(self.titles(self.editor_user), {'Synced', 'Unsynced', 'Mine'})
+
+    def test_failed_replica_falls_back_to_the_primary(self):
+        with connections['replica'].cursor() as cursor:
+            cursor.execute('DROP TABLE api_post')
+        with self.assertLogs('api.replicas', 'WARNING'):
+            self.assertEqual(self.titles(self.editor_user), {'Synced', 'Unsynced'})
+        self.assertIsNone(replica_pool.choose())
+        with override_settings(BLOG_REPLICA_RETRY_AFTER=0):
+            self.assertEqual(replica_pool.choose(), 'replica')
+
+    @override_settings(BLOG_READ_REPLICAS=['a', 'b', 'c'], BLOG_REPLICA_RETRY_AFTER=60)
+    def test_replica_selection(self):
+        self.assertEqual([replica_pool.choose() for _ in range(4)], ['a', 'b', 'c', 'a'])
+        replica_pool.mark_failed('b')
+        self.assertEqual({replica_pool.choose() for _ in range(4)}, {'a', 'c'})
+        with override_settings(BLOG_REPLICA_SELECTION='least_recently_failed', BLOG_REPLICA_RETRY_AFTER=0):
+            replica_pool.mark_failed('a')
+            self.assertEqual({replica_pool.choose() for _ in range(4)}, {'c'})
+            replica_pool.mark_failed('c')
+            self.assertEqual({replica_pool.choose() for _ in range(4)}, {'b'})
+
+    def test_caches_are_filled_from_the_primary(self):
+        admin = User.objects.create_user(username='admin', password='admin123')
+        UserProfile.objects.create(user=admin, role='admin')
+        self.client.force_authenticate(user=admin)
+        response = self.client.post('/api/categories/', {'name': 'Fresh', 'description': 'New'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        def category_names(user):
+            self.client.force_authenticate(user=user)
+            response = self.client.get('/api/categories/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [item['name'] for item in response.data['data']]
+        # An anonymous read between the write and the writer's own read fills
+        # the caches; the lagging replica must not be what they hold.
+        self.assertEqual(category_names(None), ['Fresh'])
+        self.assertEqual(category_names(admin), ['Fresh'])
+        cache.delete(f'replicas:pinned:{admin.pk}')
+        call_command_output('sync_replicas')
+        self.assertEqual(category_names(None), ['Fresh'])
+        self.assertEqual(category_names(admin), ['Fresh'])
+
+
+@override_settings(BLOG_INSTRUMENTATION=True, BLOG_METRICS_TOKEN='scrape-token')
+class InstrumentationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.clear()
+        self.editor_user = User.objects.create_user(username='editor', password='editor123')
+        UserProfile.objects.create(user=self.editor_user, role='editor')
+        self.post = Post.objects.create(title='Timed', content='Body', author=self.editor_user, status='published')
+        self.client.force_authenticate(user=self.editor_user)
+
+    def test_server_timing_reports_queries_and_phases(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/posts/?search=body')
+        timing = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertEqual(
+            re.search(r'desc="(\d+) queries"', timing['db']).group(1), str(len(context.captured_queries))
+        )
+        for phase in ('auth', 'perm', 'filter', 'serialize', 'render', 'total'):
+            self.assertRegex(timing[phase], r'^dur=\d+\.\d$')
+        response = self.client.get(f'/api/posts/{self.post.id}/')
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+    def test_metrics_endpoint_aggregates_per_route(self):
+        for _ in range(3):
+            self.client.get('/api/posts/')
+        self.client.get(f'/api/posts/{self.post.id}/')
+        self.client.get('/api/posts/999999/')
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('blog_request_duration_seconds_count{route="post-list",method="GET"} 3', body)
+        self.assertIn('blog_request_duration_seconds_bucket{route="post-list",method="GET",le="+Inf"} 3', body)
+        self.assertIn('blog_requests_total{route="post-detail",method="GET",status="404"} 1', body)
+        self.assertRegex(body, r'blog_request_phase_seconds_count\{route="post-detail",method="GET",phase="serialize"\} 1')
+        self.assertRegex(body, r'blog_db_queries_total\{route="post-list",method="GET"\} [1-9]')
+        self.assertNotIn('route="metrics"', body)
+
+    def test_metrics_require_the_token_or_staff(self):
+        self.client.get('/api/posts/')
+        self.client.force_authenticate(user=None)
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            response = self.client.get('/metrics', **headers)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertNotIn(b'post-list', response.content)
+        staff = User.objects.create_user(username='ops', password='ops12345', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_200_OK)
+
+    @override_settings(BLOG_INSTRUMENTATION=False)
+    def test_switched_off(self):
+        response = self.client.get('/api/posts/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('post-list', metrics.render())
+
+def call_command_output(*args, **options):
+    out = StringIO()
+    call_command(*args, stdout=out, **options)
+    return out.getvalue().strip()
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from . import views
+from . import feeds, views
+from .serializers import RoleTokenObtainPairSerializer, RoleTokenRefreshSerializer
 
 router = DefaultRouter()
 router.register(r'posts', views.PostViewSet,basename='post')
@@ -11,9 +12,11 @@ router.register(r'user', views.UserAPI, basename='user-profile')
 
 urlpatterns = [
     # Authentication
-    path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('my-posts/', views.user_posts, name='user_posts'),
+    path('auth/login/', TokenObtainPairView.as_view(serializer_class=RoleTokenObtainPairSerializer), name='token_obtain_pair'),
+    path('auth/refresh/', TokenRefreshView.as_view(serializer_class=RoleTokenRefreshSerializer), name='token_refresh'),
+    path('my-posts/', views.MyPostsViewSet.as_view({'get': 'list'}), name='user_posts'),
+    path('my-posts/summary/', views.MyPostsViewSet.as_view({'get': 'summary'}), name='user_posts_summary'),
+    path('feeds/<slug:scope>/<int:pk>/<slug:feed_format>/', feeds.feed_view, name='post_feed'),
     
     path('', include(router.urls)),
 ]
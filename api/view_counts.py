@@ -0,0 +1,147 @@
+"""
+Write-behind post view counts, and the trending score built on them.
+
+Retrievals are counted in memory by each worker (`view_counter`) and written
+in batches, one UPDATE per distinct increment (as api.counters does), so
+readers never queue on a post's row lock. The request that finds
+BLOG_VIEW_COUNT_FLUSH_INTERVAL seconds passed since the last flush, or
+BLOG_VIEW_COUNT_MAX_PENDING views pending, flushes them; a worker that exits
+normally flushes at exit.
+
+What a crash loses: a worker only ever holds views it has not flushed, and
+it flushes as soon as it holds MAX_PENDING, so a worker killed without
+running its exit handlers loses at most MAX_PENDING - 1 views. Under steady
+traffic that is also at most FLUSH_INTERVAL seconds of its views; an idle
+worker keeps its pending views until its next view or its exit.
+
+Trending: views decay with a half-life of BLOG_TRENDING_HALF_LIFE seconds.
+Rather than a decayed count that every flush would have to rewrite for every
+post, each post stores
+
+    trending_score = log2(decayed views at t) + t / half_life
+
+which is the same for any t, so ordering by it ranks posts by their decayed
+views right now, through an index, and only flushed posts are updated.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, router, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Coalesce, Log, Power
+
+logger = logging.getLogger(__name__)
+
+
+def half_life():
+    return getattr(settings, 'BLOG_TRENDING_HALF_LIFE', 6 * 60 * 60)
+
+
+def decayed_views(trending_score, now=None):
+    """The views behind `trending_score`, decayed to `now` (a Unix timestamp)."""
+    if trending_score is None:
+        return 0.0
+    now = time.time() if now is None else now
+    return 2 ** (trending_score - now / half_life())
+
+
+def trending_update(views, now):
+    """UPDATE expressions adding `views` views at `now` to a post."""
+    clock = now / half_life()
+    current = Coalesce(
+        Power(Value(2.0), F('trending_score') - Value(clock)), Value(0.0), output_field=FloatField()
+    )
+    return {
+        'view_count': F('view_count') + views,
+        'trending_score': Value(clock) + Log(Value(2.0), current + Value(float(views))),
+    }
+
+
+class ViewCounter:
+    """Per-process pending view counts, flushed in batches (see module docstring)."""
+
+    def __init__(self):
+        self._pending = Counter()
+        self._total = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, post_id):
+        """Count a view of `post_id`; True when the caller should flush()."""
+        interval = getattr(settings, 'BLOG_VIEW_COUNT_FLUSH_INTERVAL', 10)
+        max_pending = getattr(settings, 'BLOG_VIEW_COUNT_MAX_PENDING', 1000)
+        with self._lock:
+            self._pending[post_id] += 1
+            self._total += 1
+            return self._total >= max_pending or time.monotonic() - self._flushed_at >= interval
+
+    def take(self):
+        with self._lock:
+            pending, self._pending, self._total = self._pending, Counter(), 0
+            self._flushed_at = time.monotonic()
+        return pending
+
+    def flush(self, now=None):
+        """Write the pending views, one UPDATE per distinct increment. Returns the number of views written."""
+        from .models import Post
+        pending = self.take()
+        if not pending:
+            return 0
+        now = time.time() if now is None else now
+        by_views = defaultdict(list)
+        for post_id, views in pending.items():
+            by_views[views].append(post_id)
+        try:
+            with transaction.atomic(using=router.db_for_write(Post)):
+                for views, post_ids in by_views.items():
+                    Post.objects.filter(pk__in=post_ids).update(**trending_update(views, now))
+        except DatabaseError:
+            # Kept for the next flush rather than failing the reader's request.
+            logger.exception('Could not flush %d post views', sum(pending.values()))
+            with self._lock:
+                self._pending.update(pending)
+                self._total += sum(pending.values())
+            return 0
+        return sum(pending.values())
+
+    def pending(self):
+        with self._lock:
+            return sum(self._pending.values())
+
+    def clear(self):
+        """Drop the pending views, as a crashed worker would."""
+        self.take()
+
+
+view_counter = ViewCounter()
+atexit.register(view_counter.flush)
+
+
+def counts_views(view_method):
+    """
+    Count a view of the `pk` post whenever the wrapped retrieve method answers
+    200 or 304, including responses served from the response cache.
+    """
+    if asyncio.iscoroutinefunction(view_method):
+        @wraps(view_method)
+        async def async_wrapper(self, request, *args, **kwargs):
+            response = await view_method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304) and view_counter.add(int(self.kwargs['pk'])):
+                await sync_to_async(view_counter.flush)()
+            return response
+        return async_wrapper
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code in (200, 304) and view_counter.add(int(self.kwargs['pk'])):
+            view_counter.flush()
+        return response
+    return wrapper
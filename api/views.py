@@ -1,21 +1,69 @@
+import math
+import time
+
+from asgiref.sync import sync_to_async
 from rest_framework import generics, permissions, filters, viewsets, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.http import Http404, StreamingHttpResponse
+from django.db.models import Count, F, Max, Q
+from .cache import (
+    COUNTERS_GENERATION, POSTS_GENERATION, REFERENCE_GENERATION, aget_generation, get_generation,
+    response_cache_key,
+)
+from .async_views import aget_object_or_404
+from .bulk import PostBulkWriter
+from .conditional import conditional, make_etag
+from .fast_serializers import post_export_serializer, post_list_serializer
+from .instrumentation import InstrumentedViewMixin
+from .filters import FullTextSearchFilter, TagExpressionFilter, UserFilter, UsernamePrefixSearchFilter
 from .models import Post, Category, Tag
+from .sparse_fields import SparseFieldsMixin
 from .serializers import (
     UserSerializer, PostSerializer, PostListSerializer,
-    CategorySerializer, TagSerializer
+    CategorySerializer, TagSerializer, CachedTagsField
 )
+from .pagination import CappedPageNumberPagination, KeysetPagination, apaginate_page_number
+from .reference import reference_cache
+from .renderers import CSVRenderer, NDJSONRenderer
+from .rendering import RENDERER_VERSION
+from .view_counts import counts_views, decayed_views
 from .permissions import (
     IsAdminOrReadOnly, IsOwnerOrAdminOrReadOnly, 
-    CanCreatePost, CanViewPublishedOnly
+    CanCreatePost, CanViewPublishedOnly, get_user_role
 )
 
-class UserAPI(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+class UserAPI(InstrumentedViewMixin, SparseFieldsMixin, viewsets.ModelViewSet):
+    """
+    User directory. Lists are paginated with a capped COUNT, filterable by
+    `username` and `role`, searchable by username prefix and throttled per
+    client, so no request serializes the whole user table. `?fields=` and
+    `?exclude=` narrow the columns read (api.sparse_fields).
+    """
     serializer_class = UserSerializer
+    pagination_class = CappedPageNumberPagination
+    filter_backends = [DjangoFilterBackend, UsernamePrefixSearchFilter, filters.OrderingFilter]
+    filterset_class = UserFilter
+    ordering_fields = ['id', 'username']
+    ordering = ['id']
+    throttle_scope = 'user_directory'
+    
+    def get_queryset(self):
+        return self.project_queryset(User.objects.select_related('userprofile'))
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.query_params.get('role'):
+            # The same order, expressed on the profile so profile_role_user_idx
+            # is walked in order instead of sorting every user with the role.
+            ordering = {'id': 'userprofile__user', '-id': '-userprofile__user'}
+            queryset = queryset.order_by(*(ordering.get(term, term) for term in queryset.query.order_by))
+        return queryset
     
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
@@ -24,10 +72,16 @@ class UserAPI(viewsets.ModelViewSet):
             permission_classes = [permissions.AllowAny]
         return [permission() for permission in permission_classes]
     
+    def get_throttles(self):
+        if self.action == 'list':
+            return [ScopedRateThrottle()]
+        return super().get_throttles()
+    
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response({
             'data': serializer.data,
             'status_code': 200,
             'message': 'Users retrieved successfully'
@@ -72,23 +126,144 @@ class UserAPI(viewsets.ModelViewSet):
             'data': None
         })
    
-class PostViewSet(viewsets.ModelViewSet):
+class PostListMixin(SparseFieldsMixin):
+    """
+    Filtering, ordering, search, sparse fieldsets and page/cursor pagination
+    for post lists, rendered through the compiled PostListSerializer twin.
+    """
     serializer_class = PostListSerializer
-    permission_classes = [permissions.IsAuthenticated, CanCreatePost]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, TagExpressionFilter, filters.OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['category', 'tags', 'status', 'author']
     search_fields = ['title', 'content']
     ordering_fields = ['created_at', 'updated_at', 'published_at']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+    cursor_pagination_class = KeysetPagination
+    list_message = 'Posts retrieved successfully'
+    
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.cursor_pagination_class.is_requested(getattr(self, 'request', None)):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = self.get_sparse_fields()
+        # The id and ordering fields are fetched too so cursor links can be built.
+        rows = post_list_serializer.values(queryset, 'id', *self.ordering_fields, fields=fields)
+        page = self.paginate_queryset(rows)
+        data = post_list_serializer.serialize(page if page is not None else rows, fields=fields)
+        FullTextSearchFilter().add_snippets(request, data, queryset.db)
+        return self.list_response(data, paginated=page is not None)
+    
+    async def alist(self, request, *args, **kwargs):
+        """`list()` on the async ORM, for ASGI (see api.async_views)."""
+        queryset = await self.afilter_queryset(self.get_queryset())
+        fields = self.get_sparse_fields()
+        rows = post_list_serializer.values(queryset, 'id', *self.ordering_fields, fields=fields)
+        page = await self.apaginate_queryset(rows)
+        paginated = page is not None
+        if not paginated:
+            page = [row async for row in rows]
+        snapshot = await reference_cache.aget()
+        if snapshot.covers(category_ids=[row['category_id'] for row in page if 'category_id' in row]):
+            data = post_list_serializer.serialize(page, snapshot, fields)
+        else:
+            # A category newer than the snapshot is looked up with a query.
+            data = await sync_to_async(post_list_serializer.serialize)(page, fields=fields)
+        search = FullTextSearchFilter()
+        if search.get_search_terms(request):
+            await sync_to_async(search.add_snippets)(request, data, queryset.db)
+        return self.list_response(data, paginated)
+    
+    def list_response(self, data, paginated):
+        body = {
+            'status_code': 200,
+            'message': self.list_message,
+            'data': data
+        }
+        if paginated:
+            return self.get_paginated_response(body)
+        return Response(body)
+    
+    async def afilter_queryset(self, queryset):
+        if not self.request.query_params:
+            return self.filter_queryset(queryset)
+        # django-filter validates category/tags/author ids with queries.
+        return await sync_to_async(self.filter_queryset)(queryset)
+    
+    async def apaginate_queryset(self, queryset):
+        paginator = self.paginator
+        if paginator is None:
+            return None
+        if isinstance(paginator, KeysetPagination):
+            return await paginator.apaginate_queryset(queryset, self.request, view=self)
+        return await apaginate_page_number(paginator, queryset, self.request)
+
+class PostViewSet(InstrumentedViewMixin, PostListMixin, viewsets.ModelViewSet):
+    permission_classes = [permissions.IsAuthenticated, CanCreatePost]
+    export_chunk_size = 2000
+    export_cursor_param = 'after'
+    bulk_max_items = 1000
     
     def get_queryset(self):
-        user = self.request.user
-        if hasattr(user, 'userprofile'):
-            if user.userprofile.role in ['admin', 'editor']:
-                return Post.objects.all()
-            else:  # reader
-                return Post.objects.filter(status='published')
-        return Post.objects.filter(status='published')
+        if self.action in ['list', 'export']:
+            queryset = Post.objects.with_list_relations()
+        elif self.action == 'retrieve':
+            # Only the columns and joins the (requested) fields read.
+            queryset = self.project_queryset(Post.objects.with_detail_relations())
+        else:
+            queryset = Post.objects.with_detail_relations()
+        return self.scope_queryset(queryset)
+    
+    def scope_queryset(self, queryset):
+        if self.sees_all_posts():
+            return queryset
+        return queryset.filter(status='published')
+    
+    def sees_all_posts(self):
+        return get_user_role(self.request.user) in ['admin', 'editor']
+    
+    def get_response_cache_key(self):
+        if self.action == 'trending':
+            return response_cache_key(self.request, 'trending', self.trending_period())
+        # Only the published-only view is shared between users.
+        if self.sees_all_posts():
+            return None
+        return response_cache_key(self.request, 'published', get_generation(POSTS_GENERATION))
+    
+    def get_validators(self):
+        scope = 'all' if self.sees_all_posts() else 'published'
+        # Category and tag names are embedded in post payloads.
+        reference = get_generation(REFERENCE_GENERATION)
+        if self.action == 'trending':
+            return make_etag(self.request, self.trending_period(), reference), None
+        if self.action == 'retrieve':
+            try:
+                queryset = self.scope_queryset(Post.objects.filter(pk=self.kwargs['pk']))
+            except (TypeError, ValueError):
+                return None, None
+            row = queryset.values_list('updated_at', 'render_version').first()
+            if row is None:
+                return None, None
+            # A re-render (rerender_posts) changes the HTML but not updated_at.
+            updated_at, render_version = row
+            return make_etag(self.request, scope, updated_at.isoformat(), render_version, reference), updated_at
+        if isinstance(self.paginator, KeysetPagination):
+            # A COUNT would make every cursor page cost O(n) again.
+            return None, None
+        aggregate = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            last_modified=Max('updated_at'), count=Count('id')
+        )
+        last_modified = aggregate['last_modified']
+        etag = make_etag(
+            self.request, scope, last_modified.isoformat() if last_modified else '',
+            aggregate['count'], reference, RENDERER_VERSION,
+        )
+        return etag, last_modified
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update', 'retrieve']:
@@ -96,7 +271,7 @@ class PostViewSet(viewsets.ModelViewSet):
         return PostListSerializer
     
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        serializer.save(author_id=self.request.user.id)
     
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
@@ -105,23 +280,16 @@ class PostViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated, CanCreatePost]
         return [permission() for permission in permission_classes]
     
+    @conditional
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response({
-                'status_code': 200,
-                'message': 'Posts retrieved successfully',
-                'data': serializer.data
-            })
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'status_code': 200,
-            'message': 'Posts retrieved successfully',
-            'data': serializer.data
-        })
+        return super().list(request, *args, **kwargs)
+    
+    @conditional
+    async def alist(self, request, *args, **kwargs):
+        return await super().alist(request, *args, **kwargs)
     
+    @counts_views
+    @conditional
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
@@ -131,6 +299,173 @@ class PostViewSet(viewsets.ModelViewSet):
             'data': serializer.data
         })
     
+    @counts_views
+    @conditional
+    async def aretrieve(self, request, *args, **kwargs):
+        """`retrieve()` on the async ORM, for ASGI (see api.async_views)."""
+        queryset = await self.afilter_queryset(self.get_queryset())
+        instance = await aget_object_or_404(queryset, pk=self.kwargs['pk'])
+        self.check_object_permissions(request, instance)
+        instance.prefetched_tag_ids = []
+        if self.wants_field('tags'):
+            instance.prefetched_tag_ids = [tag_id async for tag_id in CachedTagsField.tag_ids(instance.pk)]
+        # category_id is deferred unless a requested field reads it.
+        category_ids = [instance.category_id] if 'category_id' in instance.__dict__ else []
+        snapshot = await reference_cache.aget()
+        serializer = self.get_serializer(
+            instance, context={**self.get_serializer_context(), 'reference_snapshot': snapshot}
+        )
+        if snapshot.covers(category_ids, instance.prefetched_tag_ids):
+            data = serializer.data
+        else:
+            data = await sync_to_async(lambda: serializer.data)()
+        return Response({
+            'status_code': 200,
+            'message': 'Post retrieved successfully',
+            'data': data
+        })
+    
+    def get_related_queryset(self):
+        """
+        The post's precomputed related posts (api.related), best first: one
+        read through post_related_score_idx, with the post's own visibility
+        checked on the same join.
+        """
+        lookups = {'related_from__post_id': self.kwargs['pk']}
+        if not self.sees_all_posts():
+            lookups['related_from__post__status'] = 'published'
+        return (
+            Post.objects.with_list_relations().filter(status='published', **lookups)
+            .annotate(score=F('related_from__score')).order_by('-score', '-related_from__related_id')
+        )
+    
+    def related_response(self, rows, snapshot=None):
+        data = post_list_serializer.serialize(rows, snapshot)
+        for item, row in zip(data, rows):
+            item['score'] = round(row['score'], 4)
+        return Response({
+            'status_code': 200,
+            'message': 'Related posts retrieved successfully',
+            'data': data
+        })
+    
+    @action(detail=True, methods=['get'])
+    def related(self, request, *args, **kwargs):
+        try:
+            rows = list(post_list_serializer.values(self.get_related_queryset(), 'score'))
+        except (TypeError, ValueError):
+            raise Http404
+        if not rows:
+            # Nothing related yet, or no such post: only the latter is a 404.
+            self.get_object()
+        return self.related_response(rows)
+    
+    async def arelated(self, request, *args, **kwargs):
+        """`related()` on the async ORM, for ASGI (see api.async_views)."""
+        try:
+            rows = [row async for row in post_list_serializer.values(self.get_related_queryset(), 'score')]
+        except (TypeError, ValueError):
+            raise Http404
+        if not rows:
+            instance = await aget_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+            self.check_object_permissions(request, instance)
+        snapshot = await reference_cache.aget()
+        if snapshot.covers(category_ids=[row['category_id'] for row in rows]):
+            return self.related_response(rows, snapshot)
+        return await sync_to_async(self.related_response)(rows)
+    
+    def trending_period(self):
+        """Posts generation plus the current refresh period: trending is recomputed when either moves."""
+        refresh = getattr(settings, 'BLOG_TRENDING_REFRESH', 60)
+        return f'{get_generation(POSTS_GENERATION)}:{int(time.time() // refresh)}'
+    
+    @action(detail=False, methods=['get'])
+    @conditional
+    def trending(self, request, *args, **kwargs):
+        """
+        The `?limit=` (default 10) published posts with the most views, each
+        view decaying with BLOG_TRENDING_HALF_LIFE (see api.view_counts).
+        Read in score order from post_trending_idx, and shared by every user
+        for BLOG_TRENDING_REFRESH seconds.
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        queryset = (
+            Post.objects.with_list_relations()
+            .filter(status='published', trending_score__isnull=False)
+            .order_by('-trending_score', '-id')
+        )
+        rows = list(post_list_serializer.values(queryset, 'view_count', 'trending_score')[:limit])
+        data = post_list_serializer.serialize(rows)
+        now = time.time()
+        for item, row in zip(data, rows):
+            item['view_count'] = row['view_count']
+            item['trending_score'] = round(decayed_views(row['trending_score'], now), 2)
+        return Response({
+            'status_code': 200,
+            'message': 'Trending posts retrieved successfully',
+            'data': data
+        })
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Create (items without `id`) and update (items with `id`) many posts in
+        one request. Returns one result per item, in order; valid items are
+        saved even if others fail (207).
+        """
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of posts.']})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [f'At most {self.bulk_max_items} posts per request.']})
+        results = PostBulkWriter(request, self, items).save()
+        counts = {outcome: 0 for outcome in ('created', 'updated', 'error')}
+        for result in results:
+            counts[result['status']] += 1
+        if not counts['error']:
+            code = status.HTTP_201_CREATED
+        elif counts['error'] == len(results):
+            code = status.HTTP_400_BAD_REQUEST
+        else:
+            code = status.HTTP_207_MULTI_STATUS
+        return Response({
+            'status_code': code,
+            'message': '{created} created, {updated} updated, {error} failed'.format(**counts),
+            'data': results
+        }, status=code)
+    
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, *args, **kwargs):
+        """
+        Stream every visible post matching the list filters as NDJSON
+        (default) or CSV (`?format=csv`), in id order.
+
+        Rows are read with `iterator(chunk_size=...)` and written as they are
+        serialized, so memory stays flat however large the export. An
+        interrupted export resumes with `?after=<last id received>`.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by('id')
+        after = request.query_params.get(self.export_cursor_param)
+        if after:
+            try:
+                queryset = queryset.filter(id__gt=int(after))
+            except ValueError:
+                raise ValidationError({self.export_cursor_param: 'A valid integer is required.'})
+        rows = post_export_serializer.stream(
+            post_export_serializer.values(queryset).iterator(chunk_size=self.export_chunk_size)
+        )
+        renderer = request.accepted_renderer
+        if isinstance(renderer, CSVRenderer):
+            lines = renderer.lines(post_export_serializer.keys, rows)
+        else:
+            lines = renderer.lines(rows)
+        response = StreamingHttpResponse(lines, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = f'attachment; filename="posts.{renderer.format}"'
+        return response
+    
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -161,20 +496,45 @@ class PostViewSet(viewsets.ModelViewSet):
             'data': None
         })
     
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(InstrumentedViewMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
     
+    def get_queryset(self):
+        return self.project_queryset(super().get_queryset())
+    
+    def get_validators(self):
+        return make_etag(
+            self.request, get_generation(REFERENCE_GENERATION), get_generation(COUNTERS_GENERATION)
+        ), None
+    
+    @action(detail=False, methods=['get'])
+    @conditional
+    def stats(self, request, *args, **kwargs):
+        """Published post count per category, busiest first. Read from the cached counters only."""
+        categories = sorted(
+            reference_cache.counted().categories,
+            key=lambda category: (-category['published_post_count'], category['name']),
+        )
+        return Response({
+            'status_code': 200,
+            'message': 'Category stats retrieved successfully',
+            'data': [
+                {key: category[key] for key in ('id', 'name', 'published_post_count')}
+                for category in categories
+            ]
+        })
+    
+    @conditional
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
         return Response({
             'status_code': 200,
             'message': 'Categories retrieved successfully',
-            'data': serializer.data
+            'data': self.project_rows(reference_cache.counted().categories)
         })
     
+    @conditional
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
@@ -184,6 +544,30 @@ class CategoryViewSet(viewsets.ModelViewSet):
             'data': serializer.data
         })
     
+    async def aget_validators(self):
+        return make_etag(
+            self.request, await aget_generation(REFERENCE_GENERATION), await aget_generation(COUNTERS_GENERATION)
+        ), None
+    
+    @conditional
+    async def alist(self, request, *args, **kwargs):
+        snapshot = await reference_cache.acounted()
+        return Response({
+            'status_code': 200,
+            'message': 'Categories retrieved successfully',
+            'data': self.project_rows(snapshot.categories)
+        })
+    
+    @conditional
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await aget_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+        serializer = self.get_serializer(instance)
+        return Response({
+            'status_code': 200,
+            'message': 'Category retrieved successfully',
+            'data': serializer.data
+        })
+    
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -214,20 +598,59 @@ class CategoryViewSet(viewsets.ModelViewSet):
             'data': None
         })
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(InstrumentedViewMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [IsAdminOrReadOnly]
     
+    def get_queryset(self):
+        return self.project_queryset(super().get_queryset())
+    
+    def get_validators(self):
+        return make_etag(
+            self.request, get_generation(REFERENCE_GENERATION), get_generation(COUNTERS_GENERATION)
+        ), None
+    
+    @action(detail=False, methods=['get'])
+    @conditional
+    def cloud(self, request, *args, **kwargs):
+        """
+        The `?limit=` (default 50) tags with the most published posts, each with
+        a 1-5 `weight` on a log scale. Read from the cached counters only.
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 500)
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        tags = sorted(
+            (tag for tag in reference_cache.counted().tags if tag['published_post_count']),
+            key=lambda tag: (-tag['published_post_count'], tag['name']),
+        )[:limit]
+        top = tags[0]['published_post_count'] if tags else 1
+        data = [
+            {
+                'id': tag['id'],
+                'name': tag['name'],
+                'published_post_count': tag['published_post_count'],
+                'weight': 1 + round(4 * math.log(tag['published_post_count']) / math.log(top)) if top > 1 else 5,
+            }
+            for tag in tags
+        ]
+        return Response({
+            'status_code': 200,
+            'message': 'Tag cloud retrieved successfully',
+            'data': data
+        })
+    
+    @conditional
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
         return Response({
             'status_code': 200,
             'message': 'Tags retrieved successfully',
-            'data': serializer.data
+            'data': self.project_rows(reference_cache.counted().tags)
         })
     
+    @conditional
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
@@ -237,6 +660,30 @@ class TagViewSet(viewsets.ModelViewSet):
             'data': serializer.data
         })
     
+    async def aget_validators(self):
+        return make_etag(
+            self.request, await aget_generation(REFERENCE_GENERATION), await aget_generation(COUNTERS_GENERATION)
+        ), None
+    
+    @conditional
+    async def alist(self, request, *args, **kwargs):
+        snapshot = await reference_cache.acounted()
+        return Response({
+            'status_code': 200,
+            'message': 'Tags retrieved successfully',
+            'data': self.project_rows(snapshot.tags)
+        })
+    
+    @conditional
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await aget_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+        serializer = self.get_serializer(instance)
+        return Response({
+            'status_code': 200,
+            'message': 'Tag retrieved successfully',
+            'data': serializer.data
+        })
+    
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -267,13 +714,30 @@ class TagViewSet(viewsets.ModelViewSet):
             'data': None
         })
 
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated])
-def user_posts(request):
-    posts = Post.objects.filter(author=request.user)
-    serializer = PostListSerializer(posts, many=True)
-    return Response({
-        'status_code': 200,
-        'message': 'User posts retrieved successfully',
-        'data': serializer.data
-    })
+class MyPostsViewSet(InstrumentedViewMixin, PostListMixin, viewsets.GenericViewSet):
+    """
+    The requesting user's own posts, in any status: paginated, filterable
+    and orderable like the main post list, walking the author indexes.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['category', 'tags', 'status']
+    list_message = 'User posts retrieved successfully'
+    
+    def get_queryset(self):
+        return Post.objects.with_list_relations().filter(author_id=self.request.user.id)
+    
+    @action(detail=False, methods=['get'])
+    def summary(self, request, *args, **kwargs):
+        """Post counts per status plus the total, in a single aggregate query."""
+        counts = Post.objects.filter(author_id=request.user.id).aggregate(
+            total=Count('id'),
+            **{
+                value: Count('id', filter=Q(status=value))
+                for value, _ in Post.STATUS_CHOICES
+            }
+        )
+        return Response({
+            'status_code': 200,
+            'message': 'User post summary retrieved successfully',
+            'data': counts
+        })